@@ -0,0 +1,246 @@
+import heapq
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+import database as db
+import cache
+import pedidos
+import notificacoes
+import estoque
+
+TRAVA = 'agendador'
+DURACAO_TRAVA = 30
+INTERVALO_RENOVACAO = 10
+LOTE = 100
+PRAZO_PEDIDO_HORAS = 48
+MARGEM_FALTA_HORAS = 12
+ANTECEDENCIA_LEMBRETE_HORAS = 24
+RETENCAO_EVENTOS_DIAS = 7
+
+def _em_transacao(operacao):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        resultado = operacao(cursor)
+        conn.commit()
+        return resultado
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def expirar_pedidos():
+    total = 0
+    while True:
+        def cancelar_lote(cursor):
+            cursor.execute(f'''SELECT id FROM pedidos
+                              WHERE status IN ({','.join('?' * len(pedidos.STATUS_EM_ABERTO))})
+                              AND data_criacao < datetime('now', ?)
+                              LIMIT ?''',
+                           (*pedidos.STATUS_EM_ABERTO, f'-{PRAZO_PEDIDO_HORAS} hours', LOTE))
+            ids = [row['id'] for row in cursor.fetchall()]
+            return len(ids), pedidos.cancelar_pedidos(cursor, ids, pedidos.STATUS_EM_ABERTO)
+        
+        encontrados, cancelados = _em_transacao(cancelar_lote)
+        total += len(cancelados)
+        if encontrados < LOTE:
+            return f'{total} pedidos expirados'
+
+def margem_falta_horas(configs=None):
+    configs = configs if configs is not None else cache.configuracoes.obter()
+    try:
+        return max(0, int(configs.get('margem_falta_horas') or MARGEM_FALTA_HORAS))
+    except ValueError:
+        return MARGEM_FALTA_HORAS
+
+def marcar_faltas():
+    limite = (datetime.now() - timedelta(hours=margem_falta_horas())).strftime('%Y-%m-%d')
+    total = 0
+    while True:
+        def marcar_lote(cursor):
+            cursor.execute('''UPDATE agendamentos SET status = 'falta'
+                             WHERE id IN (SELECT id FROM agendamentos
+                                          WHERE data_hora < ? AND status = 'agendado'
+                                          LIMIT ?)''', (limite, LOTE))
+            return cursor.rowcount
+        
+        marcados = _em_transacao(marcar_lote)
+        total += marcados
+        if marcados < LOTE:
+            return f'{total} faltas marcadas'
+
+def enfileirar_lembretes():
+    agora = datetime.now()
+    janela = (agora.strftime('%Y-%m-%d %H:%M:%S'),
+              (agora + timedelta(hours=ANTECEDENCIA_LEMBRETE_HORAS)).strftime('%Y-%m-%d %H:%M:%S'))
+    
+    def enfileirar(cursor):
+        cursor.execute('''SELECT id FROM agendamentos
+                         WHERE data_hora >= ? AND data_hora < ? AND status IN ('agendado', 'confirmado')''',
+                       janela)
+        return sum(notificacoes.enfileirar_agendamento(cursor, 'agendamento_lembrete', row['id'])
+                   for row in cursor.fetchall())
+    
+    return f'{_em_transacao(enfileirar)} lembretes enfileirados'
+
+def limpar_eventos():
+    def apagar(cursor):
+        cursor.execute("DELETE FROM eventos_agendamentos WHERE data_criacao < datetime('now', ?)",
+                       (f'-{RETENCAO_EVENTOS_DIAS} days',))
+        removidos = cursor.rowcount
+        cursor.execute('''DELETE FROM eventos_estoque
+                         WHERE processado = 1 AND data_criacao < datetime('now', ?)''',
+                       (f'-{RETENCAO_EVENTOS_DIAS} days',))
+        return removidos + cursor.rowcount
+    
+    return f'{_em_transacao(apagar)} eventos removidos'
+
+TAREFAS = {
+    'expirar_pedidos': (300, expirar_pedidos),
+    'marcar_faltas': (300, marcar_faltas),
+    'enfileirar_lembretes': (300, enfileirar_lembretes),
+    'limpar_eventos': (3600, limpar_eventos),
+    'despachar_notificacoes': (10, notificacoes.despachar_pendentes),
+    'processar_eventos_estoque': (60, estoque.processar_eventos),
+}
+
+def registrar(nome, intervalo_segundos, funcao):
+    TAREFAS[nome] = (intervalo_segundos, funcao)
+
+class Agendador:
+    def __init__(self, tarefas=None):
+        self.tarefas = tarefas if tarefas is not None else TAREFAS
+        self.dono = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lider = False
+        self._fila = []
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _assumir_trava(self):
+        agora = time.time()
+        conn = db.get_db_connection()
+        try:
+            cursor = conn.execute('''INSERT INTO travas (nome, dono, expira_em) VALUES (?, ?, ?)
+                                    ON CONFLICT(nome) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em
+                                    WHERE travas.dono = excluded.dono OR travas.expira_em < ?''',
+                                  (TRAVA, self.dono, agora + DURACAO_TRAVA, agora))
+            conn.commit()
+            return cursor.rowcount == 1
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if db.banco_ocupado(e):
+                return self.lider
+            raise
+        finally:
+            conn.close()
+
+    def _liberar_trava(self):
+        conn = db.get_db_connection()
+        conn.execute('UPDATE travas SET expira_em = 0 WHERE nome = ? AND dono = ?', (TRAVA, self.dono))
+        conn.commit()
+        conn.close()
+
+    def _carregar_fila(self):
+        agora = time.time()
+        conn = db.get_db_connection()
+        conn.executemany('''INSERT OR IGNORE INTO tarefas (nome, intervalo_segundos, proxima_execucao)
+                           VALUES (?, ?, ?)''',
+                         [(nome, intervalo, agora) for nome, (intervalo, _) in self.tarefas.items()])
+        conn.commit()
+        rows = conn.execute('SELECT nome, proxima_execucao FROM tarefas').fetchall()
+        conn.close()
+        self._fila = [(row['proxima_execucao'], row['nome']) for row in rows if row['nome'] in self.tarefas]
+        heapq.heapify(self._fila)
+
+    def _executar_tarefa(self, nome):
+        intervalo, funcao = self.tarefas[nome]
+        inicio = time.time()
+        try:
+            resultado = funcao()
+        except Exception as e:
+            resultado = f'erro: {e}'
+            print(f"Erro na tarefa {nome}: {e}")
+        proxima = time.time() + intervalo
+        
+        conn = db.get_db_connection()
+        conn.execute('''UPDATE tarefas SET intervalo_segundos = ?, proxima_execucao = ?, ultima_execucao = ?,
+                       ultimo_resultado = ? WHERE nome = ?''', (intervalo, proxima, inicio, resultado, nome))
+        conn.commit()
+        conn.close()
+        heapq.heappush(self._fila, (proxima, nome))
+        return resultado
+
+    def executar_pendentes(self):
+        executadas = []
+        limite_trava = time.time() + INTERVALO_RENOVACAO
+        while self._fila and self._fila[0][0] <= time.time() and time.time() < limite_trava:
+            _, nome = heapq.heappop(self._fila)
+            executadas.append((nome, self._executar_tarefa(nome)))
+        return executadas
+
+    def _laco(self):
+        try:
+            while not self._parar.is_set():
+                espera = INTERVALO_RENOVACAO
+                try:
+                    lider = self._assumir_trava()
+                    if lider and not self.lider:
+                        self._carregar_fila()
+                    self.lider = lider
+                    
+                    if self.lider:
+                        self.executar_pendentes()
+                        if self._fila:
+                            espera = min(espera, max(0, self._fila[0][0] - time.time()))
+                except Exception as e:
+                    print(f"Erro no agendador: {e}")
+                self._parar.wait(espera)
+        finally:
+            if self.lider:
+                self._liberar_trava()
+            db.fechar_conexao()
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name='agendador', daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self, timeout=None):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+_agendador = None
+
+def iniciar():
+    global _agendador
+    if _agendador is None or _agendador.dono.split(':')[1] != str(os.getpid()):
+        _agendador = Agendador()
+    return _agendador.iniciar()
+
+def parar():
+    if _agendador is not None:
+        _agendador.parar(INTERVALO_RENOVACAO)
+
+if __name__ == '__main__':
+    import sys
+    
+    db.aplicar_migracoes()
+    if '--uma-vez' in sys.argv:
+        for nome, (_, funcao) in TAREFAS.items():
+            print(f'{nome}: {funcao()}')
+    else:
+        iniciar()
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            parar()
@@ -0,0 +1,165 @@
+import sqlite3
+from datetime import datetime
+import database as db
+import disponibilidade
+import notificacoes
+
+STATUS_INICIAL = 'agendado'
+LIMITE_HISTORICO = 10
+
+class ErroAgendamento(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+class NaoEncontrado(ErroAgendamento):
+    status = 404
+
+class HorarioIndisponivel(ErroAgendamento):
+    status = 409
+
+class BancoOcupado(ErroAgendamento):
+    status = 503
+
+STATUS_ALTERAVEIS = ('agendado', 'confirmado', 'concluido', 'cancelado', 'falta')
+
+def alterar_status(agendamento_id, status):
+    if status not in STATUS_ALTERAVEIS:
+        raise ErroAgendamento('Status inválido')
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('UPDATE agendamentos SET status = ? WHERE id = ? RETURNING barbeiro_id, data_hora',
+                       (status, agendamento_id))
+        agendamento = cursor.fetchone()
+        if not agendamento:
+            raise NaoEncontrado('Agendamento não encontrado')
+        if status == 'cancelado':
+            notificacoes.enfileirar_agendamento(cursor, 'agendamento_cancelado', agendamento_id)
+        disponibilidade.marcar_alterado(cursor, agendamento['barbeiro_id'], agendamento['data_hora'])
+        conn.commit()
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise HorarioIndisponivel('Horário já reservado') from e
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    disponibilidade.invalidar(agendamento['barbeiro_id'], agendamento['data_hora'])
+
+def _verificar_horario(cursor, barbeiro_id, data_hora, duracao, expediente):
+    abertura, fechamento, dias_abertos = expediente
+    inicio = data_hora.hour * 60 + data_hora.minute
+    if data_hora.isoweekday() not in dias_abertos or inicio < abertura or inicio + duracao > fechamento:
+        raise ErroAgendamento('Horário fora do expediente')
+    
+    data = data_hora.date().isoformat()
+    cursor.execute('''SELECT a.data_hora, COALESCE(s.duracao_minutos, ?) as duracao
+                     FROM agendamentos a
+                     LEFT JOIN servicos s ON a.servico_id = s.id
+                     WHERE a.barbeiro_id = ? AND a.data_hora >= ? AND a.data_hora < ? AND a.status != 'cancelado' ''',
+                   (disponibilidade.DURACAO_PADRAO, barbeiro_id, *db.intervalo_do_dia(data)))
+    for reserva in cursor.fetchall():
+        existente = datetime.strptime(reserva['data_hora'][:16], '%Y-%m-%d %H:%M')
+        inicio_existente = existente.hour * 60 + existente.minute
+        if inicio_existente < inicio + duracao and inicio < inicio_existente + reserva['duracao']:
+            raise HorarioIndisponivel('Horário já reservado')
+
+def criar_agendamento(cliente_id, barbeiro_id, servico_id, data_hora, observacoes):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    texto_data_hora = data_hora.strftime('%Y-%m-%d %H:%M:00')
+    expediente = disponibilidade.expediente()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        cursor.execute('SELECT preco, duracao_minutos FROM servicos WHERE id = ? AND ativo = 1', (servico_id,))
+        servico = cursor.fetchone()
+        if not servico:
+            raise NaoEncontrado('Serviço não encontrado')
+        
+        cursor.execute('SELECT id FROM barbeiros WHERE id = ? AND ativo = 1', (barbeiro_id,))
+        if not cursor.fetchone():
+            raise NaoEncontrado('Barbeiro não encontrado')
+        
+        _verificar_horario(cursor, barbeiro_id, data_hora,
+                           servico['duracao_minutos'] or disponibilidade.DURACAO_PADRAO, expediente)
+        
+        cursor.execute('''INSERT INTO agendamentos (cliente_id, barbeiro_id, servico_id, data_hora, 
+                         observacoes, valor, status) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                       (cliente_id, barbeiro_id, servico_id, texto_data_hora, observacoes, servico['preco'],
+                        STATUS_INICIAL))
+        agendamento_id = cursor.lastrowid
+        
+        notificacoes.enfileirar_agendamento(cursor, 'agendamento_confirmado', agendamento_id)
+        disponibilidade.marcar_alterado(cursor, barbeiro_id, texto_data_hora)
+        conn.commit()
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise HorarioIndisponivel('Horário já reservado') from e
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    disponibilidade.invalidar(barbeiro_id, texto_data_hora)
+    return agendamento_id
+
+def codificar_cursor(agendamento):
+    return f"{agendamento['data_hora']}|{agendamento['id']}"
+
+def decodificar_cursor(valor):
+    try:
+        data_hora, agendamento_id = valor.rsplit('|', 1)
+        return data_hora, int(agendamento_id)
+    except (AttributeError, ValueError):
+        return None
+
+def listar_do_cliente(cliente_id, cursor_paginacao=None, limite=LIMITE_HISTORICO):
+    condicoes = ['a.cliente_id = ?']
+    params = [cliente_id]
+    
+    posicao = decodificar_cursor(cursor_paginacao) if cursor_paginacao else None
+    if posicao:
+        condicoes.append('(a.data_hora, a.id) < (?, ?)')
+        params.extend(posicao)
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome
+                      FROM agendamentos a
+                      LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+                      LEFT JOIN servicos s ON a.servico_id = s.id
+                      WHERE {' AND '.join(condicoes)}
+                      ORDER BY a.data_hora DESC, a.id DESC
+                      LIMIT ?''', params + [limite + 1])
+    agendamentos = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    proximo_cursor = None
+    if len(agendamentos) > limite:
+        agendamentos = agendamentos[:limite]
+        proximo_cursor = codificar_cursor(agendamentos[-1])
+    
+    return agendamentos, proximo_cursor
@@ -1,9 +1,27 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, session, flash, g, Response,
+                   stream_with_context)
 from datetime import datetime, timedelta
 from functools import wraps
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
 import database as db
+import cache
+import catalogo
+import busca
+import sugestoes
+import precos
+import pedidos
+import agendamentos
+import disponibilidade
+import eventos
+import fila
+import resumos
+import relatorios
+import comissoes
+import exportacoes
+import importacao
+import estoque
+import agendador
 import os
 import secrets
 import re
@@ -20,20 +38,13 @@ else:
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
 db.init_database()
-db.popular_dados_exemplo()
+
+app.teardown_appcontext(db.liberar_conexao)
 
 def get_configuracoes():
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM configuracoes')
-    configs_raw = cursor.fetchall()
-    conn.close()
-    
-    configs = {}
-    for config in configs_raw:
-        configs[config['chave']] = config['valor']
-    
-    return configs
+    if 'configuracoes' not in g:
+        g.configuracoes = cache.configuracoes.obter()
+    return g.configuracoes
 
 @app.context_processor
 def inject_configs():
@@ -84,129 +95,46 @@ def landing():
 
 @app.route('/')
 def index():
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM categorias WHERE ativo = 1 ORDER BY ordem')
-    categorias = cursor.fetchall()
-    
-    cursor.execute('''SELECT s.*, c.nome as categoria_nome FROM servicos s 
-                     LEFT JOIN categorias c ON s.categoria_id = c.id 
-                     WHERE s.ativo = 1 AND s.destaque = 1''')
-    servicos_destaque = cursor.fetchall()
-    
-    cursor.execute('''SELECT p.*, c.nome as categoria_nome FROM produtos p 
-                     LEFT JOIN categorias c ON p.categoria_id = c.id 
-                     WHERE p.ativo = 1 AND p.destaque = 1''')
-    produtos_destaque = cursor.fetchall()
-    
-    cursor.execute('''SELECT s.*, c.nome as categoria_nome FROM servicos s 
-                     LEFT JOIN categorias c ON s.categoria_id = c.id 
-                     WHERE s.ativo = 1 AND s.promocao = 1''')
-    servicos_promocao = cursor.fetchall()
-    
-    cursor.execute('''SELECT p.*, c.nome as categoria_nome FROM produtos p 
-                     LEFT JOIN categorias c ON p.categoria_id = c.id 
-                     WHERE p.ativo = 1 AND p.promocao = 1''')
-    produtos_promocao = cursor.fetchall()
-    
-    cursor.execute("SELECT valor FROM configuracoes WHERE chave = 'status_aberto'")
-    config = cursor.fetchone()
-    status_aberto = config['valor'] == '1' if config else True
-    
-    conn.close()
+    cat = catalogo.obter()
+    status_aberto = get_configuracoes().get('status_aberto', '1') == '1'
     
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     
     return render_template('index.html', 
-                          categorias=categorias,
-                          servicos_destaque=servicos_destaque,
-                          produtos_destaque=produtos_destaque,
-                          servicos_promocao=servicos_promocao,
-                          produtos_promocao=produtos_promocao,
+                          categorias=cat.categorias_ativas,
+                          servicos_destaque=cat.servicos_destaque,
+                          produtos_destaque=cat.produtos_destaque,
+                          servicos_promocao=cat.servicos_promocao,
+                          produtos_promocao=cat.produtos_promocao,
                           status_aberto=status_aberto,
                           carrinho_count=carrinho_count)
 
 @app.route('/categoria/<int:categoria_id>')
 def categoria(categoria_id):
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM categorias WHERE id = ?', (categoria_id,))
-    categoria = cursor.fetchone()
-    
-    if categoria_id == 1:
-        cursor.execute('''SELECT s.*, c.nome as categoria_nome FROM servicos s 
-                         LEFT JOIN categorias c ON s.categoria_id = c.id 
-                         WHERE s.ativo = 1 AND s.destaque = 1''')
-        servicos = cursor.fetchall()
-        
-        cursor.execute('''SELECT p.*, c.nome as categoria_nome FROM produtos p 
-                         LEFT JOIN categorias c ON p.categoria_id = c.id 
-                         WHERE p.ativo = 1 AND p.destaque = 1''')
-        produtos = cursor.fetchall()
-    elif categoria_id == 2:
-        cursor.execute('''SELECT s.*, c.nome as categoria_nome FROM servicos s 
-                         LEFT JOIN categorias c ON s.categoria_id = c.id 
-                         WHERE s.ativo = 1 AND s.promocao = 1''')
-        servicos = cursor.fetchall()
-        
-        cursor.execute('''SELECT p.*, c.nome as categoria_nome FROM produtos p 
-                         LEFT JOIN categorias c ON p.categoria_id = c.id 
-                         WHERE p.ativo = 1 AND p.promocao = 1''')
-        produtos = cursor.fetchall()
-    else:
-        cursor.execute('''SELECT s.*, c.nome as categoria_nome FROM servicos s 
-                         LEFT JOIN categorias c ON s.categoria_id = c.id 
-                         WHERE s.ativo = 1 AND s.categoria_id = ?''', (categoria_id,))
-        servicos = cursor.fetchall()
-        
-        cursor.execute('''SELECT p.*, c.nome as categoria_nome FROM produtos p 
-                         LEFT JOIN categorias c ON p.categoria_id = c.id 
-                         WHERE p.ativo = 1 AND p.categoria_id = ?''', (categoria_id,))
-        produtos = cursor.fetchall()
-    
-    conn.close()
+    cat = catalogo.obter()
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     
     return render_template('categoria.html', 
-                          categoria=categoria,
-                          servicos=servicos,
-                          produtos=produtos,
+                          categoria=cat.categorias_por_id.get(categoria_id),
+                          servicos=cat.servicos_da_categoria(categoria_id),
+                          produtos=cat.produtos_da_categoria(categoria_id),
                           carrinho_count=carrinho_count)
 
 @app.route('/servico/<int:servico_id>')
 def servico_detalhes(servico_id):
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''SELECT s.*, c.nome as categoria_nome FROM servicos s 
-                     LEFT JOIN categorias c ON s.categoria_id = c.id 
-                     WHERE s.id = ?''', (servico_id,))
-    servico = cursor.fetchone()
-    
-    cursor.execute('SELECT * FROM barbeiros WHERE ativo = 1')
-    barbeiros = cursor.fetchall()
-    
-    conn.close()
+    cat = catalogo.obter()
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     
     return render_template('servico.html', 
-                          servico=servico,
-                          barbeiros=barbeiros,
+                          servico=cat.servicos_por_id.get(servico_id),
+                          barbeiros=cat.barbeiros_ativos,
                           carrinho_count=carrinho_count)
 
 @app.route('/produto/<int:produto_id>')
 def produto_detalhes(produto_id):
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''SELECT p.*, c.nome as categoria_nome FROM produtos p 
-                     LEFT JOIN categorias c ON p.categoria_id = c.id 
-                     WHERE p.id = ?''', (produto_id,))
-    produto = cursor.fetchone()
-    
-    conn.close()
+    produto = catalogo.obter().produtos_por_id.get(produto_id)
+    if produto:
+        produto = dict(produto, estoque=estoque.disponivel(produto_id))
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     
     return render_template('produto.html', 
@@ -220,26 +148,14 @@ def buscar():
     if not query:
         return redirect(url_for('index'))
     
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    search_term = f'%{query}%'
-    
-    cursor.execute('''SELECT s.*, c.nome as categoria_nome, 'servico' as tipo FROM servicos s 
-                     LEFT JOIN categorias c ON s.categoria_id = c.id 
-                     WHERE s.ativo = 1 AND (s.nome LIKE ? OR s.descricao LIKE ?)''', 
-                     (search_term, search_term))
-    resultados = cursor.fetchall()
-    
-    cursor.execute('''SELECT p.*, c.nome as categoria_nome, 'produto' as tipo FROM produtos p 
-                     LEFT JOIN categorias c ON p.categoria_id = c.id 
-                     WHERE p.ativo = 1 AND (p.nome LIKE ? OR p.descricao LIKE ?)''', 
-                     (search_term, search_term))
-    resultados_produtos = cursor.fetchall()
+    cat = catalogo.obter()
+    todos_resultados = []
     
-    conn.close()
+    for tipo, item_id in busca.buscar(query):
+        item = cat.servicos_por_id.get(item_id) if tipo == 'servico' else cat.produtos_por_id.get(item_id)
+        if item:
+            todos_resultados.append(dict(item, tipo=tipo))
     
-    todos_resultados = list(resultados) + list(resultados_produtos)
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     
     return render_template('buscar.html', 
@@ -247,51 +163,30 @@ def buscar():
                           resultados=todos_resultados,
                           carrinho_count=carrinho_count)
 
+@app.route('/api/sugestoes')
+def api_sugestoes():
+    query = request.args.get('q', '').strip()[:100]
+    
+    try:
+        limite = min(max(int(request.args.get('limite', sugestoes.LIMITE_SUGESTOES)), 1), 20)
+    except ValueError:
+        limite = sugestoes.LIMITE_SUGESTOES
+    
+    resultado = [{'tipo': item['tipo'], 'id': item['id'], 'nome': item['nome'], 'url': item['url']}
+                 for item in sugestoes.sugerir(query, limite)]
+    
+    return jsonify({'sugestoes': resultado})
+
 @app.route('/carrinho')
 def carrinho():
     carrinho_items = session.get('carrinho', [])
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    itens_detalhados = []
-    total = 0
-    
-    for item in carrinho_items:
-        if item['tipo'] == 'servico':
-            cursor.execute('SELECT * FROM servicos WHERE id = ?', (item['id'],))
-            dados = cursor.fetchone()
-            if dados:
-                preco = dados['preco_promocional'] if dados['promocao'] and dados['preco_promocional'] else dados['preco']
-                itens_detalhados.append({
-                    'id': dados['id'],
-                    'tipo': 'servico',
-                    'nome': dados['nome'],
-                    'preco': preco,
-                    'quantidade': item.get('quantidade', 1),
-                    'imagem': dados['imagem']
-                })
-                total += preco * item.get('quantidade', 1)
-        else:
-            cursor.execute('SELECT * FROM produtos WHERE id = ?', (item['id'],))
-            dados = cursor.fetchone()
-            if dados:
-                preco = dados['preco_promocional'] if dados['promocao'] and dados['preco_promocional'] else dados['preco']
-                itens_detalhados.append({
-                    'id': dados['id'],
-                    'tipo': 'produto',
-                    'nome': dados['nome'],
-                    'preco': preco,
-                    'quantidade': item.get('quantidade', 1),
-                    'imagem': dados['imagem']
-                })
-                total += preco * item.get('quantidade', 1)
+    carrinho_precificado = precos.precificar_carrinho(carrinho_items)
     
-    conn.close()
     carrinho_count = sum(item.get('quantidade', 1) for item in carrinho_items)
     
     return render_template('carrinho.html', 
-                          itens=itens_detalhados,
-                          total=total,
+                          itens=carrinho_precificado.itens,
+                          total=carrinho_precificado.total,
                           carrinho_count=carrinho_count)
 
 @app.route('/adicionar-carrinho', methods=['POST'])
@@ -468,51 +363,16 @@ def checkout():
         flash('Seu carrinho está vazio', 'error')
         return redirect(url_for('carrinho'))
     
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    itens_detalhados = []
-    total = 0
-    
-    for item in carrinho_items:
-        if item['tipo'] == 'servico':
-            cursor.execute('SELECT * FROM servicos WHERE id = ?', (item['id'],))
-            dados = cursor.fetchone()
-            if dados:
-                preco = dados['preco_promocional'] if dados['promocao'] and dados['preco_promocional'] else dados['preco']
-                itens_detalhados.append({
-                    'id': dados['id'],
-                    'tipo': 'servico',
-                    'nome': dados['nome'],
-                    'preco': preco,
-                    'quantidade': item.get('quantidade', 1),
-                    'imagem': dados['imagem']
-                })
-                total += preco * item.get('quantidade', 1)
-        else:
-            cursor.execute('SELECT * FROM produtos WHERE id = ?', (item['id'],))
-            dados = cursor.fetchone()
-            if dados:
-                preco = dados['preco_promocional'] if dados['promocao'] and dados['preco_promocional'] else dados['preco']
-                itens_detalhados.append({
-                    'id': dados['id'],
-                    'tipo': 'produto',
-                    'nome': dados['nome'],
-                    'preco': preco,
-                    'quantidade': item.get('quantidade', 1),
-                    'imagem': dados['imagem']
-                })
-                total += preco * item.get('quantidade', 1)
+    carrinho_precificado = precos.precificar_carrinho(carrinho_items)
     
     configs = get_configuracoes()
     mercadopago_ativo = configs.get('mercadopago_ativo') == '1'
     
-    conn.close()
     carrinho_count = sum(item.get('quantidade', 1) for item in carrinho_items)
     
     return render_template('checkout.html', 
-                          itens=itens_detalhados,
-                          total=total,
+                          itens=carrinho_precificado.itens,
+                          total=carrinho_precificado.total,
                           carrinho_count=carrinho_count,
                           mercadopago_ativo=mercadopago_ativo)
 
@@ -528,171 +388,105 @@ def finalizar_pedido():
     if not carrinho_items:
         return jsonify({'success': False, 'error': 'Carrinho vazio'}), 400
     
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        itens_detalhados = []
-        total = 0
-        
-        for item in carrinho_items:
-            if item['tipo'] == 'servico':
-                cursor.execute('SELECT * FROM servicos WHERE id = ? AND ativo = 1', (item['id'],))
-                dados = cursor.fetchone()
-            else:
-                cursor.execute('SELECT * FROM produtos WHERE id = ? AND ativo = 1', (item['id'],))
-                dados = cursor.fetchone()
-            
-            if not dados:
-                conn.close()
-                return jsonify({'success': False, 'error': f'Item {item["id"]} não encontrado'}), 404
-            
-            if item['tipo'] == 'produto' and dados['estoque'] < item.get('quantidade', 1):
-                conn.close()
-                return jsonify({'success': False, 'error': f'Estoque insuficiente para {dados["nome"]}'}), 400
-            
-            preco = dados['preco_promocional'] if dados['promocao'] and dados['preco_promocional'] else dados['preco']
-            quantidade = item.get('quantidade', 1)
-            
-            itens_detalhados.append({
-                'tipo': item['tipo'],
-                'item_id': dados['id'],
-                'nome': dados['nome'],
-                'quantidade': quantidade,
-                'valor_unitario': preco,
-                'valor_total': preco * quantidade
-            })
-            
-            total += preco * quantidade
-        
-        cliente_id = session.get('cliente_id')
-        
-        status_pedido = 'aguardando_confirmacao'
-        
-        cursor.execute('''INSERT INTO pedidos (cliente_id, valor_total, status, metodo_pagamento, observacoes)
-                         VALUES (?, ?, ?, ?, ?)''',
-                       (cliente_id, total, status_pedido, metodo_pagamento, observacoes))
-        
-        pedido_id = cursor.lastrowid
-        
-        for item in itens_detalhados:
-            cursor.execute('''INSERT INTO pedidos_itens (pedido_id, tipo, item_id, nome, quantidade, 
-                             valor_unitario, valor_total) VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                          (pedido_id, item['tipo'], item['item_id'], item['nome'], 
-                           item['quantidade'], item['valor_unitario'], item['valor_total']))
-            
-            if item['tipo'] == 'produto':
-                cursor.execute('UPDATE produtos SET estoque = estoque - ? WHERE id = ?',
-                             (item['quantidade'], item['item_id']))
-        
-        conn.commit()
-        
-        session['carrinho'] = []
-        session.modified = True
-        
-        return jsonify({
-            'success': True,
-            'pedido_id': pedido_id,
-            'status': status_pedido
-        })
-        
+        pedido_id = pedidos.criar_pedido(session.get('cliente_id'), carrinho_items, metodo_pagamento, observacoes)
+    except pedidos.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except pedidos.ErroPedido as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao finalizar pedido: {e}")
         return jsonify({'success': False, 'error': 'Erro ao processar pedido'}), 500
-    finally:
-        conn.close()
+    
+    session['carrinho'] = []
+    session.modified = True
+    
+    return jsonify({
+        'success': True,
+        'pedido_id': pedido_id,
+        'status': pedidos.STATUS_INICIAL
+    })
 
 @app.route('/agendamento')
 def agendamento():
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM barbeiros WHERE ativo = 1')
-    barbeiros = cursor.fetchall()
-    
-    cursor.execute('SELECT * FROM servicos WHERE ativo = 1 ORDER BY nome')
-    servicos = cursor.fetchall()
-    
-    conn.close()
+    cat = catalogo.obter()
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     
     return render_template('agendamento.html', 
-                          barbeiros=barbeiros,
-                          servicos=servicos,
+                          barbeiros=cat.barbeiros_ativos,
+                          servicos=cat.servicos_por_nome,
                           carrinho_count=carrinho_count)
 
-@app.route('/horarios-disponiveis', methods=['POST'])
+def _parametros_horarios():
+    if request.method == 'GET':
+        return request.args
+    return request.get_json(silent=True) or {}
+
+def _resposta_condicional(dados):
+    response = jsonify(dados)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/horarios-disponiveis', methods=['GET', 'POST'])
 def horarios_disponiveis():
-    data = request.get_json()
-    barbeiro_id = data.get('barbeiro_id')
-    data_selecionada = data.get('data')
+    data = _parametros_horarios()
     
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''SELECT data_hora FROM agendamentos 
-                     WHERE barbeiro_id = ? AND DATE(data_hora) = ? AND status != 'cancelado' ''', 
-                     (barbeiro_id, data_selecionada))
-    agendamentos_existentes = [row['data_hora'] for row in cursor.fetchall()]
+    try:
+        barbeiro_id = int(data.get('barbeiro_id'))
+        horarios = disponibilidade.horarios_do_dia(barbeiro_id, data.get('data'), data.get('servico_id'))
+    except (ValueError, TypeError):
+        return jsonify({'horarios': [], 'error': 'Dados inválidos'}), 400
+    except disponibilidade.ErroDisponibilidade as e:
+        return jsonify({'horarios': [], 'error': e.mensagem}), e.status
     
-    conn.close()
+    return _resposta_condicional({'horarios': horarios})
+
+@app.route('/horarios-disponiveis/periodo', methods=['GET', 'POST'])
+def horarios_disponiveis_periodo():
+    data = _parametros_horarios()
     
-    horarios = []
-    hora_inicio = 9
-    hora_fim = 20
+    try:
+        barbeiro_id = int(data.get('barbeiro_id'))
+        dias = disponibilidade.horarios_periodo(barbeiro_id, data.get('data_inicio'), data.get('dias', 7),
+                                                data.get('servico_id'))
+    except (ValueError, TypeError):
+        return jsonify({'dias': {}, 'error': 'Dados inválidos'}), 400
+    except disponibilidade.ErroDisponibilidade as e:
+        return jsonify({'dias': {}, 'error': e.mensagem}), e.status
     
-    for hora in range(hora_inicio, hora_fim):
-        for minuto in [0, 30]:
-            horario_str = f"{data_selecionada} {hora:02d}:{minuto:02d}:00"
-            if horario_str not in agendamentos_existentes:
-                horarios.append(f"{hora:02d}:{minuto:02d}")
+    return _resposta_condicional({'dias': dias})
+
+@app.route('/horarios-disponiveis/primeiros')
+def primeiros_horarios_disponiveis():
+    try:
+        horarios = disponibilidade.primeiros_horarios(request.args.get('servico_id'), request.args.get('data_inicio'),
+                                                      request.args.get('dias', disponibilidade.MAX_DIAS_PERIODO),
+                                                      request.args.get('limite', disponibilidade.LIMITE_PRIMEIROS))
+    except (ValueError, TypeError):
+        return jsonify({'horarios': [], 'error': 'Dados inválidos'}), 400
+    except disponibilidade.ErroDisponibilidade as e:
+        return jsonify({'horarios': [], 'error': e.mensagem}), e.status
     
-    return jsonify({'horarios': horarios})
+    return _resposta_condicional({'horarios': horarios})
 
-@app.route('/api/admin/check-novos-agendamentos')
+@app.route('/api/admin/agendamentos/eventos')
 @admin_required
-def check_novos_agendamentos():
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT 
-            a.id,
-            a.data_hora,
-            c.nome as cliente_nome,
-            c.telefone as cliente_telefone,
-            s.nome as servico_nome,
-            b.nome as barbeiro_nome,
-            COALESCE(a.valor, COALESCE(s.preco_promocional, s.preco)) as valor,
-            a.observacoes,
-            a.data_criacao
-        FROM agendamentos a
-        LEFT JOIN clientes c ON a.cliente_id = c.id
-        LEFT JOIN servicos s ON a.servico_id = s.id
-        LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
-        WHERE a.status != 'cancelado'
-        AND datetime(a.data_criacao) >= datetime('now', '-15 seconds')
-        ORDER BY a.data_criacao DESC
-    ''')
-    
-    novos_agendamentos = []
-    for row in cursor.fetchall():
-        novos_agendamentos.append({
-            'id': row['id'],
-            'data_hora': row['data_hora'],
-            'cliente_nome': row['cliente_nome'],
-            'cliente_telefone': row['cliente_telefone'],
-            'servico_nome': row['servico_nome'],
-            'barbeiro_nome': row['barbeiro_nome'],
-            'valor': row['valor'],
-            'observacoes': row['observacoes'],
-            'data_criacao': row['data_criacao']
-        })
+def eventos_agendamentos():
+    ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('ultimo_id')
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        ultimo_id = None
     
-    conn.close()
+    if not eventos.reservar_conexao():
+        return jsonify({'success': False, 'error': 'Muitas conexões abertas, tente novamente em instantes',
+                        'retry': True}), 503, {'Retry-After': str(eventos.RECONEXAO_MS // 1000)}
     
-    return jsonify({'novos': novos_agendamentos})
+    response = Response(stream_with_context(eventos.transmitir(ultimo_id)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(eventos.liberar_conexao)
+    return response
 
 @app.route('/criar-agendamento', methods=['POST'])
 def criar_agendamento():
@@ -721,49 +515,18 @@ def criar_agendamento():
     except ValueError:
         return jsonify({'success': False, 'error': 'Data ou horário inválido'}), 400
     
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT preco FROM servicos WHERE id = ? AND ativo = 1', (data['servico_id'],))
-    servico = cursor.fetchone()
-    if not servico:
-        conn.close()
-        return jsonify({'success': False, 'error': 'Serviço não encontrado'}), 404
-    
-    cursor.execute('SELECT id FROM barbeiros WHERE id = ? AND ativo = 1', (data['barbeiro_id'],))
-    if not cursor.fetchone():
-        conn.close()
-        return jsonify({'success': False, 'error': 'Barbeiro não encontrado'}), 404
-    
-    data_hora = f"{data['data']} {data['horario']}:00"
-    
-    cursor.execute('''SELECT id FROM agendamentos 
-                     WHERE barbeiro_id = ? AND data_hora = ? AND status != 'cancelado' ''',
-                     (data['barbeiro_id'], data_hora))
-    if cursor.fetchone():
-        conn.close()
-        return jsonify({'success': False, 'error': 'Horário já reservado'}), 409
-    
-    valor = servico['preco']
-    observacoes = data.get('observacoes', '')[:500]
-    
-    cliente_id = session.get('cliente_id')
-    
     try:
-        cursor.execute('''INSERT INTO agendamentos (cliente_id, barbeiro_id, servico_id, data_hora, 
-                         observacoes, valor, status) VALUES (?, ?, ?, ?, ?, ?, 'agendado')''',
-                         (cliente_id, data['barbeiro_id'], data['servico_id'], data_hora, 
-                          observacoes, valor))
-        
-        agendamento_id = cursor.lastrowid
-        conn.commit()
+        agendamento_id = agendamentos.criar_agendamento(session.get('cliente_id'), int(data['barbeiro_id']),
+                                                        int(data['servico_id']), data_hora_agendamento,
+                                                        data.get('observacoes', '')[:500])
+    except agendamentos.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except agendamentos.ErroAgendamento as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
     except Exception as e:
-        conn.rollback()
-        conn.close()
+        print(f"Erro ao criar agendamento: {e}")
         return jsonify({'success': False, 'error': 'Erro ao criar agendamento'}), 500
     
-    conn.close()
-    
     session.pop('pending_agendamento', None)
     
     return jsonify({'success': True, 'agendamento_id': agendamento_id})
@@ -782,40 +545,38 @@ def historico():
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     cliente_id = session.get('cliente_id')
     
-    pedidos_com_itens = []
-    agendamentos = []
+    pedidos_com_itens, cursor_pedidos = [], None
+    lista_agendamentos, cursor_agendamentos = [], None
     
     if cliente_id:
-        conn = db.get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''SELECT * FROM pedidos
-                         WHERE cliente_id = ?
-                         ORDER BY data_criacao DESC''', (cliente_id,))
-        pedidos = cursor.fetchall()
-        
-        for pedido in pedidos:
-            cursor.execute('''SELECT * FROM pedidos_itens WHERE pedido_id = ?''', (pedido['id'],))
-            itens = cursor.fetchall()
-            pedidos_com_itens.append({
-                'pedido': dict(pedido),
-                'itens': [dict(item) for item in itens]
-            })
-        
-        cursor.execute('''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome
-                         FROM agendamentos a
-                         LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
-                         LEFT JOIN servicos s ON a.servico_id = s.id
-                         WHERE a.cliente_id = ?
-                         ORDER BY a.data_hora DESC''', (cliente_id,))
-        agendamentos = cursor.fetchall()
-        
-        conn.close()
+        pedidos_com_itens, cursor_pedidos = pedidos.listar_pedidos(cliente_id=cliente_id,
+                                                                  limite=pedidos.LIMITE_HISTORICO)
+        lista_agendamentos, cursor_agendamentos = agendamentos.listar_do_cliente(cliente_id)
     
     return render_template('historico.html', 
                           carrinho_count=carrinho_count,
                           pedidos=pedidos_com_itens,
-                          agendamentos=agendamentos)
+                          agendamentos=lista_agendamentos,
+                          cursor_pedidos=cursor_pedidos,
+                          cursor_agendamentos=cursor_agendamentos)
+
+@app.route('/api/historico/<tipo>')
+def api_historico(tipo):
+    cliente_id = session.get('cliente_id')
+    if not cliente_id:
+        return jsonify({'success': False, 'error': 'Faça login para ver seu histórico'}), 401
+    
+    cursor_paginacao = request.args.get('cursor')
+    
+    if tipo == 'pedidos':
+        itens, proximo_cursor = pedidos.listar_pedidos(cliente_id=cliente_id, cursor_paginacao=cursor_paginacao,
+                                                       limite=pedidos.LIMITE_HISTORICO)
+    elif tipo == 'agendamentos':
+        itens, proximo_cursor = agendamentos.listar_do_cliente(cliente_id, cursor_paginacao)
+    else:
+        return jsonify({'success': False, 'error': 'Tipo de histórico inválido'}), 404
+    
+    return jsonify({'success': True, 'itens': itens, 'proximo_cursor': proximo_cursor})
 
 @app.route('/admin/logout')
 def admin_logout():
@@ -831,20 +592,18 @@ def admin():
     hoje = datetime.now().strftime('%Y-%m-%d')
     data_filtro = request.args.get('data', None)
     
-    cursor.execute('''SELECT COUNT(*) as total FROM agendamentos 
-                     WHERE DATE(data_hora) = ? AND status != 'cancelado' ''', (hoje,))
-    agendamentos_hoje = cursor.fetchone()['total']
-    
-    cursor.execute('''SELECT SUM(valor_total) as total FROM vendas 
-                     WHERE DATE(data_venda) = ?''', (hoje,))
-    faturamento = cursor.fetchone()
-    faturamento_hoje = faturamento['total'] if faturamento['total'] else 0
+    resumo_hoje = resumos.do_dia(hoje, conn)
+    agendamentos_hoje = resumo_hoje['agendamentos']
+    faturamento_hoje = resumo_hoje['faturamento']
+    total_clientes = resumos.total_clientes(conn)
     
-    cursor.execute('SELECT COUNT(*) as total FROM clientes')
-    total_clientes = cursor.fetchone()['total']
+    estoque_alerta = estoque.alertas(conn)
+    produtos_baixo_estoque = len(estoque_alerta)
     
-    cursor.execute('SELECT COUNT(*) as total FROM produtos WHERE estoque <= estoque_minimo')
-    produtos_baixo_estoque = cursor.fetchone()['total']
+    try:
+        inicio_filtro, fim_filtro = db.intervalo_do_dia(data_filtro) if data_filtro else (None, None)
+    except ValueError:
+        data_filtro = None
     
     if data_filtro:
         cursor.execute('''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome, 
@@ -854,8 +613,8 @@ def admin():
                          LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
                          LEFT JOIN servicos s ON a.servico_id = s.id
                          LEFT JOIN clientes c ON a.cliente_id = c.id
-                         WHERE DATE(a.data_hora) = ? AND a.status != 'cancelado'
-                         ORDER BY a.data_hora''', (data_filtro,))
+                         WHERE a.data_hora >= ? AND a.data_hora < ? AND a.status != 'cancelado'
+                         ORDER BY a.data_hora''', (inicio_filtro, fim_filtro))
     else:
         cursor.execute('''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome, 
                          c.nome as cliente_nome,
@@ -864,13 +623,10 @@ def admin():
                          LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
                          LEFT JOIN servicos s ON a.servico_id = s.id
                          LEFT JOIN clientes c ON a.cliente_id = c.id
-                         WHERE DATE(a.data_hora) >= ? AND a.status != 'cancelado'
+                         WHERE a.data_hora >= ? AND a.status != 'cancelado'
                          ORDER BY a.data_hora''', (hoje,))
     
-    agendamentos = cursor.fetchall()
-    
-    cursor.execute('SELECT * FROM produtos WHERE estoque <= estoque_minimo')
-    estoque_alerta = cursor.fetchall()
+    lista_agendamentos = cursor.fetchall()
     
     conn.close()
     
@@ -879,10 +635,12 @@ def admin():
                           faturamento_hoje=faturamento_hoje,
                           total_clientes=total_clientes,
                           produtos_baixo_estoque=produtos_baixo_estoque,
-                          agendamentos=agendamentos,
+                          agendamentos=lista_agendamentos,
                           estoque_alerta=estoque_alerta,
+                          fila_virtual=fila.obter(),
                           data_filtro=data_filtro,
-                          hoje=hoje)
+                          hoje=hoje,
+                          reconexao_eventos_ms=eventos.RECONEXAO_MS)
 
 @app.route('/admin/servicos')
 @admin_required
@@ -973,7 +731,9 @@ def atualizar_comissao_barbeiro():
                          SET comissao_tipo = ?, comissao_valor = ? 
                          WHERE id = ?''',
                       (comissao_tipo, comissao_valor_float, barbeiro_id))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
+        catalogo.invalidar()
         flash('Comissão atualizada com sucesso!', 'success')
     except Exception as e:
         conn.rollback()
@@ -994,7 +754,7 @@ def admin_configuracoes():
             'nome_barbearia', 'logo_emoji', 'logo_url', 'horario_abertura', 'horario_fechamento',
             'telefone', 'whatsapp', 'email', 'endereco', 'cidade', 'estado', 'cep',
             'instagram', 'facebook', 'descricao', 'tempo_atendimento', 'status_aberto',
-            'dias_funcionamento', 'mercadopago_ativo'
+            'dias_funcionamento', 'mercadopago_ativo', 'margem_falta_horas'
         ]
         
         try:
@@ -1004,7 +764,10 @@ def admin_configuracoes():
                                  ON CONFLICT(chave) DO UPDATE SET valor = ?''',
                              (campo, valor, valor))
             
+            db.incrementar_versao(cursor, 'configuracoes')
             conn.commit()
+            cache.configuracoes.invalidar()
+            g.pop('configuracoes', None)
             flash('Configurações atualizadas com sucesso!', 'success')
         except Exception as e:
             conn.rollback()
@@ -1014,13 +777,9 @@ def admin_configuracoes():
         
         return redirect(url_for('admin_configuracoes'))
     
-    cursor.execute('SELECT * FROM configuracoes')
-    configs_raw = cursor.fetchall()
     conn.close()
     
-    configs = {}
-    for config in configs_raw:
-        configs[config['chave']] = config['valor']
+    configs = get_configuracoes()
     
     mercadopago_configured = bool(os.getenv('MERCADOPAGO_ACCESS_TOKEN'))
     
@@ -1031,28 +790,25 @@ def admin_configuracoes():
 @app.route('/admin/pedidos')
 @admin_required
 def admin_pedidos():
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''SELECT p.*, c.nome as cliente_nome, c.telefone as cliente_telefone
-                     FROM pedidos p
-                     LEFT JOIN clientes c ON p.cliente_id = c.id
-                     ORDER BY p.data_criacao DESC
-                     LIMIT 100''')
-    pedidos = cursor.fetchall()
-    
-    pedidos_com_itens = []
-    for pedido in pedidos:
-        cursor.execute('''SELECT * FROM pedidos_itens WHERE pedido_id = ?''', (pedido['id'],))
-        itens = cursor.fetchall()
-        pedidos_com_itens.append({
-            'pedido': dict(pedido),
-            'itens': [dict(item) for item in itens]
-        })
+    filtros = {
+        'status': request.args.get('status', '').strip(),
+        'metodo_pagamento': request.args.get('metodo_pagamento', '').strip(),
+        'data_inicio': request.args.get('data_inicio', '').strip(),
+        'data_fim': request.args.get('data_fim', '').strip(),
+    }
     
-    conn.close()
+    try:
+        pedidos_com_itens, proximo_cursor = pedidos.listar_pedidos(cursor_paginacao=request.args.get('cursor'),
+                                                                  **filtros)
+    except ValueError:
+        flash('Data inválida no filtro', 'error')
+        return redirect(url_for('admin_pedidos'))
     
-    return render_template('admin/pedidos.html', pedidos=pedidos_com_itens)
+    return render_template('admin/pedidos.html',
+                          pedidos=pedidos_com_itens,
+                          filtros=filtros,
+                          proximo_cursor=proximo_cursor,
+                          barbeiros=catalogo.obter().barbeiros_ativos)
 
 @app.route('/admin/confirmar-pagamento', methods=['POST'])
 @admin_required
@@ -1063,40 +819,17 @@ def admin_confirmar_pagamento():
     if not pedido_id:
         return jsonify({'success': False, 'error': 'ID do pedido não fornecido'}), 400
     
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''SELECT * FROM pedidos 
-                         WHERE id = ? AND status = 'aguardando_confirmacao' ''', (pedido_id,))
-        pedido = cursor.fetchone()
-        
-        if not pedido:
-            conn.close()
-            return jsonify({'success': False, 'error': 'Pedido não encontrado ou já confirmado'}), 404
-        
-        cursor.execute('''UPDATE pedidos SET status = 'pago', data_atualizacao = CURRENT_TIMESTAMP
-                         WHERE id = ?''', (pedido_id,))
-        
-        cursor.execute('''SELECT * FROM pedidos_itens WHERE pedido_id = ?''', (pedido_id,))
-        itens = cursor.fetchall()
-        
-        for item in itens:
-            cursor.execute('''INSERT INTO vendas (cliente_id, tipo, item_id, quantidade, 
-                             valor_unitario, valor_total, metodo_pagamento, status)
-                             VALUES (?, ?, ?, ?, ?, ?, ?, 'concluido')''',
-                          (pedido['cliente_id'], item['tipo'], item['item_id'], 
-                           item['quantidade'], item['valor_unitario'], item['valor_total'],
-                           pedido['metodo_pagamento']))
-        
-        conn.commit()
-        return jsonify({'success': True})
+        pedidos.confirmar_pagamento(pedido_id, data.get('barbeiro_id') or None)
+    except pedidos.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except pedidos.ErroPedido as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao confirmar pagamento: {e}")
         return jsonify({'success': False, 'error': 'Erro ao confirmar pagamento'}), 500
-    finally:
-        conn.close()
+    
+    return jsonify({'success': True})
 
 @app.route('/admin/cancelar-pedido', methods=['POST'])
 @admin_required
@@ -1107,35 +840,194 @@ def admin_cancelar_pedido():
     if not pedido_id:
         return jsonify({'success': False, 'error': 'ID do pedido não fornecido'}), 400
     
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('SELECT * FROM pedidos_itens WHERE pedido_id = ?', (pedido_id,))
-        itens = cursor.fetchall()
-        
-        for item in itens:
-            if item['tipo'] == 'produto':
-                cursor.execute('UPDATE produtos SET estoque = estoque + ? WHERE id = ?',
-                             (item['quantidade'], item['item_id']))
-        
-        cursor.execute('''UPDATE pedidos SET status = 'cancelado', data_atualizacao = CURRENT_TIMESTAMP
-                         WHERE id = ?''', (pedido_id,))
-        
-        conn.commit()
-        return jsonify({'success': True})
+        pedidos.cancelar_pedido(pedido_id)
+    except pedidos.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except pedidos.ErroPedido as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao cancelar pedido: {e}")
         return jsonify({'success': False, 'error': 'Erro ao cancelar pedido'}), 500
-    finally:
-        conn.close()
+    
+    return jsonify({'success': True})
 
 @app.route('/contato')
 def contato():
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     return render_template('contato.html', carrinho_count=carrinho_count)
 
+@app.route('/fila')
+def fila_virtual():
+    carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
+    fila_atual = fila.obter()
+    
+    minha_situacao = None
+    if session.get('fila_id'):
+        try:
+            minha_situacao = fila.situacao(session['fila_id'])
+        except fila.EntradaNaoEncontrada:
+            session.pop('fila_id', None)
+    
+    return render_template('fila.html',
+                          total_fila=len(fila_atual),
+                          espera_minutos=fila_atual.espera_minutos(),
+                          minha_situacao=minha_situacao,
+                          servicos=catalogo.obter().servicos_por_nome,
+                          carrinho_count=carrinho_count,
+                          reconexao_eventos_ms=eventos.RECONEXAO_MS)
+
+@app.route('/fila/entrar', methods=['POST'])
+def entrar_fila():
+    data = request.get_json() or {}
+    
+    try:
+        entrada_id = fila.entrar(data.get('cliente_nome') or session.get('cliente_nome'),
+                                 data.get('cliente_telefone') or session.get('cliente_telefone'),
+                                 data.get('servico_id'))
+    except fila.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except fila.ErroFila as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'error': 'Dados inválidos'}), 400
+    
+    session['fila_id'] = entrada_id
+    return jsonify({'success': True, 'id': entrada_id, **fila.situacao(entrada_id)})
+
+@app.route('/fila/sair', methods=['POST'])
+def sair_fila():
+    if not session.get('fila_id'):
+        return jsonify({'success': False, 'error': 'Você não está na fila'}), 404
+    
+    try:
+        fila.sair(session['fila_id'])
+    except fila.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except fila.ErroFila as e:
+        session.pop('fila_id', None)
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    session.pop('fila_id', None)
+    return jsonify({'success': True})
+
+@app.route('/fila/situacao')
+def situacao_fila():
+    if not session.get('fila_id'):
+        return jsonify({'success': False, 'error': 'Você não está na fila'}), 404
+    
+    try:
+        return _resposta_condicional({'success': True, **fila.situacao(session['fila_id'])})
+    except fila.EntradaNaoEncontrada as e:
+        session.pop('fila_id', None)
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+
+@app.route('/fila/eventos')
+def eventos_fila():
+    if not session.get('fila_id'):
+        return jsonify({'success': False, 'error': 'Você não está na fila'}), 404
+    
+    if not eventos.reservar_conexao():
+        return jsonify({'success': False, 'error': 'Muitas conexões abertas, tente novamente em instantes',
+                        'retry': True}), 503, {'Retry-After': str(eventos.RECONEXAO_MS // 1000)}
+    
+    response = Response(stream_with_context(fila.transmitir(session['fila_id'])), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(eventos.liberar_conexao)
+    return response
+
+@app.route('/admin/api/agendamentos/<int:agendamento_id>/status', methods=['POST'])
+@admin_required
+def admin_alterar_status_agendamento(agendamento_id):
+    data = request.get_json() or {}
+    
+    try:
+        agendamentos.alterar_status(agendamento_id, data.get('status'))
+    except agendamentos.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except agendamentos.ErroAgendamento as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    return jsonify({'success': True})
+
+@app.route('/admin/api/fila')
+@admin_required
+def admin_listar_fila():
+    fila_atual = fila.obter()
+    return jsonify({
+        'success': True,
+        'espera_minutos': fila_atual.espera_minutos(),
+        'fila': [dict(entrada, posicao_atual=indice + 1) for indice, entrada in enumerate(fila_atual.entradas)]
+    })
+
+@app.route('/admin/api/fila/chamar', methods=['POST'])
+@admin_required
+def admin_chamar_fila():
+    try:
+        entrada = fila.chamar_proximo()
+    except fila.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except fila.ErroFila as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    return jsonify({'success': True, 'chamado': entrada})
+
+@app.route('/admin/api/relatorios/<nome>')
+@admin_required
+def admin_relatorio(nome):
+    opcoes = {'agrupar': request.args.get('agrupar', 'dia')} if nome == 'faturamento' else {}
+    
+    try:
+        periodo, resultado = relatorios.gerar(nome, request.args.get('data_inicio'), request.args.get('data_fim'),
+                                              **opcoes)
+    except relatorios.ErroRelatorio as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    return jsonify({'success': True, 'periodo': periodo.como_dict(), 'relatorio': resultado})
+
+def _periodo_comissao(dados):
+    if dados.get('mes'):
+        return comissoes.periodo_do_mes(dados.get('mes'))
+    return dados.get('data_inicio'), dados.get('data_fim')
+
+@app.route('/admin/api/comissoes')
+@admin_required
+def admin_comissoes():
+    try:
+        fechamento, extratos = comissoes.extratos(*_periodo_comissao(request.args))
+    except comissoes.ErroComissao as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    return jsonify({'success': True, 'fechado': fechamento is not None, 'fechamento': fechamento,
+                    'extratos': extratos})
+
+@app.route('/admin/api/comissoes/fechar', methods=['POST'])
+@admin_required
+def admin_fechar_comissoes():
+    try:
+        fechamento, extratos = comissoes.fechar(*_periodo_comissao(request.get_json() or {}))
+    except comissoes.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except comissoes.ErroComissao as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    return jsonify({'success': True, 'fechamento': fechamento, 'extratos': extratos})
+
+@app.route('/admin/exportar/<nome>')
+@admin_required
+def admin_exportar(nome):
+    try:
+        linhas, mimetype, arquivo = exportacoes.exportar(nome, request.args.get('formato', 'csv'),
+                                                         request.args.get('data_inicio'),
+                                                         request.args.get('data_fim'),
+                                                         request.args.get('status'))
+    except exportacoes.ErroExportacao as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    return Response(stream_with_context(linhas), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{arquivo}"',
+                             'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+
 @app.route('/login-cliente', methods=['GET', 'POST'])
 def login_cliente():
     carrinho = session.get('carrinho') or []
@@ -1328,21 +1220,14 @@ def perfil():
     cursor.execute('SELECT * FROM clientes WHERE id = ?', (session['cliente_id'],))
     cliente = cursor.fetchone()
     
-    cursor.execute('''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome
-                     FROM agendamentos a
-                     LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
-                     LEFT JOIN servicos s ON a.servico_id = s.id
-                     WHERE a.cliente_id = ?
-                     ORDER BY a.data_hora DESC
-                     LIMIT 10''', (session['cliente_id'],))
-    agendamentos = cursor.fetchall()
-    
     conn.close()
+    
+    ultimos_agendamentos, _ = agendamentos.listar_do_cliente(session['cliente_id'])
     carrinho_count = sum(item.get('quantidade', 1) for item in session.get('carrinho', []))
     
     return render_template('perfil.html', 
                           cliente=cliente, 
-                          agendamentos=agendamentos,
+                          agendamentos=ultimos_agendamentos,
                           carrinho_count=carrinho_count)
 
 @app.route('/admin/api/produtos', methods=['POST'])
@@ -1367,8 +1252,10 @@ def criar_produto():
         cursor.execute('''INSERT INTO produtos (nome, descricao, preco, estoque, estoque_minimo, categoria_id, imagem, ativo)
                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
                       (nome, descricao, preco, estoque, estoque_minimo, categoria_id if categoria_id else None, imagem, ativo))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Produto adicionado com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1397,8 +1284,10 @@ def editar_produto(id):
         cursor.execute('''UPDATE produtos SET nome=?, descricao=?, preco=?, estoque=?, estoque_minimo=?, 
                          categoria_id=?, imagem=?, ativo=? WHERE id=?''',
                       (nome, descricao, preco, estoque, estoque_minimo, categoria_id if categoria_id else None, imagem, ativo, id))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Produto atualizado com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1412,8 +1301,10 @@ def deletar_produto(id):
         conn = db.get_db_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM produtos WHERE id = ?', (id,))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Produto deletado com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1441,8 +1332,10 @@ def criar_servico():
         cursor.execute('''INSERT INTO servicos (nome, descricao, preco, duracao_minutos, categoria_id, imagem, ativo)
                          VALUES (?, ?, ?, ?, ?, ?, ?)''',
                       (nome, descricao, preco, duracao_minutos, categoria_id if categoria_id else None, imagem, ativo))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Serviço adicionado com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1470,8 +1363,10 @@ def editar_servico(id):
         cursor.execute('''UPDATE servicos SET nome=?, descricao=?, preco=?, duracao_minutos=?, 
                          categoria_id=?, imagem=?, ativo=? WHERE id=?''',
                       (nome, descricao, preco, duracao_minutos, categoria_id if categoria_id else None, imagem, ativo, id))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Serviço atualizado com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1485,14 +1380,40 @@ def deletar_servico(id):
         conn = db.get_db_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM servicos WHERE id = ?', (id,))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Serviço deletado com sucesso!', 'success')
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/admin/api/catalogo/importar/<tipo>', methods=['POST'])
+@admin_required
+def importar_catalogo(tipo):
+    simular = (request.args.get('simular') or request.form.get('simular')) in ('1', 'true', 'sim')
+    arquivo = request.files.get('arquivo')
+    
+    try:
+        if arquivo:
+            formato = request.form.get('formato') or arquivo.filename.rsplit('.', 1)[-1].lower()
+            linhas = importacao.ler_arquivo(arquivo.read(), formato)
+        elif request.is_json:
+            linhas = importacao.ler_arquivo(request.get_data(), 'json')
+        else:
+            linhas = importacao.ler_arquivo(request.get_data(), 'csv')
+        relatorio = importacao.importar(tipo, linhas, simular)
+    except importacao.BancoOcupado as e:
+        return jsonify({'success': False, 'error': e.mensagem, 'retry': True}), e.status, {'Retry-After': '1'}
+    except importacao.ErroImportacao as e:
+        return jsonify({'success': False, 'error': e.mensagem}), e.status
+    
+    if relatorio['erros']:
+        return jsonify(dict(relatorio, success=False, error='Corrija os erros e envie novamente')), 400
+    return jsonify(dict(relatorio, success=True))
+
 @app.route('/admin/categorias')
 @admin_required
 def admin_categorias():
@@ -1522,8 +1443,10 @@ def criar_categoria():
         cursor.execute('''INSERT INTO categorias (nome, descricao, tipo, icone, ativo)
                          VALUES (?, ?, ?, ?, ?)''',
                       (nome, descricao, tipo, icone, ativo))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Categoria adicionada com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1548,8 +1471,10 @@ def editar_categoria(id):
         cursor = conn.cursor()
         cursor.execute('''UPDATE categorias SET nome=?, descricao=?, tipo=?, icone=?, ativo=? WHERE id=?''',
                       (nome, descricao, tipo, icone, ativo, id))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Categoria atualizada com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1563,8 +1488,10 @@ def deletar_categoria(id):
         conn = db.get_db_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM categorias WHERE id = ?', (id,))
+        catalogo.marcar_alterado(cursor)
         conn.commit()
         conn.close()
+        catalogo.invalidar()
         
         flash('Categoria deletada com sucesso!', 'success')
         return jsonify({'success': True})
@@ -1609,5 +1536,6 @@ def currency_filter(value):
     return f"R$ {value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
 if __name__ == '__main__':
+    agendador.iniciar()
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,410 @@
+import http.server
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import database as db
+import agendamentos
+import busca
+import catalogo
+import comissoes
+import exportacoes
+import notificacoes
+import pedidos
+import relatorios
+
+def _cliente_concorrente(caminho, barrier, horarios, fila):
+    db.DB_PATH = caminho
+    sucessos = conflitos = ocupados = 0
+    barrier.wait()
+    for barbeiro_id, data_hora in horarios:
+        try:
+            agendamentos.criar_agendamento(None, barbeiro_id, 1, data_hora, '')
+            sucessos += 1
+        except agendamentos.HorarioIndisponivel:
+            conflitos += 1
+        except agendamentos.BancoOcupado:
+            ocupados += 1
+    fila.put((sucessos, conflitos, ocupados))
+
+def _disparar(caminho, lotes):
+    contexto = multiprocessing.get_context('fork')
+    fila = contexto.Queue()
+    barrier = contexto.Barrier(len(lotes))
+    workers = [contexto.Process(target=_cliente_concorrente, args=(caminho, barrier, lote, fila)) for lote in lotes]
+    inicio = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    resultados = [fila.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    duracao = time.perf_counter() - inicio
+    return [sum(coluna) for coluna in zip(*resultados)], duracao
+
+def concorrencia_agendamentos(processos=8, tentativas=50):
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'concorrencia.db')
+        db.DB_PATH = caminho
+        db.aplicar_migracoes()
+        conn = db.get_db_connection()
+        conn.execute("UPDATE configuracoes SET valor = '1,2,3,4,5,6,7' WHERE chave = 'dias_funcionamento'")
+        conn.commit()
+        db.fechar_conexao()
+        
+        base = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time()).replace(hour=10)
+        total = processos * tentativas
+        
+        mesmo_horario = [[(1, base)] * tentativas for _ in range(processos)]
+        (sucessos, conflitos, ocupados), duracao = _disparar(caminho, mesmo_horario)
+        print(f'Mesmo horário: {total} tentativas em {processos} processos')
+        print(f'sucessos={sucessos} conflitos={conflitos} ocupados={ocupados} ({total / duracao:.0f} tentativas/s)')
+        if sucessos != 1:
+            raise SystemExit('Reserva duplicada detectada')
+        
+        horarios_distintos = [[(1, base + timedelta(days=1 + processo * tentativas + indice))
+                               for indice in range(tentativas)] for processo in range(processos)]
+        (sucessos, conflitos, ocupados), duracao = _disparar(caminho, horarios_distintos)
+        print(f'Horários distintos: sucessos={sucessos} conflitos={conflitos} ocupados={ocupados} '
+              f'({sucessos / duracao:.0f} agendamentos/s)')
+        
+        conn = db.get_db_connection()
+        duplicados = conn.execute('''SELECT COUNT(*) as total FROM (
+                                        SELECT 1 FROM agendamentos WHERE status != 'cancelado'
+                                        GROUP BY barbeiro_id, data_hora HAVING COUNT(*) > 1)''').fetchone()['total']
+        db.fechar_conexao()
+        if duplicados:
+            raise SystemExit('Reserva duplicada detectada')
+        print('Nenhuma reserva duplicada.')
+
+def _comprador(caminho, produto_id, tentativas, fila):
+    db.DB_PATH = caminho
+    sucessos = esgotados = ocupados = 0
+    for _ in range(tentativas):
+        try:
+            pedidos.criar_pedido(None, [{'tipo': 'produto', 'id': produto_id, 'quantidade': 1}], 'pix', '')
+            sucessos += 1
+        except pedidos.BancoOcupado:
+            ocupados += 1
+        except pedidos.EstoqueInsuficiente:
+            esgotados += 1
+    fila.put((sucessos, esgotados, ocupados))
+
+def estresse_pedidos(processos=8, tentativas=50, estoque=100):
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'estresse.db')
+        db.DB_PATH = caminho
+        db.aplicar_migracoes()
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''INSERT INTO produtos (nome, preco, estoque, estoque_minimo, ativo)
+                         VALUES ('Produto Estresse', 10.0, ?, 0, 1)''', (estoque,))
+        produto_id = cursor.lastrowid
+        conn.commit()
+        db.fechar_conexao()
+        
+        contexto = multiprocessing.get_context('fork')
+        fila = contexto.Queue()
+        inicio = time.perf_counter()
+        workers = [contexto.Process(target=_comprador, args=(caminho, produto_id, tentativas, fila))
+                   for _ in range(processos)]
+        for worker in workers:
+            worker.start()
+        resultados = [fila.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        duracao = time.perf_counter() - inicio
+        
+        sucessos = sum(r[0] for r in resultados)
+        esgotados = sum(r[1] for r in resultados)
+        ocupados = sum(r[2] for r in resultados)
+        
+        conn = db.get_db_connection()
+        estoque_final = conn.execute('SELECT estoque FROM produtos WHERE id = ?', (produto_id,)).fetchone()['estoque']
+        vendidos = conn.execute('''SELECT COALESCE(SUM(quantidade), 0) as total FROM pedidos_itens
+                                  WHERE tipo = 'produto' AND item_id = ?''', (produto_id,)).fetchone()['total']
+        db.fechar_conexao()
+        
+        total = processos * tentativas
+        print(f'{processos} processos x {tentativas} tentativas, estoque inicial {estoque}')
+        print(f'sucessos={sucessos} esgotados={esgotados} ocupados={ocupados}')
+        print(f'estoque final={estoque_final} itens vendidos={vendidos}')
+        print(f'{total / duracao:.0f} tentativas/s, {sucessos / duracao:.0f} pedidos/s')
+        
+        if estoque_final < 0 or vendidos != sucessos or estoque_final != estoque - sucessos:
+            raise SystemExit('Venda acima do estoque detectada')
+        print('Nenhuma venda acima do estoque.')
+
+def desempenho_busca(tamanhos=(1000, 10000, 50000), repeticoes=200):
+    palavras = ['corte', 'degradê', 'barba', 'pomada', 'óleo', 'navalha', 'tesoura', 'platinado',
+                'hidratação', 'cera', 'balm', 'shampoo', 'modeladora', 'clássico', 'premium', 'kit']
+    consultas = ['degrade', 'barba', 'oleo hidrat', 'po', 'navalha premium', 'xyz']
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        db.DB_PATH = os.path.join(pasta, 'benchmark.db')
+        db.aplicar_migracoes()
+        conn = db.get_db_connection()
+        
+        linhas = []
+        for i in range(200):
+            nome = f'{palavras[i % len(palavras)]} {palavras[(i * 7) % len(palavras)]}'
+            descricao = ' '.join(palavras[(i * k) % len(palavras)] for k in range(3, 6))
+            linhas.append((nome, descricao, 10.0, 10, 5, 1))
+        conn.executemany('''INSERT INTO produtos (nome, descricao, preco, estoque, estoque_minimo, ativo)
+                           VALUES (?, ?, ?, ?, ?, ?)''', linhas)
+        conn.commit()
+        inseridos = 200
+        
+        for tamanho in tamanhos:
+            linhas = [(f'Item {i} fornecedor{i % 997}', f'Referência sku{i} lote{i % 311}', 10.0, 10, 5, 1)
+                      for i in range(inseridos, tamanho)]
+            conn.executemany('''INSERT INTO produtos (nome, descricao, preco, estoque, estoque_minimo, ativo)
+                               VALUES (?, ?, ?, ?, ?, ?)''', linhas)
+            conn.commit()
+            inseridos = tamanho
+            
+            for consulta in consultas:
+                inicio = time.perf_counter()
+                for _ in range(repeticoes):
+                    busca.buscar(consulta)
+                media_ms = (time.perf_counter() - inicio) / repeticoes * 1000
+                print(f'{tamanho:>7} itens  {consulta!r:<18} {media_ms:7.3f} ms')
+        
+        db.fechar_conexao()
+
+def fechamento_comissoes(barbeiros=50, atendimentos=200_000):
+    with tempfile.TemporaryDirectory() as pasta:
+        db.DB_PATH = os.path.join(pasta, 'comissoes.db')
+        db.aplicar_migracoes()
+        conn = db.get_db_connection()
+        conn.executemany('''INSERT INTO barbeiros (nome, especialidade, comissao_tipo, comissao_valor, ativo)
+                           VALUES (?, 'Teste', ?, ?, 1)''',
+                         [(f'Barbeiro {indice:02d}', 'fixa' if indice % 5 == 0 else 'percentual',
+                           15.0 if indice % 5 == 0 else 40.0) for indice in range(barbeiros)])
+        ids = [row['id'] for row in conn.execute('SELECT id FROM barbeiros')]
+        inicio = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        inicio = inicio.replace(day=1)
+        
+        aleatorio = random.Random(11)
+        conn.executemany('''INSERT INTO vendas (barbeiro_id, tipo, item_id, quantidade, valor_unitario, valor_total,
+                           metodo_pagamento, data_venda) VALUES (?, ?, 1, 1, 40, 40, 'pix', ?)''',
+                         [(aleatorio.choice(ids), aleatorio.choice(('produto', 'servico')),
+                           (inicio + timedelta(minutes=aleatorio.randrange(28 * 24 * 60))).strftime('%Y-%m-%d %H:%M:%S'))
+                          for _ in range(atendimentos)])
+        conn.executemany('''INSERT INTO agendamentos (cliente_id, barbeiro_id, servico_id, data_hora, status, valor)
+                           VALUES (1, ?, 1, ?, ?, 50)''',
+                         [(barbeiro_id, (inicio + timedelta(days=dia, minutes=slot * 5)).strftime('%Y-%m-%d %H:%M:%S'),
+                           aleatorio.choice(('concluido', 'concluido', 'cancelado', 'falta')))
+                          for barbeiro_id in ids for dia in range(28) for slot in range(atendimentos // barbeiros // 28)])
+        conn.commit()
+        
+        mes = inicio.strftime('%Y-%m')
+        esperado = conn.execute('''SELECT b.id, b.comissao_tipo, b.comissao_valor,
+                                  (SELECT COALESCE(SUM(valor_total), 0) FROM vendas v WHERE v.barbeiro_id = b.id)
+                                      + (SELECT COALESCE(SUM(valor), 0) FROM agendamentos a
+                                         WHERE a.barbeiro_id = b.id AND a.status = 'concluido') as base,
+                                  (SELECT COUNT(*) FROM vendas v WHERE v.barbeiro_id = b.id AND v.tipo = 'servico')
+                                      + (SELECT COUNT(*) FROM agendamentos a
+                                         WHERE a.barbeiro_id = b.id AND a.status = 'concluido') as itens
+                                  FROM barbeiros b''').fetchall()
+        esperado = round(sum(row['comissao_valor'] * row['itens'] if row['comissao_tipo'] == 'fixa'
+                             else row['base'] * row['comissao_valor'] / 100 for row in esperado), 2)
+        conn.close()
+        
+        comeco = time.perf_counter()
+        fechamento, lista = comissoes.fechar(*comissoes.periodo_do_mes(mes))
+        tempo_fechamento = (time.perf_counter() - comeco) * 1000
+        comeco = time.perf_counter()
+        armazenado, lista_armazenada = comissoes.extratos(*comissoes.periodo_do_mes(mes))
+        tempo_consulta = (time.perf_counter() - comeco) * 1000
+        try:
+            comissoes.fechar(*comissoes.periodo_do_mes(mes))
+            refechado = True
+        except comissoes.PeriodoFechado:
+            refechado = False
+        db.fechar_conexao()
+    
+    print(f'{len(lista)} barbeiros, {atendimentos} vendas e agendamentos em {mes}')
+    print(f'fechamento em {tempo_fechamento:.1f} ms, extrato armazenado lido em {tempo_consulta:.1f} ms')
+    print(f"total esperado={esperado} fechado={fechamento['valor_total']}")
+    if (abs(esperado - fechamento['valor_total']) > 0.01 or refechado or armazenado['id'] != fechamento['id']
+            or lista_armazenada != lista):
+        raise SystemExit('Fechamento de comissões incorreto')
+    print('Fechamento calculado em uma passada e armazenado.')
+
+def memoria_exportacoes(total=300_000):
+    with tempfile.TemporaryDirectory() as pasta:
+        db.DB_PATH = os.path.join(pasta, 'exportacoes.db')
+        db.aplicar_migracoes()
+        conn = db.get_db_connection()
+        conn.executemany('''INSERT INTO vendas (cliente_id, barbeiro_id, tipo, item_id, quantidade, valor_unitario,
+                           valor_total, metodo_pagamento, data_venda) VALUES (1, 1, 'produto', 1, 1, 35, 35, 'pix', ?)''',
+                         [(f'2025-{indice % 12 + 1:02d}-{indice % 28 + 1:02d} 10:00:00',) for indice in range(total)])
+        conn.commit()
+        
+        for formato in exportacoes.FORMATOS:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            linhas, _, _ = exportacoes.exportar('vendas', formato)
+            primeiro = next(linhas)
+            primeiro_byte_ms = (time.perf_counter() - inicio) * 1000
+            tamanho, contagem = len(primeiro), primeiro.count('\n')
+            for pedaco in linhas:
+                tamanho += len(pedaco)
+                contagem += pedaco.count('\n')
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            esperado = total + (1 if formato == 'csv' else 0)
+            print(f'{formato}: {contagem} linhas, {tamanho / 1e6:.1f} MB em {time.perf_counter() - inicio:.1f}s, '
+                  f'primeiro pedaço em {primeiro_byte_ms:.1f} ms, pico de memória {pico / 1e6:.1f} MB')
+            if contagem != esperado or pico > 16e6:
+                raise SystemExit('Exportação incompleta ou com memória proporcional ao tamanho')
+        db.fechar_conexao()
+
+def desempenho_relatorios(total=1_000_000):
+    with tempfile.TemporaryDirectory() as pasta:
+        db.DB_PATH = os.path.join(pasta, 'relatorios.db')
+        db.aplicar_migracoes()
+        conn = db.get_db_connection()
+        cat = catalogo.obter()
+        barbeiros = [b['id'] for b in cat.barbeiros_ativos]
+        produtos = list(cat.produtos_por_id)
+        servicos = list(cat.servicos_por_id)
+        inicio = datetime(datetime.now().year - 1, 1, 1)
+        
+        aleatorio = random.Random(7)
+        linhas = []
+        for _ in range(total):
+            tipo = aleatorio.choice(('produto', 'servico'))
+            quantidade = aleatorio.randint(1, 3)
+            preco = aleatorio.choice((25.0, 35.0, 45.0, 60.0))
+            linhas.append((aleatorio.choice(barbeiros), tipo,
+                           aleatorio.choice(produtos if tipo == 'produto' else servicos), quantidade, preco,
+                           preco * quantidade, aleatorio.choice(('pix', 'cartao', 'dinheiro')),
+                           (inicio + timedelta(minutes=aleatorio.randrange(365 * 24 * 60))).strftime('%Y-%m-%d %H:%M:%S')))
+        carga = time.perf_counter()
+        conn.executemany('''INSERT INTO vendas (barbeiro_id, tipo, item_id, quantidade, valor_unitario, valor_total,
+                           metodo_pagamento, data_venda) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', linhas)
+        conn.commit()
+        carga = time.perf_counter() - carga
+        esperado = conn.execute("SELECT ROUND(SUM(valor_total), 2) FROM vendas").fetchone()[0]
+        conn.close()
+        
+        data_inicio, data_fim = inicio.strftime('%Y-%m-%d'), (inicio + timedelta(days=364)).strftime('%Y-%m-%d')
+        tempos = {}
+        for nome, opcoes in (('faturamento', {'agrupar': 'dia'}), ('faturamento', {'agrupar': 'mes'}),
+                             ('barbeiros', {}), ('itens', {}), ('pagamentos', {}), ('indicadores', {})):
+            comeco = time.perf_counter()
+            _, resultado = relatorios.gerar(nome, data_inicio, data_fim, **opcoes)
+            tempos[f"{nome}:{opcoes.get('agrupar', '')}".rstrip(':')] = (time.perf_counter() - comeco) * 1000
+            if nome == 'indicadores':
+                obtido = resultado['faturamento']
+        db.fechar_conexao()
+    
+    print(f'{total} vendas inseridas em {carga:.1f}s ({total / carga:.0f}/s, resumo mantido por gatilhos)')
+    for nome, ms in tempos.items():
+        print(f'{nome}: {ms:.1f} ms')
+    print(f'faturamento esperado={esperado} obtido={obtido}')
+    if abs(esperado - obtido) > 0.01 or max(tempos.values()) > 1000:
+        raise SystemExit('Relatório incorreto ou lento demais')
+
+def entrega_notificacoes(total=200):
+    recebidas = []
+    requisicoes = []
+    
+    class Receptor(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            requisicoes.append(len(corpo['mensagens']))
+            if len(requisicoes) == 1:
+                self.send_response(500)
+                self.end_headers()
+                return
+            falhas = {str(m['id']): 'destino indisponível' for m in corpo['mensagens']
+                      if m['id'] % 7 == 0 and m['chave'] not in {r['chave'] for r in recebidas}
+                      and len(requisicoes) < 5}
+            recebidas.extend(m for m in corpo['mensagens'] if str(m['id']) not in falhas)
+            resposta = json.dumps({'falhas': falhas}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(resposta)))
+            self.end_headers()
+            self.wfile.write(resposta)
+        
+        def log_message(self, *args):
+            pass
+    
+    servidor = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Receptor)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    transporte = notificacoes.TransporteHttp(f'http://127.0.0.1:{servidor.server_address[1]}/')
+    notificacoes.ATRASO_BASE_SEGUNDOS = 0
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        db.DB_PATH = os.path.join(pasta, 'notificacoes.db')
+        db.aplicar_migracoes()
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        
+        inicio = time.perf_counter()
+        for indice in range(total):
+            cursor.execute('BEGIN IMMEDIATE')
+            notificacoes.enfileirar(cursor, 'pedido_cancelado', f'1199999{indice:04d}',
+                       {'cliente_nome': 'Cliente', 'pedido_id': indice}, f'pedido:{indice}:pedido_cancelado')
+            notificacoes.enfileirar(cursor, 'pedido_cancelado', f'1199999{indice:04d}',
+                       {'cliente_nome': 'Cliente', 'pedido_id': indice}, f'pedido:{indice}:pedido_cancelado')
+            conn.commit()
+        enfileiramento_ms = (time.perf_counter() - inicio) / total * 1000
+        conn.close()
+        
+        resultados = []
+        while True:
+            enviados, falhas = notificacoes.despachar_lote(transporte)
+            resultados.append((enviados, falhas))
+            if not enviados and not falhas:
+                break
+        
+        conn = db.get_db_connection()
+        pendentes = conn.execute("SELECT COUNT(*) as total FROM outbox WHERE status != 'enviado'").fetchone()['total']
+        db.fechar_conexao()
+    servidor.shutdown()
+    
+    chaves = [mensagem['chave'] for mensagem in recebidas]
+    print(f'{total} notificações enfileiradas (2x cada), {enfileiramento_ms:.3f} ms por transação')
+    print(f'{len(requisicoes)} requisições ao transporte, lotes {resultados}')
+    print(f'recebidas={len(chaves)} únicas={len(set(chaves))} pendentes={pendentes}')
+    if len(chaves) != total or len(set(chaves)) != total or pendentes:
+        raise SystemExit('Entrega incompleta ou duplicada')
+    print('Todas as notificações entregues exatamente uma vez.')
+
+BENCHMARKS = {
+    'agendamentos': concorrencia_agendamentos,
+    'pedidos': estresse_pedidos,
+    'busca': desempenho_busca,
+    'comissoes': fechamento_comissoes,
+    'exportacoes': memoria_exportacoes,
+    'relatorios': desempenho_relatorios,
+    'notificacoes': entrega_notificacoes,
+}
+
+if __name__ == '__main__':
+    nomes = sys.argv[1:] or list(BENCHMARKS)
+    desconhecidos = [nome for nome in nomes if nome not in BENCHMARKS]
+    if desconhecidos:
+        raise SystemExit(f"Uso: python bench.py [{'|'.join(BENCHMARKS)} ...]")
+    
+    contexto = multiprocessing.get_context('fork')
+    falhas = []
+    for nome in nomes:
+        print(f'== {nome}')
+        processo = contexto.Process(target=BENCHMARKS[nome])
+        processo.start()
+        processo.join()
+        if processo.exitcode:
+            falhas.append(nome)
+    if falhas:
+        raise SystemExit(f"Falharam: {', '.join(falhas)}")
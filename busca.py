@@ -0,0 +1,29 @@
+import re
+import database as db
+
+LIMITE_RESULTADOS = 50
+PESO_NOME = 10.0
+PESO_DESCRICAO = 1.0
+
+_TERMO = re.compile(r'\w+', re.UNICODE)
+
+def montar_consulta(texto):
+    termos = _TERMO.findall(texto or '')
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+def buscar(texto, limite=LIMITE_RESULTADOS):
+    consulta = montar_consulta(texto)
+    if not consulta:
+        return []
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''SELECT rowid, bm25(busca_catalogo, ?, ?) as relevancia
+                     FROM busca_catalogo
+                     WHERE busca_catalogo MATCH ? AND ativo = 1
+                     ORDER BY relevancia
+                     LIMIT ?''', (PESO_NOME, PESO_DESCRICAO, consulta, limite))
+    resultados = [('produto' if row['rowid'] % 2 else 'servico', row['rowid'] // 2)
+                  for row in cursor.fetchall()]
+    conn.close()
+    return resultados
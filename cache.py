@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+import database as db
+
+class CacheVersionado:
+    def __init__(self, chave, carregar):
+        self.chave = chave
+        self._carregar = carregar
+        self._estado = (None, None)
+        self._lock = threading.Lock()
+
+    def obter(self):
+        versao = db.versao_dados(self.chave)
+        estado = self._estado
+        if estado[0] != versao:
+            with self._lock:
+                estado = self._estado
+                if estado[0] != versao:
+                    estado = (versao, self._carregar())
+                    self._estado = estado
+        return estado[1]
+
+    @property
+    def versao(self):
+        return self._estado[0]
+
+    def invalidar(self):
+        with self._lock:
+            self._estado = (None, None)
+
+class CacheLRU:
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def remover_se(self, condicao):
+        with self._lock:
+            for chave in [chave for chave in self._itens if condicao(chave)]:
+                del self._itens[chave]
+
+    def __len__(self):
+        return len(self._itens)
+
+class VigiaVersao:
+    def __init__(self, chave, intervalo=1.0):
+        self.chave = chave
+        self.intervalo = intervalo
+        self._versao = None
+        self._ouvintes = 0
+        self._thread = None
+        self._pid = None
+        self._condicao = threading.Condition()
+
+    def _iniciar(self):
+        if self._pid != os.getpid():
+            self._thread = None
+            self._versao = None
+            self._ouvintes = 0
+            self._pid = os.getpid()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name=f'vigia-{self.chave}', daemon=True)
+            self._thread.start()
+
+    def _executar(self):
+        try:
+            while True:
+                with self._condicao:
+                    if not self._ouvintes:
+                        self._thread = None
+                        self._versao = None
+                        return
+                try:
+                    versao = db.versao_dados(self.chave)
+                except Exception as e:
+                    print(f"Erro ao verificar versão de {self.chave}: {e}")
+                    versao = self._versao
+                if versao != self._versao:
+                    with self._condicao:
+                        self._versao = versao
+                        self._condicao.notify_all()
+                time.sleep(self.intervalo)
+        finally:
+            db.fechar_conexao()
+
+    def aguardar(self, versao_conhecida, timeout):
+        limite = time.monotonic() + timeout
+        with self._condicao:
+            self._iniciar()
+            self._ouvintes += 1
+            try:
+                while self._versao is None or self._versao == versao_conhecida:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicao.wait(restante)
+                return self._versao
+            finally:
+                self._ouvintes -= 1
+
+def _carregar_configuracoes():
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT chave, valor FROM configuracoes')
+    configs = {row['chave']: row['valor'] for row in cursor.fetchall()}
+    cursor.close()
+    return MappingProxyType(configs)
+
+configuracoes = CacheVersionado('configuracoes', _carregar_configuracoes)
@@ -0,0 +1,90 @@
+from types import MappingProxyType
+import database as db
+from cache import CacheVersionado
+
+VERSAO = 'catalogo'
+
+def _congelar(row, **extra):
+    item = dict(row)
+    item.update(extra)
+    return MappingProxyType(item)
+
+def _agrupar_por_categoria(itens):
+    grupos = {}
+    for item in itens:
+        grupos.setdefault(item['categoria_id'], []).append(item)
+    return MappingProxyType({categoria_id: tuple(lista) for categoria_id, lista in grupos.items()})
+
+class Catalogo:
+    def __init__(self, categorias, servicos, produtos, barbeiros):
+        self.categorias_por_id = MappingProxyType({c['id']: c for c in categorias})
+        self.categorias_ativas = tuple(sorted((c for c in categorias if c['ativo']), key=lambda c: c['ordem']))
+        
+        self.servicos_por_id = MappingProxyType({s['id']: s for s in servicos})
+        self.produtos_por_id = MappingProxyType({p['id']: p for p in produtos})
+        
+        servicos_ativos = tuple(s for s in servicos if s['ativo'])
+        produtos_ativos = tuple(p for p in produtos if p['ativo'])
+        
+        self.servicos_ativos = servicos_ativos
+        self.produtos_ativos = produtos_ativos
+        self.servicos_por_nome = tuple(sorted(servicos_ativos, key=lambda s: s['nome']))
+        self.servicos_por_categoria = _agrupar_por_categoria(servicos_ativos)
+        self.produtos_por_categoria = _agrupar_por_categoria(produtos_ativos)
+        self.servicos_destaque = tuple(s for s in servicos_ativos if s['destaque'])
+        self.produtos_destaque = tuple(p for p in produtos_ativos if p['destaque'])
+        self.servicos_promocao = tuple(s for s in servicos_ativos if s['promocao'])
+        self.produtos_promocao = tuple(p for p in produtos_ativos if p['promocao'])
+        
+        self.barbeiros_por_id = MappingProxyType({b['id']: b for b in barbeiros})
+        self.barbeiros_ativos = tuple(b for b in barbeiros if b['ativo'])
+
+    def servicos_da_categoria(self, categoria_id):
+        if categoria_id == 1:
+            return self.servicos_destaque
+        if categoria_id == 2:
+            return self.servicos_promocao
+        return self.servicos_por_categoria.get(categoria_id, ())
+
+    def produtos_da_categoria(self, categoria_id):
+        if categoria_id == 1:
+            return self.produtos_destaque
+        if categoria_id == 2:
+            return self.produtos_promocao
+        return self.produtos_por_categoria.get(categoria_id, ())
+
+def _carregar_catalogo():
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM categorias ORDER BY id')
+    categorias = [_congelar(row) for row in cursor.fetchall()]
+    nomes_categorias = {c['id']: c['nome'] for c in categorias}
+    
+    cursor.execute('SELECT * FROM servicos ORDER BY id')
+    servicos = [_congelar(row, categoria_nome=nomes_categorias.get(row['categoria_id']))
+                for row in cursor.fetchall()]
+    
+    cursor.execute('SELECT * FROM produtos ORDER BY id')
+    produtos = [_congelar(row, categoria_nome=nomes_categorias.get(row['categoria_id']))
+                for row in cursor.fetchall()]
+    
+    cursor.execute('SELECT * FROM barbeiros ORDER BY id')
+    barbeiros = [_congelar(row) for row in cursor.fetchall()]
+    
+    cursor.close()
+    return Catalogo(categorias, servicos, produtos, barbeiros)
+
+_cache = CacheVersionado(VERSAO, _carregar_catalogo)
+
+def obter():
+    return _cache.obter()
+
+def versao():
+    return _cache.versao
+
+def marcar_alterado(cursor):
+    db.incrementar_versao(cursor, VERSAO)
+
+def invalidar():
+    _cache.invalidar()
@@ -0,0 +1,170 @@
+import sqlite3
+from datetime import datetime, timedelta
+import database as db
+
+class ErroComissao(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+class PeriodoFechado(ErroComissao):
+    status = 409
+
+class BancoOcupado(ErroComissao):
+    status = 503
+
+CAMPOS_EXTRATO = ('barbeiro_id', 'barbeiro_nome', 'comissao_tipo', 'comissao_valor', 'vendas', 'servicos_vendidos',
+                  'valor_vendas', 'agendamentos', 'valor_agendamentos', 'valor_comissao')
+
+def validar_periodo(data_inicio, data_fim):
+    try:
+        inicio = datetime.strptime(data_inicio or '', '%Y-%m-%d').date()
+        fim = datetime.strptime(data_fim or '', '%Y-%m-%d').date()
+    except ValueError:
+        raise ErroComissao('Datas devem estar no formato AAAA-MM-DD')
+    if inicio > fim:
+        raise ErroComissao('A data inicial deve ser anterior à data final')
+    return inicio.isoformat(), fim.isoformat()
+
+def periodo_do_mes(mes):
+    try:
+        inicio = datetime.strptime(mes, '%Y-%m').date()
+    except (TypeError, ValueError):
+        raise ErroComissao('Mês deve estar no formato AAAA-MM')
+    fim = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return inicio.isoformat(), fim.isoformat()
+
+def valor_comissao(comissao_tipo, comissao_valor, extrato):
+    if comissao_tipo == 'fixa':
+        return round(comissao_valor * (extrato['agendamentos'] + extrato['servicos_vendidos']), 2)
+    return round((extrato['valor_vendas'] + extrato['valor_agendamentos']) * comissao_valor / 100, 2)
+
+def calcular(cursor, data_inicio, data_fim):
+    fim_exclusivo = (datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    cursor.execute('''
+        WITH vendas_periodo AS (
+            SELECT barbeiro_id, SUM(vendas) as vendas,
+                   SUM(CASE WHEN tipo = 'servico' THEN quantidade ELSE 0 END) as servicos_vendidos,
+                   SUM(faturamento) as valor_vendas
+            FROM resumo_diario
+            WHERE dia BETWEEN ? AND ? AND barbeiro_id != 0 AND vendas != 0
+            GROUP BY barbeiro_id
+        ),
+        agendamentos_periodo AS (
+            SELECT barbeiro_id, COUNT(*) as agendamentos, SUM(COALESCE(valor, 0)) as valor_agendamentos
+            FROM agendamentos
+            WHERE data_hora >= ? AND data_hora < ? AND status = 'concluido'
+            GROUP BY barbeiro_id
+        ),
+        servicos_agendados AS (
+            SELECT v.barbeiro_id, COUNT(*) as vendas, SUM(COALESCE(v.quantidade, 1)) as servicos,
+                   SUM(COALESCE(v.valor_total, 0)) as valor
+            FROM vendas v
+            WHERE v.data_venda >= ? AND v.data_venda < ? AND v.tipo = 'servico'
+            AND EXISTS (SELECT 1 FROM agendamentos a
+                        WHERE a.cliente_id = v.cliente_id
+                        AND a.data_hora >= date(v.data_venda) AND a.data_hora < date(v.data_venda, '+1 day')
+                        AND a.barbeiro_id = v.barbeiro_id AND a.servico_id = v.item_id AND a.status = 'concluido')
+            GROUP BY v.barbeiro_id
+        )
+        SELECT b.id as barbeiro_id, b.nome as barbeiro_nome,
+               COALESCE(b.comissao_tipo, 'percentual') as comissao_tipo,
+               COALESCE(b.comissao_valor, 0) as comissao_valor,
+               COALESCE(v.vendas, 0) - COALESCE(d.vendas, 0) as vendas,
+               COALESCE(v.servicos_vendidos, 0) - COALESCE(d.servicos, 0) as servicos_vendidos,
+               ROUND(COALESCE(v.valor_vendas, 0) - COALESCE(d.valor, 0), 2) as valor_vendas,
+               COALESCE(a.agendamentos, 0) as agendamentos,
+               ROUND(COALESCE(a.valor_agendamentos, 0), 2) as valor_agendamentos
+        FROM barbeiros b
+        LEFT JOIN vendas_periodo v ON v.barbeiro_id = b.id
+        LEFT JOIN agendamentos_periodo a ON a.barbeiro_id = b.id
+        LEFT JOIN servicos_agendados d ON d.barbeiro_id = b.id
+        WHERE b.ativo = 1 OR v.barbeiro_id IS NOT NULL OR a.barbeiro_id IS NOT NULL
+        ORDER BY b.nome, b.id
+    ''', (data_inicio, data_fim, data_inicio, fim_exclusivo, data_inicio, fim_exclusivo))
+    
+    extratos = []
+    for row in cursor.fetchall():
+        extrato = dict(row)
+        extrato['valor_comissao'] = valor_comissao(extrato['comissao_tipo'], extrato['comissao_valor'], extrato)
+        extratos.append(extrato)
+    return extratos
+
+def _fechamento(cursor, data_inicio, data_fim):
+    cursor.execute('''SELECT id, data_inicio, data_fim, valor_total, data_fechamento FROM fechamentos_comissao
+                     WHERE data_inicio <= ? AND data_fim >= ?
+                     ORDER BY data_inicio
+                     LIMIT 1''', (data_fim, data_inicio))
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+def extratos(data_inicio, data_fim):
+    data_inicio, data_fim = validar_periodo(data_inicio, data_fim)
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        fechamento = _fechamento(cursor, data_inicio, data_fim)
+        if fechamento and (fechamento['data_inicio'], fechamento['data_fim']) == (data_inicio, data_fim):
+            cursor.execute(f'''SELECT {', '.join(CAMPOS_EXTRATO)} FROM extratos_comissao
+                              WHERE fechamento_id = ?
+                              ORDER BY barbeiro_nome, barbeiro_id''', (fechamento['id'],))
+            return fechamento, [dict(row) for row in cursor.fetchall()]
+        if fechamento:
+            raise PeriodoFechado(f"O período sobrepõe o fechamento de {fechamento['data_inicio']} "
+                                 f"a {fechamento['data_fim']}")
+        return None, calcular(cursor, data_inicio, data_fim)
+    finally:
+        conn.close()
+
+def fechar(data_inicio, data_fim):
+    data_inicio, data_fim = validar_periodo(data_inicio, data_fim)
+    if data_fim >= datetime.now().strftime('%Y-%m-%d'):
+        raise ErroComissao('Só é possível fechar períodos já encerrados')
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        fechamento = _fechamento(cursor, data_inicio, data_fim)
+        if fechamento:
+            raise PeriodoFechado(f"Já existe fechamento de {fechamento['data_inicio']} a {fechamento['data_fim']}")
+        
+        lista = calcular(cursor, data_inicio, data_fim)
+        total = round(sum(extrato['valor_comissao'] for extrato in lista), 2)
+        cursor.execute('''INSERT INTO fechamentos_comissao (data_inicio, data_fim, valor_total) VALUES (?, ?, ?)
+                         RETURNING id, data_inicio, data_fim, valor_total, data_fechamento''',
+                       (data_inicio, data_fim, total))
+        fechamento = dict(cursor.fetchone())
+        cursor.executemany(f'''INSERT INTO extratos_comissao (fechamento_id, {', '.join(CAMPOS_EXTRATO)})
+                              VALUES (?, {', '.join('?' * len(CAMPOS_EXTRATO))})''',
+                           [(fechamento['id'], *(extrato[campo] for campo in CAMPOS_EXTRATO)) for extrato in lista])
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    return fechamento, lista
+
+if __name__ == '__main__':
+    import sys
+    
+    if '--fechar' not in sys.argv[:-1]:
+        raise SystemExit('Uso: python comissoes.py --fechar AAAA-MM')
+    db.aplicar_migracoes()
+    fechamento, lista = fechar(*periodo_do_mes(sys.argv[sys.argv.index('--fechar') + 1]))
+    for extrato in lista:
+        print(f"{extrato['barbeiro_nome']}: R$ {extrato['valor_comissao']:.2f}")
+    print(f"Total: R$ {fechamento['valor_total']:.2f}")
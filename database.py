@@ -1,20 +1,192 @@
 import sqlite3
 import os
+import threading
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
 
 DB_PATH = 'database/barbearia.db'
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16384
+MMAP_SIZE = 128 * 1024 * 1024
+
+_local = threading.local()
+
+class ConexaoReutilizavel(sqlite3.Connection):
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def fechar(self):
+        super().close()
+
+def _abrir_conexao():
+    os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, factory=ConexaoReutilizavel)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
     return conn
 
-def init_database():
-    os.makedirs('database', exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+def get_db_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and (_local.pid != os.getpid() or _local.path != DB_PATH):
+        if _local.pid == os.getpid():
+            conn.fechar()
+        conn = None
+    if conn is None:
+        conn = _abrir_conexao()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = DB_PATH
+    return conn
+
+def liberar_conexao(exception=None):
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and conn.in_transaction:
+        conn.rollback()
+
+def fechar_conexao():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.fechar()
+    _local.conn = None
+
+def banco_ocupado(erro):
+    mensagem = str(erro).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+CONSULTAS_INDEXADAS = {
+    'horarios_disponiveis': (
+        '''SELECT data_hora FROM agendamentos
+           WHERE barbeiro_id = ? AND data_hora >= ? AND data_hora < ? AND status != 'cancelado' ''',
+        (1, '2025-01-01', '2025-01-02')),
+    'admin_agendamentos_hoje': (
+        '''SELECT COUNT(*) as total FROM agendamentos
+           WHERE data_hora >= ? AND data_hora < ? AND status != 'cancelado' ''',
+        ('2025-01-01', '2025-01-02')),
+    'admin_faturamento_hoje': (
+        'SELECT SUM(valor_total) as total FROM vendas WHERE data_venda >= ? AND data_venda < ?',
+        ('2025-01-01', '2025-01-02')),
+    'admin_agendamentos': (
+        '''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome, c.nome as cliente_nome
+           FROM agendamentos a
+           LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+           LEFT JOIN servicos s ON a.servico_id = s.id
+           LEFT JOIN clientes c ON a.cliente_id = c.id
+           WHERE a.data_hora >= ? AND a.status != 'cancelado'
+           ORDER BY a.data_hora''',
+        ('2025-01-01',)),
+    'eventos_agendamentos': (
+        '''SELECT e.id, e.tipo, e.agendamento_id, a.data_hora, a.status, c.nome as cliente_nome,
+           s.nome as servico_nome, b.nome as barbeiro_nome
+           FROM eventos_agendamentos e
+           LEFT JOIN agendamentos a ON e.agendamento_id = a.id
+           LEFT JOIN clientes c ON a.cliente_id = c.id
+           LEFT JOIN servicos s ON a.servico_id = s.id
+           LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+           WHERE e.id > ?
+           ORDER BY e.id
+           LIMIT ?''',
+        (0, 200)),
+    'historico_pedidos': (
+        'SELECT * FROM pedidos WHERE cliente_id = ? ORDER BY data_criacao DESC',
+        (1,)),
+    'historico_itens': (
+        'SELECT * FROM pedidos_itens WHERE pedido_id = ?',
+        (1,)),
+    'historico_agendamentos': (
+        '''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome
+           FROM agendamentos a
+           LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+           LEFT JOIN servicos s ON a.servico_id = s.id
+           WHERE a.cliente_id = ? AND (a.data_hora, a.id) < (?, ?)
+           ORDER BY a.data_hora DESC, a.id DESC
+           LIMIT ?''',
+        (1, '2025-01-01 10:00:00', 10, 11)),
+    'admin_pedidos': (
+        '''WITH pagina AS (
+               SELECT * FROM pedidos
+               WHERE status = ? AND (data_criacao, id) < (?, ?)
+               ORDER BY data_criacao DESC, id DESC
+               LIMIT ?
+           )
+           SELECT pagina.*, c.nome as cliente_nome, i.id as item_linha_id
+           FROM pagina
+           LEFT JOIN clientes c ON pagina.cliente_id = c.id
+           LEFT JOIN pedidos_itens i ON i.pedido_id = pagina.id''',
+        ('pago', '2025-01-01 00:00:00', 10, 51)),
+    'perfil_agendamentos': (
+        '''SELECT a.*, b.nome as barbeiro_nome, s.nome as servico_nome
+           FROM agendamentos a
+           LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+           LEFT JOIN servicos s ON a.servico_id = s.id
+           WHERE a.cliente_id = ?
+           ORDER BY a.data_hora DESC
+           LIMIT 10''',
+        (1,)),
+    'fila_aguardando': (
+        '''SELECT id, cliente_nome, servico_id, posicao, data_entrada FROM fila_virtual
+           WHERE status = 'aguardando' ORDER BY posicao''',
+        ()),
+    'fila_proxima_posicao': (
+        'SELECT COALESCE(MAX(posicao), 0) + 1 as proxima FROM fila_virtual',
+        ()),
+    'estoque_alerta': (
+        'SELECT * FROM produtos WHERE estoque <= estoque_minimo ORDER BY nome',
+        ()),
+    'eventos_estoque_pendentes': (
+        'SELECT * FROM eventos_estoque WHERE processado = 0 ORDER BY id LIMIT ?',
+        (100,)),
+    'exportar_vendas': (
+        '''SELECT v.*, c.nome as cliente_nome FROM vendas v
+           LEFT JOIN clientes c ON v.cliente_id = c.id
+           WHERE v.data_venda >= ? AND v.data_venda < ? AND v.status = ?
+           ORDER BY v.data_venda''',
+        ('2025-01-01', '2025-02-01', 'concluido')),
+    'exportar_pedidos': (
+        '''SELECT p.*, i.nome as item_nome FROM pedidos p
+           LEFT JOIN pedidos_itens i ON i.pedido_id = p.id
+           WHERE p.data_criacao >= ? AND p.data_criacao < ? AND p.status = ?
+           ORDER BY p.data_criacao''',
+        ('2025-01-01', '2025-02-01', 'pago')),
+    'exportar_agendamentos': (
+        '''SELECT a.*, c.nome as cliente_nome FROM agendamentos a
+           LEFT JOIN clientes c ON a.cliente_id = c.id
+           WHERE a.data_hora >= ? AND a.data_hora < ? AND a.status = ?
+           ORDER BY a.data_hora''',
+        ('2025-01-01', '2025-02-01', 'concluido')),
+}
+
+def intervalo_do_dia(data):
+    inicio = datetime.strptime(data, '%Y-%m-%d')
+    fim = inicio + timedelta(days=1)
+    return inicio.strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d')
+
+def verificar_planos_consulta(conn=None):
+    conn = conn or get_db_connection()
+    parciais = {row['name'] for row in conn.execute('''SELECT i.name FROM sqlite_master m, pragma_index_list(m.name) i
+                                                        WHERE m.type = 'table' AND i.partial = 1''')}
+    varreduras = []
+    for nome, (sql, params) in CONSULTAS_INDEXADAS.items():
+        subconsultas = set()
+        for linha in conn.execute('EXPLAIN QUERY PLAN ' + sql, params):
+            detalhe = linha['detail']
+            if detalhe.startswith(('CO-ROUTINE ', 'MATERIALIZE ')):
+                subconsultas.add(detalhe.split()[1])
+            indice = detalhe.split(' INDEX ', 1)[1].split()[0] if ' INDEX ' in detalhe else None
+            if (detalhe.startswith('SCAN ') and 'CONSTANT ROW' not in detalhe
+                    and detalhe.split()[1] not in subconsultas and indice not in parciais):
+                varreduras.append((nome, detalhe))
+            if 'USE TEMP B-TREE' in detalhe:
+                varreduras.append((nome, detalhe))
+    return varreduras
+
+def criar_tabelas(cursor):
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS categorias (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -184,14 +356,8 @@ def init_database():
             data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
-    conn.commit()
-    conn.close()
 
-def popular_dados_exemplo():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def popular_dados_exemplo(cursor):
     cursor.execute("SELECT COUNT(*) as count FROM categorias")
     if cursor.fetchone()['count'] == 0:
         categorias = [
@@ -270,97 +436,466 @@ def popular_dados_exemplo():
             admin_senha_hash = generate_password_hash('admin123')
             cursor.execute('''INSERT INTO administradores (nome, email, senha) 
                             VALUES (?, ?, ?)''', ('Administrador', 'admin@barbearia.com', admin_senha_hash))
-    
-    conn.commit()
-    conn.close()
 
-def migrar_banco_existente():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def migrar_tabelas_legadas(cursor):
+    cursor.execute("PRAGMA table_info(clientes)")
+    colunas_clientes = [col[1] for col in cursor.fetchall()]
     
-    try:
-        cursor.execute("PRAGMA table_info(clientes)")
-        colunas_clientes = [col[1] for col in cursor.fetchall()]
+    if 'email' in colunas_clientes or 'senha' in colunas_clientes:
+        cursor.execute("DROP TABLE IF EXISTS clientes_old")
+        cursor.execute("ALTER TABLE clientes RENAME TO clientes_old")
         
-        if 'email' in colunas_clientes or 'senha' in colunas_clientes:
-            cursor.execute("DROP TABLE IF EXISTS clientes_old")
-            cursor.execute("ALTER TABLE clientes RENAME TO clientes_old")
-            
-            cursor.execute('''
-                CREATE TABLE clientes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    telefone TEXT UNIQUE NOT NULL,
-                    pontos_fidelidade INTEGER DEFAULT 0,
-                    total_gasto REAL DEFAULT 0,
-                    data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP,
-                    ultima_visita TEXT
-                )
-            ''')
-            
-            cursor.execute('''
-                INSERT INTO clientes (id, nome, telefone, pontos_fidelidade, total_gasto, data_cadastro, ultima_visita)
-                SELECT id, nome, COALESCE(telefone, '(00) 00000-0000'), pontos_fidelidade, total_gasto, data_cadastro, ultima_visita
-                FROM clientes_old
-            ''')
-            
-            cursor.execute("DROP TABLE clientes_old")
-            print("Tabela clientes migrada com sucesso!")
+        cursor.execute('''
+            CREATE TABLE clientes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                telefone TEXT UNIQUE NOT NULL,
+                pontos_fidelidade INTEGER DEFAULT 0,
+                total_gasto REAL DEFAULT 0,
+                data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP,
+                ultima_visita TEXT
+            )
+        ''')
         
-        cursor.execute("PRAGMA table_info(barbeiros)")
-        colunas_barbeiros = [col[1] for col in cursor.fetchall()]
+        cursor.execute('''
+            INSERT INTO clientes (id, nome, telefone, pontos_fidelidade, total_gasto, data_cadastro, ultima_visita)
+            SELECT id, nome, COALESCE(telefone, '(00) 00000-0000'), pontos_fidelidade, total_gasto, data_cadastro, ultima_visita
+            FROM clientes_old
+        ''')
         
-        if 'comissao_percentual' in colunas_barbeiros and 'comissao_tipo' not in colunas_barbeiros:
-            cursor.execute("DROP TABLE IF EXISTS barbeiros_old")
-            cursor.execute("ALTER TABLE barbeiros RENAME TO barbeiros_old")
-            
-            cursor.execute('''
-                CREATE TABLE barbeiros (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    foto TEXT,
-                    especialidade TEXT,
-                    telefone TEXT,
-                    email TEXT,
-                    comissao_tipo TEXT DEFAULT 'percentual' CHECK (comissao_tipo IN ('percentual', 'fixa')),
-                    comissao_valor REAL DEFAULT 50.0,
-                    ativo INTEGER DEFAULT 1,
-                    data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            cursor.execute('''
-                INSERT INTO barbeiros (id, nome, foto, especialidade, telefone, email, comissao_tipo, comissao_valor, ativo, data_cadastro)
-                SELECT id, nome, foto, especialidade, telefone, email, 'percentual', comissao_percentual, ativo, data_cadastro
-                FROM barbeiros_old
-            ''')
-            
-            cursor.execute("DROP TABLE barbeiros_old")
-            print("Tabela barbeiros migrada com sucesso!")
+        cursor.execute("DROP TABLE clientes_old")
+        print("Tabela clientes migrada com sucesso!")
+    
+    cursor.execute("PRAGMA table_info(barbeiros)")
+    colunas_barbeiros = [col[1] for col in cursor.fetchall()]
+    
+    if 'comissao_percentual' in colunas_barbeiros and 'comissao_tipo' not in colunas_barbeiros:
+        cursor.execute("DROP TABLE IF EXISTS barbeiros_old")
+        cursor.execute("ALTER TABLE barbeiros RENAME TO barbeiros_old")
         
-        configuracoes_mercadopago = [
-            'mercadopago_ativo',
-            'mercadopago_access_token',
-            'mercadopago_public_key'
-        ]
+        cursor.execute('''
+            CREATE TABLE barbeiros (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                foto TEXT,
+                especialidade TEXT,
+                telefone TEXT,
+                email TEXT,
+                comissao_tipo TEXT DEFAULT 'percentual' CHECK (comissao_tipo IN ('percentual', 'fixa')),
+                comissao_valor REAL DEFAULT 50.0,
+                ativo INTEGER DEFAULT 1,
+                data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         
-        for config in configuracoes_mercadopago:
-            cursor.execute("SELECT chave FROM configuracoes WHERE chave = ?", (config,))
-            if not cursor.fetchone():
-                valor_padrao = '0' if config == 'mercadopago_ativo' else ''
-                cursor.execute("INSERT INTO configuracoes (chave, valor) VALUES (?, ?)", (config, valor_padrao))
-                print(f"Configuração '{config}' adicionada!")
+        cursor.execute('''
+            INSERT INTO barbeiros (id, nome, foto, especialidade, telefone, email, comissao_tipo, comissao_valor, ativo, data_cadastro)
+            SELECT id, nome, foto, especialidade, telefone, email, 'percentual', comissao_percentual, ativo, data_cadastro
+            FROM barbeiros_old
+        ''')
         
+        cursor.execute("DROP TABLE barbeiros_old")
+        print("Tabela barbeiros migrada com sucesso!")
+
+def adicionar_configuracoes_mercadopago(cursor):
+    configuracoes_mercadopago = [
+        'mercadopago_ativo',
+        'mercadopago_access_token',
+        'mercadopago_public_key'
+    ]
+    
+    for config in configuracoes_mercadopago:
+        cursor.execute("SELECT chave FROM configuracoes WHERE chave = ?", (config,))
+        if not cursor.fetchone():
+            valor_padrao = '0' if config == 'mercadopago_ativo' else ''
+            cursor.execute("INSERT INTO configuracoes (chave, valor) VALUES (?, ?)", (config, valor_padrao))
+            print(f"Configuração '{config}' adicionada!")
+
+def criar_indices(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_agendamentos_barbeiro_data ON agendamentos (barbeiro_id, data_hora, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_agendamentos_data_hora ON agendamentos (data_hora, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_agendamentos_data_criacao ON agendamentos (data_criacao)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_agendamentos_cliente_data ON agendamentos (cliente_id, data_hora)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_cliente_data ON pedidos (cliente_id, data_criacao)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_itens_pedido ON pedidos_itens (pedido_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_vendas_data ON vendas (data_venda)')
+
+def criar_tabela_versoes(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versoes (
+            chave TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+def versao_dados(chave, conn=None):
+    conn = conn or get_db_connection()
+    row = conn.execute('SELECT versao FROM versoes WHERE chave = ?', (chave,)).fetchone()
+    return row['versao'] if row else 0
+
+def incrementar_versao(cursor, chave):
+    cursor.execute('''INSERT INTO versoes (chave, versao) VALUES (?, 1)
+                     ON CONFLICT(chave) DO UPDATE SET versao = versao + 1''', (chave,))
+
+def criar_busca_catalogo(cursor):
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS busca_catalogo USING fts5 (
+            nome,
+            descricao,
+            ativo UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    
+    for tabela, deslocamento in (('servicos', 0), ('produtos', 1)):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {tabela}_busca_ai AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO busca_catalogo (rowid, nome, descricao, ativo)
+                VALUES (new.id * 2 + {deslocamento}, new.nome, COALESCE(new.descricao, ''), new.ativo);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {tabela}_busca_au AFTER UPDATE OF nome, descricao, ativo ON {tabela} BEGIN
+                UPDATE busca_catalogo SET nome = new.nome, descricao = COALESCE(new.descricao, ''), ativo = new.ativo
+                WHERE rowid = new.id * 2 + {deslocamento};
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {tabela}_busca_ad AFTER DELETE ON {tabela} BEGIN
+                DELETE FROM busca_catalogo WHERE rowid = old.id * 2 + {deslocamento};
+            END
+        ''')
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO busca_catalogo (rowid, nome, descricao, ativo)
+            SELECT id * 2 + {deslocamento}, nome, COALESCE(descricao, ''), ativo FROM {tabela}
+        ''')
+
+def criar_indices_pedidos(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos (data_criacao)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_status_data ON pedidos (status, data_criacao)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_metodo_data ON pedidos (metodo_pagamento, data_criacao)')
+
+def criar_indice_horario_unico(cursor):
+    cursor.execute('''UPDATE agendamentos SET status = 'cancelado'
+                     WHERE status != 'cancelado' AND id NOT IN (
+                         SELECT MIN(id) FROM agendamentos WHERE status != 'cancelado'
+                         GROUP BY barbeiro_id, data_hora)''')
+    cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_agendamentos_horario_unico
+                     ON agendamentos (barbeiro_id, data_hora) WHERE status != 'cancelado' ''')
+
+def criar_eventos_agendamentos(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS eventos_agendamentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agendamento_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS eventos_agendamentos_ai AFTER INSERT ON agendamentos BEGIN
+            INSERT INTO eventos_agendamentos (agendamento_id, tipo) VALUES (new.id, 'novo');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS eventos_agendamentos_au
+        AFTER UPDATE OF status, data_hora, barbeiro_id, servico_id ON agendamentos
+        WHEN old.status IS NOT new.status OR old.data_hora IS NOT new.data_hora
+             OR old.barbeiro_id IS NOT new.barbeiro_id OR old.servico_id IS NOT new.servico_id BEGIN
+            INSERT INTO eventos_agendamentos (agendamento_id, tipo)
+            VALUES (new.id, CASE WHEN new.status = 'cancelado' AND old.status IS NOT 'cancelado'
+                                 THEN 'cancelado' ELSE 'alterado' END);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS eventos_agendamentos_ad AFTER DELETE ON agendamentos BEGIN
+            INSERT INTO eventos_agendamentos (agendamento_id, tipo) VALUES (old.id, 'cancelado');
+        END
+    ''')
+
+def criar_indices_fila(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_fila_virtual_status_posicao ON fila_virtual (status, posicao)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_fila_virtual_posicao ON fila_virtual (posicao)')
+
+def criar_tabelas_agendador(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tarefas (
+            nome TEXT PRIMARY KEY,
+            intervalo_segundos INTEGER NOT NULL,
+            proxima_execucao REAL NOT NULL,
+            ultima_execucao REAL,
+            ultimo_resultado TEXT
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS travas (
+            nome TEXT PRIMARY KEY,
+            dono TEXT,
+            expira_em REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_agendamentos_data ON eventos_agendamentos (data_criacao)')
+
+def criar_outbox(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chave TEXT NOT NULL UNIQUE,
+            tipo TEXT NOT NULL,
+            canal TEXT NOT NULL,
+            destino TEXT NOT NULL,
+            mensagem TEXT NOT NULL,
+            dados TEXT,
+            status TEXT DEFAULT 'pendente',
+            tentativas INTEGER DEFAULT 0,
+            proxima_tentativa REAL DEFAULT 0,
+            ultimo_erro TEXT,
+            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
+            data_envio TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_pendentes ON outbox (status, proxima_tentativa)')
+
+DIMENSOES_RESUMO = ('dia', 'barbeiro_id', 'tipo', 'item_id', 'metodo_pagamento')
+
+def _somar_resumo(dimensoes, medidas, condicao='1'):
+    colunas = ', '.join(DIMENSOES_RESUMO + tuple(medidas))
+    valores = ', '.join(tuple(dimensoes) + tuple(medidas.values()))
+    atualizacoes = ', '.join(f'{coluna} = {coluna} + excluded.{coluna}' for coluna in medidas)
+    return f'''INSERT INTO resumo_diario ({colunas}) SELECT {valores} WHERE {condicao}
+               ON CONFLICT ({', '.join(DIMENSOES_RESUMO)}) DO UPDATE SET {atualizacoes};'''
+
+def _dimensoes_venda(linha):
+    return (f'date({linha}.data_venda)', f'COALESCE({linha}.barbeiro_id, 0)', f"COALESCE({linha}.tipo, '')",
+            f'COALESCE({linha}.item_id, 0)', f"COALESCE({linha}.metodo_pagamento, '')")
+
+def _medidas_venda(linha, sinal):
+    return {'vendas': f'{sinal}1', 'quantidade': f'{sinal}COALESCE({linha}.quantidade, 1)',
+            'faturamento': f'{sinal}COALESCE({linha}.valor_total, 0)'}
+
+def _dimensoes_agendamento(linha):
+    return (f'date({linha}.data_hora)', f'COALESCE({linha}.barbeiro_id, 0)', "'servico'",
+            f'COALESCE({linha}.servico_id, 0)', "''")
+
+def _medidas_agendamento(linha, sinal):
+    return {'agendamentos': f'{sinal}1', 'valor_agendamentos': f'{sinal}COALESCE({linha}.valor, 0)'}
+
+def _medidas_cliente(sinal):
+    return {'novos_clientes': f'{sinal}1'}
+
+def reconstruir_resumo_diario(cursor):
+    cursor.execute('DELETE FROM resumo_diario')
+    cursor.execute(f'''INSERT INTO resumo_diario ({', '.join(DIMENSOES_RESUMO)}, vendas, quantidade, faturamento)
+                      SELECT date(data_venda), COALESCE(barbeiro_id, 0), COALESCE(tipo, ''), COALESCE(item_id, 0),
+                             COALESCE(metodo_pagamento, ''), COUNT(*), SUM(COALESCE(quantidade, 1)),
+                             SUM(COALESCE(valor_total, 0))
+                      FROM vendas WHERE 1 GROUP BY 1, 2, 3, 4, 5''')
+    cursor.execute(f'''INSERT INTO resumo_diario ({', '.join(DIMENSOES_RESUMO)}, agendamentos, valor_agendamentos)
+                      SELECT date(data_hora), COALESCE(barbeiro_id, 0), 'servico', COALESCE(servico_id, 0), '',
+                             COUNT(*), SUM(COALESCE(valor, 0))
+                      FROM agendamentos WHERE status != 'cancelado' GROUP BY 1, 2, 3, 4, 5
+                      ON CONFLICT ({', '.join(DIMENSOES_RESUMO)}) DO UPDATE SET
+                          agendamentos = excluded.agendamentos, valor_agendamentos = excluded.valor_agendamentos''')
+    cursor.execute(f'''INSERT INTO resumo_diario ({', '.join(DIMENSOES_RESUMO)}, novos_clientes)
+                      SELECT date(data_cadastro), 0, 'cliente', 0, '', COUNT(*)
+                      FROM clientes WHERE 1 GROUP BY 1
+                      UNION ALL
+                      SELECT 'total', 0, 'cliente', 0, '', COUNT(*) FROM clientes''')
+
+def criar_resumo_diario(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumo_diario (
+            dia TEXT NOT NULL,
+            barbeiro_id INTEGER NOT NULL DEFAULT 0,
+            tipo TEXT NOT NULL DEFAULT '',
+            item_id INTEGER NOT NULL DEFAULT 0,
+            metodo_pagamento TEXT NOT NULL DEFAULT '',
+            vendas INTEGER NOT NULL DEFAULT 0,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            faturamento REAL NOT NULL DEFAULT 0,
+            agendamentos INTEGER NOT NULL DEFAULT 0,
+            valor_agendamentos REAL NOT NULL DEFAULT 0,
+            novos_clientes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, barbeiro_id, tipo, item_id, metodo_pagamento)
+        ) WITHOUT ROWID
+    ''')
+    
+    gatilhos = {
+        'resumo_vendas_ai': ('AFTER INSERT ON vendas',
+                             [_somar_resumo(_dimensoes_venda('new'), _medidas_venda('new', '+'))]),
+        'resumo_vendas_ad': ('AFTER DELETE ON vendas',
+                             [_somar_resumo(_dimensoes_venda('old'), _medidas_venda('old', '-'))]),
+        'resumo_vendas_au': ('AFTER UPDATE OF data_venda, barbeiro_id, tipo, item_id, metodo_pagamento, '
+                             'quantidade, valor_total ON vendas',
+                             [_somar_resumo(_dimensoes_venda('old'), _medidas_venda('old', '-')),
+                              _somar_resumo(_dimensoes_venda('new'), _medidas_venda('new', '+'))]),
+        'resumo_agendamentos_ai': ('AFTER INSERT ON agendamentos',
+                                   [_somar_resumo(_dimensoes_agendamento('new'), _medidas_agendamento('new', '+'),
+                                                  "new.status != 'cancelado'")]),
+        'resumo_agendamentos_ad': ('AFTER DELETE ON agendamentos',
+                                   [_somar_resumo(_dimensoes_agendamento('old'), _medidas_agendamento('old', '-'),
+                                                  "old.status != 'cancelado'")]),
+        'resumo_agendamentos_au': ('AFTER UPDATE OF status, data_hora, barbeiro_id, servico_id, valor ON agendamentos',
+                                   [_somar_resumo(_dimensoes_agendamento('old'), _medidas_agendamento('old', '-'),
+                                                  "old.status != 'cancelado'"),
+                                    _somar_resumo(_dimensoes_agendamento('new'), _medidas_agendamento('new', '+'),
+                                                  "new.status != 'cancelado'")]),
+        'resumo_clientes_ai': ('AFTER INSERT ON clientes',
+                               [_somar_resumo(('date(new.data_cadastro)', '0', "'cliente'", '0', "''"),
+                                              _medidas_cliente('+')),
+                                _somar_resumo(("'total'", '0', "'cliente'", '0', "''"), _medidas_cliente('+'))]),
+        'resumo_clientes_ad': ('AFTER DELETE ON clientes',
+                               [_somar_resumo(('date(old.data_cadastro)', '0', "'cliente'", '0', "''"),
+                                              _medidas_cliente('-')),
+                                _somar_resumo(("'total'", '0', "'cliente'", '0', "''"), _medidas_cliente('-'))]),
+    }
+    for nome, (evento, comandos) in gatilhos.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} {evento} BEGIN {' '.join(comandos)} END")
+    
+    reconstruir_resumo_diario(cursor)
+
+def criar_comissoes(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fechamentos_comissao (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_inicio TEXT NOT NULL,
+            data_fim TEXT NOT NULL,
+            valor_total REAL NOT NULL DEFAULT 0,
+            data_fechamento TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (data_inicio, data_fim)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS extratos_comissao (
+            fechamento_id INTEGER NOT NULL,
+            barbeiro_id INTEGER NOT NULL,
+            barbeiro_nome TEXT,
+            comissao_tipo TEXT NOT NULL,
+            comissao_valor REAL NOT NULL,
+            vendas INTEGER NOT NULL DEFAULT 0,
+            servicos_vendidos INTEGER NOT NULL DEFAULT 0,
+            valor_vendas REAL NOT NULL DEFAULT 0,
+            agendamentos INTEGER NOT NULL DEFAULT 0,
+            valor_agendamentos REAL NOT NULL DEFAULT 0,
+            valor_comissao REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (fechamento_id, barbeiro_id),
+            FOREIGN KEY (fechamento_id) REFERENCES fechamentos_comissao(id),
+            FOREIGN KEY (barbeiro_id) REFERENCES barbeiros(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_extratos_comissao_barbeiro ON extratos_comissao (barbeiro_id)')
+    cursor.execute('''UPDATE vendas SET barbeiro_id = (
+                          SELECT a.barbeiro_id FROM agendamentos a
+                          WHERE a.cliente_id = vendas.cliente_id
+                          AND a.data_hora >= date(vendas.data_venda) AND a.data_hora < date(vendas.data_venda, '+1 day')
+                          AND a.status != 'cancelado'
+                          ORDER BY a.status = 'concluido' DESC, a.data_hora DESC
+                          LIMIT 1)
+                     WHERE barbeiro_id IS NULL AND cliente_id IS NOT NULL''')
+
+def criar_alertas_estoque(cursor):
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_produtos_estoque_baixo ON produtos (nome)
+                     WHERE estoque <= estoque_minimo''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS eventos_estoque (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            produto_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            estoque INTEGER,
+            estoque_minimo INTEGER,
+            processado INTEGER DEFAULT 0,
+            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_estoque_pendentes ON eventos_estoque (id) WHERE processado = 0')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_estoque_data ON eventos_estoque (data_criacao)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS eventos_estoque_ai AFTER INSERT ON produtos
+        WHEN new.estoque <= new.estoque_minimo BEGIN
+            INSERT INTO eventos_estoque (produto_id, tipo, estoque, estoque_minimo)
+            VALUES (new.id, 'estoque_baixo', new.estoque, new.estoque_minimo);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS eventos_estoque_au AFTER UPDATE OF estoque, estoque_minimo ON produtos
+        WHEN (old.estoque <= old.estoque_minimo) IS NOT (new.estoque <= new.estoque_minimo) BEGIN
+            INSERT INTO eventos_estoque (produto_id, tipo, estoque, estoque_minimo)
+            VALUES (new.id, CASE WHEN new.estoque <= new.estoque_minimo THEN 'estoque_baixo' ELSE 'estoque_reposto' END,
+                    new.estoque, new.estoque_minimo);
+        END
+    ''')
+
+def adicionar_configuracao_faltas(cursor):
+    cursor.execute("INSERT OR IGNORE INTO configuracoes (chave, valor) VALUES ('margem_falta_horas', '12')")
+    incrementar_versao(cursor, 'configuracoes')
+
+MIGRACOES = [
+    (1, criar_tabelas),
+    (2, migrar_tabelas_legadas),
+    (3, popular_dados_exemplo),
+    (4, adicionar_configuracoes_mercadopago),
+    (5, criar_indices),
+    (6, criar_tabela_versoes),
+    (7, criar_busca_catalogo),
+    (8, criar_indices_pedidos),
+    (9, criar_indice_horario_unico),
+    (10, criar_eventos_agendamentos),
+    (11, criar_indices_fila),
+    (12, criar_tabelas_agendador),
+    (13, criar_outbox),
+    (14, criar_resumo_diario),
+    (15, criar_comissoes),
+    (16, criar_alertas_estoque),
+    (17, adicionar_configuracao_faltas),
+]
+
+SCHEMA_VERSION = MIGRACOES[-1][0]
+
+def versao_schema(conn=None):
+    conn = conn or get_db_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def schema_atualizado():
+    return versao_schema() >= SCHEMA_VERSION
+
+def aplicar_migracoes():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        versao = versao_schema(conn)
+        for numero, migracao in MIGRACOES:
+            if numero <= versao:
+                continue
+            migracao(cursor)
+            cursor.execute(f'PRAGMA user_version = {numero}')
+            print(f"Migração {numero} ({migracao.__name__}) aplicada")
         conn.commit()
-        print("Migração concluída com sucesso!")
-    except Exception as e:
+    except Exception:
         conn.rollback()
-        print(f"Erro na migração: {e}")
+        raise
     finally:
         conn.close()
+    
+    return versao_schema(conn)
+
+def init_database():
+    if not schema_atualizado():
+        aplicar_migracoes()
 
 if __name__ == '__main__':
-    init_database()
-    popular_dados_exemplo()
-    migrar_banco_existente()
-    print("Banco de dados criado e populado com sucesso!")
+    import sys
+    
+    if '--explicar' in sys.argv:
+        init_database()
+        varreduras = verificar_planos_consulta()
+        for nome, detalhe in varreduras:
+            print(f"{nome}: {detalhe}")
+        if varreduras:
+            sys.exit(1)
+        print(f"{len(CONSULTAS_INDEXADAS)} consultas verificadas, nenhuma varredura completa.")
+    else:
+        versao = aplicar_migracoes()
+        print(f"Banco de dados na versão {versao} do schema.")
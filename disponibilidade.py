@@ -0,0 +1,239 @@
+import heapq
+from datetime import datetime, timedelta
+from itertools import islice
+import database as db
+import cache
+import catalogo
+
+GRANULARIDADE_MINUTOS = 5
+INTERVALO_MINUTOS = 30
+DURACAO_PADRAO = 30
+MAX_DIAS_PERIODO = 14
+MAX_AGENDAS_EM_CACHE = 4096
+LIMITE_PRIMEIROS = 5
+MAX_PRIMEIROS = 20
+
+class ErroDisponibilidade(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+class ServicoNaoEncontrado(ErroDisponibilidade):
+    status = 404
+
+def _minutos(horario, padrao):
+    try:
+        hora, minuto = horario.split(':')[:2]
+        return int(hora) * 60 + int(minuto)
+    except (AttributeError, ValueError):
+        return padrao
+
+def expediente(configs=None):
+    configs = configs if configs is not None else cache.configuracoes.obter()
+    abertura = _minutos(configs.get('horario_abertura'), 9 * 60)
+    fechamento = _minutos(configs.get('horario_fechamento'), 20 * 60)
+    dias = set()
+    for dia in (configs.get('dias_funcionamento') or '1,2,3,4,5,6').split(','):
+        if dia.strip().isdigit():
+            dias.add(int(dia) % 7 or 7)
+    return abertura, fechamento, dias
+
+def duracao_servico(servico_id, cat=None):
+    cat = cat or catalogo.obter()
+    try:
+        servico = cat.servicos_por_id.get(int(servico_id))
+    except (TypeError, ValueError):
+        servico = None
+    return (servico['duracao_minutos'] if servico else None) or DURACAO_PADRAO
+
+def duracao_solicitada(servico_id, cat=None):
+    if servico_id is None or servico_id == '':
+        return DURACAO_PADRAO
+    cat = cat or catalogo.obter()
+    try:
+        servico = cat.servicos_por_id.get(int(servico_id))
+    except (TypeError, ValueError):
+        raise ErroDisponibilidade('Serviço inválido')
+    if not servico or not servico['ativo']:
+        raise ServicoNaoEncontrado('Serviço não encontrado')
+    return servico['duracao_minutos'] or DURACAO_PADRAO
+
+class AgendaDia:
+    def __init__(self, abertura, fechamento):
+        self.abertura = abertura
+        self.fechamento = fechamento
+        self.blocos = max(0, (fechamento - abertura) // GRANULARIDADE_MINUTOS)
+        self.ocupado = 0
+
+    def _faixa(self, inicio, duracao):
+        primeiro = max(0, (inicio - self.abertura) // GRANULARIDADE_MINUTOS)
+        ultimo = min(self.blocos, -(-(inicio + duracao - self.abertura) // GRANULARIDADE_MINUTOS))
+        return primeiro, ultimo
+
+    def reservar(self, inicio, duracao):
+        primeiro, ultimo = self._faixa(inicio, duracao)
+        if ultimo > primeiro:
+            self.ocupado |= ((1 << (ultimo - primeiro)) - 1) << primeiro
+
+    def livre(self, inicio, duracao):
+        if inicio < self.abertura or inicio + duracao > self.fechamento:
+            return False
+        primeiro, ultimo = self._faixa(inicio, duracao)
+        mascara = ((1 << (ultimo - primeiro)) - 1) << primeiro
+        return not self.ocupado & mascara
+
+    def inicios_livres(self, duracao, passo=INTERVALO_MINUTOS, depois_de=None):
+        inicios = []
+        for inicio in range(self.abertura, self.fechamento - duracao + 1, passo):
+            if depois_de is not None and inicio <= depois_de:
+                continue
+            if self.livre(inicio, duracao):
+                inicios.append(inicio)
+        return inicios
+
+def carregar_reservas(cursor, data_inicio, data_fim, barbeiro_id=None):
+    if barbeiro_id is not None:
+        cursor.execute('''SELECT barbeiro_id, data_hora, servico_id FROM agendamentos
+                         WHERE barbeiro_id = ? AND data_hora >= ? AND data_hora < ? AND status != 'cancelado' ''',
+                       (barbeiro_id, data_inicio, data_fim))
+    else:
+        cursor.execute('''SELECT barbeiro_id, data_hora, servico_id FROM agendamentos
+                         WHERE data_hora >= ? AND data_hora < ? AND status != 'cancelado' ''',
+                       (data_inicio, data_fim))
+    return cursor.fetchall()
+
+def montar_agendas(reservas, datas, expediente_atual, cat):
+    abertura, fechamento, _ = expediente_atual
+    agendas = {}
+    for reserva in reservas:
+        data, _, horario = reserva['data_hora'].partition(' ')
+        if data not in datas:
+            continue
+        chave = (reserva['barbeiro_id'], data)
+        agenda = agendas.get(chave)
+        if agenda is None:
+            agenda = agendas[chave] = AgendaDia(abertura, fechamento)
+        agenda.reservar(_minutos(horario, abertura), duracao_servico(reserva['servico_id'], cat))
+    return agendas
+
+def _datas_do_periodo(data_inicio, dias):
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    if inicio.isoformat() != data_inicio:
+        raise ValueError(f'Data fora do formato AAAA-MM-DD: {data_inicio}')
+    return [inicio + timedelta(days=deslocamento) for deslocamento in range(dias)]
+
+def formatar_horario(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+_cache_horarios = cache.CacheLRU(MAX_AGENDAS_EM_CACHE)
+
+def _chave_versao(barbeiro_id, data):
+    return f"agenda:{barbeiro_id}:{data}"
+
+def versoes_agenda(cursor, barbeiro_id, datas):
+    cursor.execute('SELECT chave, versao FROM versoes WHERE chave >= ? AND chave <= ?',
+                   (_chave_versao(barbeiro_id, datas[0]), _chave_versao(barbeiro_id, datas[-1])))
+    versoes = {row['chave']: row['versao'] for row in cursor.fetchall()}
+    return {data: versoes.get(_chave_versao(barbeiro_id, data), 0) for data in datas}
+
+def marcar_alterado(cursor, barbeiro_id, data_hora):
+    db.incrementar_versao(cursor, _chave_versao(barbeiro_id, str(data_hora)[:10]))
+
+def invalidar(barbeiro_id, data_hora):
+    chave = (barbeiro_id, str(data_hora)[:10])
+    _cache_horarios.remover_se(lambda item: item[:2] == chave)
+
+def _inicios_livres(barbeiro_id, datas, duracao, cat, expediente_atual):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    versoes = versoes_agenda(cursor, barbeiro_id, datas)
+    
+    carimbos = {data: (versoes[data], cache.configuracoes.versao, catalogo.versao()) for data in datas}
+    inicios = {}
+    pendentes = []
+    for data in datas:
+        entrada = _cache_horarios.obter((barbeiro_id, data, duracao))
+        if entrada is not None and entrada[0] == carimbos[data]:
+            inicios[data] = entrada[1]
+        else:
+            pendentes.append(data)
+    
+    if pendentes:
+        fim = (datetime.strptime(pendentes[-1], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        reservas = carregar_reservas(cursor, pendentes[0], fim, barbeiro_id)
+        agendas = montar_agendas(reservas, set(pendentes), expediente_atual, cat)
+        abertura, fechamento, _ = expediente_atual
+        for data in pendentes:
+            agenda = agendas.get((barbeiro_id, data)) or AgendaDia(abertura, fechamento)
+            inicios[data] = tuple(agenda.inicios_livres(duracao))
+            _cache_horarios.guardar((barbeiro_id, data, duracao), (carimbos[data], inicios[data]))
+    
+    conn.close()
+    return inicios
+
+def horarios_periodo(barbeiro_id, data_inicio, dias=1, servico_id=None, agora=None):
+    dias = max(1, min(int(dias), MAX_DIAS_PERIODO))
+    datas = _datas_do_periodo(data_inicio, dias)
+    agora = agora or datetime.now()
+    
+    cat = catalogo.obter()
+    expediente_atual = expediente()
+    dias_abertos = expediente_atual[2]
+    duracao = duracao_solicitada(servico_id, cat)
+    
+    abertas = [data.isoformat() for data in datas
+               if data.isoweekday() in dias_abertos and data >= agora.date()]
+    inicios = _inicios_livres(barbeiro_id, abertas, duracao, cat, expediente_atual) if abertas else {}
+    
+    resultado = {}
+    hoje = agora.date().isoformat()
+    minuto_atual = agora.hour * 60 + agora.minute
+    for data in datas:
+        chave = data.isoformat()
+        resultado[chave] = [formatar_horario(inicio) for inicio in inicios.get(chave, ())
+                            if chave != hoje or inicio > minuto_atual]
+    
+    return resultado
+
+def _inicios_do_barbeiro(barbeiro_id, datas, agendas, expediente_atual, duracao, agora):
+    abertura, fechamento, _ = expediente_atual
+    for data in datas:
+        agenda = agendas.get((barbeiro_id, data.isoformat())) or AgendaDia(abertura, fechamento)
+        depois_de = agora.hour * 60 + agora.minute if data == agora.date() else None
+        for inicio in agenda.inicios_livres(duracao, depois_de=depois_de):
+            yield data, inicio, barbeiro_id
+
+def primeiros_horarios(servico_id, data_inicio=None, dias=MAX_DIAS_PERIODO, limite=LIMITE_PRIMEIROS, agora=None):
+    agora = agora or datetime.now()
+    dias = max(1, min(int(dias), MAX_DIAS_PERIODO))
+    limite = max(1, min(int(limite), MAX_PRIMEIROS))
+    
+    cat = catalogo.obter()
+    expediente_atual = expediente()
+    duracao = duracao_solicitada(servico_id, cat)
+    datas = [data for data in _datas_do_periodo(data_inicio or agora.date().isoformat(), dias)
+             if data.isoweekday() in expediente_atual[2] and data >= agora.date()]
+    if not datas or not cat.barbeiros_ativos:
+        return []
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    reservas = carregar_reservas(cursor, datas[0].isoformat(), (datas[-1] + timedelta(days=1)).isoformat())
+    conn.close()
+    
+    agendas = montar_agendas(reservas, {data.isoformat() for data in datas}, expediente_atual, cat)
+    candidatos = heapq.merge(*(_inicios_do_barbeiro(barbeiro['id'], datas, agendas, expediente_atual, duracao, agora)
+                               for barbeiro in cat.barbeiros_ativos))
+    
+    return [{'barbeiro_id': barbeiro_id,
+             'barbeiro_nome': cat.barbeiros_por_id[barbeiro_id]['nome'],
+             'data': data.isoformat(),
+             'horario': formatar_horario(inicio)}
+            for data, inicio, barbeiro_id in islice(candidatos, limite)]
+
+def horarios_do_dia(barbeiro_id, data, servico_id=None, agora=None):
+    return next(iter(horarios_periodo(barbeiro_id, data, 1, servico_id, agora).values()))
@@ -0,0 +1,56 @@
+import database as db
+import cache
+import notificacoes
+
+LOTE = 100
+OUVINTES = []
+
+def alertas(conn=None):
+    conn = conn or db.get_db_connection()
+    return conn.execute('SELECT * FROM produtos WHERE estoque <= estoque_minimo ORDER BY nome').fetchall()
+
+def disponivel(produto_id, conn=None):
+    conn = conn or db.get_db_connection()
+    row = conn.execute('SELECT estoque FROM produtos WHERE id = ?', (produto_id,)).fetchone()
+    return row['estoque'] if row else 0
+
+def ouvir(funcao):
+    OUVINTES.append(funcao)
+    return funcao
+
+@ouvir
+def notificar_reposicao(cursor, evento, configs):
+    if evento['tipo'] != 'estoque_baixo':
+        return
+    notificacoes.enfileirar(cursor, 'estoque_baixo', configs.get('whatsapp') or configs.get('telefone'),
+                            evento, f"estoque:{evento['id']}")
+
+def processar_eventos():
+    total = 0
+    while True:
+        configs = cache.configuracoes.obter()
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''SELECT e.id, e.produto_id, e.tipo, e.estoque, e.estoque_minimo, p.nome as produto_nome
+                             FROM eventos_estoque e
+                             LEFT JOIN produtos p ON e.produto_id = p.id
+                             WHERE e.processado = 0
+                             ORDER BY e.id
+                             LIMIT ?''', (LOTE,))
+            eventos = [dict(row) for row in cursor.fetchall()]
+            for evento in eventos:
+                for ouvinte in OUVINTES:
+                    ouvinte(cursor, evento, configs)
+            cursor.executemany('UPDATE eventos_estoque SET processado = 1 WHERE id = ?',
+                               [(evento['id'],) for evento in eventos])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        total += len(eventos)
+        if len(eventos) < LOTE:
+            return f'{total} eventos de estoque processados'
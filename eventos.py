@@ -0,0 +1,159 @@
+import json
+import os
+import queue
+import threading
+import time
+import database as db
+
+INTERVALO_VERIFICACAO = 1.0
+INTERVALO_HEARTBEAT = 15
+DURACAO_MAXIMA_STREAM = 300
+LIMITE_LOTE = 200
+TAMANHO_FILA = 500
+RETRY_MS = 3000
+RECONEXAO_MS = 30000
+THREADS_POR_WORKER = int(os.getenv('GUNICORN_THREADS', '16'))
+MAX_CONEXOES = int(os.getenv('MAX_CONEXOES_EVENTOS') or max(1, THREADS_POR_WORKER // 2))
+
+def ultimo_evento(conn=None):
+    conn = conn or db.get_db_connection()
+    row = conn.execute('SELECT MAX(id) as id FROM eventos_agendamentos').fetchone()
+    return row['id'] or 0
+
+def carregar_eventos(cursor, depois_de, limite=LIMITE_LOTE):
+    cursor.execute('''
+        SELECT
+            e.id,
+            e.tipo,
+            e.agendamento_id,
+            a.data_hora,
+            a.status,
+            c.nome as cliente_nome,
+            c.telefone as cliente_telefone,
+            s.nome as servico_nome,
+            b.nome as barbeiro_nome,
+            COALESCE(a.valor, COALESCE(s.preco_promocional, s.preco)) as valor,
+            a.observacoes,
+            e.data_criacao
+        FROM eventos_agendamentos e
+        LEFT JOIN agendamentos a ON e.agendamento_id = a.id
+        LEFT JOIN clientes c ON a.cliente_id = c.id
+        LEFT JOIN servicos s ON a.servico_id = s.id
+        LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+        WHERE e.id > ?
+        ORDER BY e.id
+        LIMIT ?
+    ''', (depois_de, limite))
+    return [dict(row) for row in cursor.fetchall()]
+
+def formatar_evento(evento):
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+class Observador:
+    def __init__(self):
+        self._assinantes = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._ultimo_id = 0
+
+    def assinar(self):
+        fila = queue.Queue(TAMANHO_FILA)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._assinantes = set()
+                self._thread = None
+                self._pid = os.getpid()
+            self._assinantes.add(fila)
+            if self._thread is None or not self._thread.is_alive():
+                self._ultimo_id = ultimo_evento()
+                self._thread = threading.Thread(target=self._executar, name='observador-agendamentos', daemon=True)
+                self._thread.start()
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.discard(fila)
+
+    @property
+    def ultimo_id(self):
+        return self._ultimo_id
+
+    def _publicar(self, eventos):
+        with self._lock:
+            for fila in list(self._assinantes):
+                try:
+                    for evento in eventos:
+                        fila.put_nowait(evento)
+                except queue.Full:
+                    self._assinantes.discard(fila)
+                    with fila.mutex:
+                        fila.queue.clear()
+                    fila.put_nowait(None)
+
+    def _executar(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._assinantes:
+                        self._thread = None
+                        return
+                try:
+                    conn = db.get_db_connection()
+                    eventos = carregar_eventos(conn.cursor(), self._ultimo_id)
+                    conn.close()
+                except Exception as e:
+                    print(f"Erro ao verificar eventos de agendamentos: {e}")
+                    eventos = []
+                if eventos:
+                    self._ultimo_id = eventos[-1]['id']
+                    self._publicar(eventos)
+                if len(eventos) < LIMITE_LOTE:
+                    time.sleep(INTERVALO_VERIFICACAO)
+        finally:
+            db.fechar_conexao()
+
+observador = Observador()
+_conexoes = threading.BoundedSemaphore(MAX_CONEXOES)
+
+def reservar_conexao():
+    return _conexoes.acquire(blocking=False)
+
+def liberar_conexao():
+    _conexoes.release()
+
+def transmitir(depois_de=None):
+    fila = observador.assinar()
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        
+        if depois_de is None:
+            ultimo_enviado = observador.ultimo_id
+        else:
+            ultimo_enviado = depois_de
+            while True:
+                conn = db.get_db_connection()
+                pendentes = carregar_eventos(conn.cursor(), ultimo_enviado)
+                conn.close()
+                for evento in pendentes:
+                    yield formatar_evento(evento)
+                    ultimo_enviado = evento['id']
+                if len(pendentes) < LIMITE_LOTE:
+                    break
+        
+        yield f"id: {ultimo_enviado}\nevent: conectado\ndata: {{}}\n\n"
+        
+        limite = time.monotonic() + DURACAO_MAXIMA_STREAM
+        while time.monotonic() < limite:
+            try:
+                evento = fila.get(timeout=INTERVALO_HEARTBEAT)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if evento is None:
+                return
+            if evento['id'] > ultimo_enviado:
+                yield formatar_evento(evento)
+                ultimo_enviado = evento['id']
+    finally:
+        observador.cancelar(fila)
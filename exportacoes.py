@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+from datetime import datetime
+import database as db
+
+LOTE = 500
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORTACOES = {
+    'vendas': ('''SELECT v.id, v.data_venda, v.status, v.tipo, v.item_id,
+                  COALESCE(s.nome, p.nome) as item_nome, v.quantidade, v.valor_unitario, v.valor_total,
+                  v.metodo_pagamento, v.cliente_id, c.nome as cliente_nome, v.barbeiro_id, b.nome as barbeiro_nome
+                  FROM vendas v
+                  LEFT JOIN servicos s ON v.tipo = 'servico' AND v.item_id = s.id
+                  LEFT JOIN produtos p ON v.tipo = 'produto' AND v.item_id = p.id
+                  LEFT JOIN clientes c ON v.cliente_id = c.id
+                  LEFT JOIN barbeiros b ON v.barbeiro_id = b.id''',
+               'v.data_venda', 'v.status'),
+    'pedidos': ('''SELECT p.id as pedido_id, p.data_criacao, p.status, p.metodo_pagamento,
+                   p.valor_total as valor_pedido, p.cliente_id, c.nome as cliente_nome,
+                   c.telefone as cliente_telefone, i.tipo, i.item_id, i.nome as item_nome, i.quantidade,
+                   i.valor_unitario, i.valor_total
+                   FROM pedidos p
+                   LEFT JOIN clientes c ON p.cliente_id = c.id
+                   LEFT JOIN pedidos_itens i ON i.pedido_id = p.id''',
+                'p.data_criacao', 'p.status'),
+    'agendamentos': ('''SELECT a.id, a.data_hora, a.status, a.servico_id, s.nome as servico_nome,
+                        a.barbeiro_id, b.nome as barbeiro_nome, a.cliente_id, c.nome as cliente_nome,
+                        c.telefone as cliente_telefone,
+                        COALESCE(a.valor, COALESCE(s.preco_promocional, s.preco)) as valor, a.observacoes,
+                        a.data_criacao
+                        FROM agendamentos a
+                        LEFT JOIN servicos s ON a.servico_id = s.id
+                        LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+                        LEFT JOIN clientes c ON a.cliente_id = c.id''',
+                     'a.data_hora', 'a.status'),
+}
+
+class ErroExportacao(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+def montar_consulta(nome, data_inicio=None, data_fim=None, status=None):
+    if nome not in EXPORTACOES:
+        raise ErroExportacao('Exportação não encontrada', 404)
+    sql, coluna_data, coluna_status = EXPORTACOES[nome]
+    
+    condicoes = []
+    params = []
+    try:
+        if data_inicio:
+            condicoes.append(f'{coluna_data} >= ?')
+            params.append(db.intervalo_do_dia(data_inicio)[0])
+        if data_fim:
+            condicoes.append(f'{coluna_data} < ?')
+            params.append(db.intervalo_do_dia(data_fim)[1])
+    except ValueError:
+        raise ErroExportacao('Datas devem estar no formato AAAA-MM-DD')
+    if status:
+        condicoes.append(f'{coluna_status} = ?')
+        params.append(status)
+    
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    return f'{sql}\n{where}\nORDER BY {coluna_data}', params
+
+def _celula_csv(valor):
+    if isinstance(valor, str) and valor[:1] in ('=', '+', '-', '@'):
+        return "'" + valor
+    return valor
+
+def _linhas(sql, params, formatar, cabecalho=None):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        colunas = [descricao[0] for descricao in cursor.description]
+        if cabecalho:
+            yield cabecalho(colunas)
+        while True:
+            lote = cursor.fetchmany(LOTE)
+            if not lote:
+                break
+            yield formatar(colunas, lote)
+    finally:
+        cursor.close()
+        conn.close()
+
+def _cabecalho_csv(colunas):
+    buffer = io.StringIO()
+    buffer.write('\ufeff')
+    csv.writer(buffer).writerow(colunas)
+    return buffer.getvalue()
+
+def _lote_csv(colunas, lote):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_celula_csv(valor) for valor in row] for row in lote)
+    return buffer.getvalue()
+
+def _lote_ndjson(colunas, lote):
+    return ''.join(json.dumps(dict(zip(colunas, row)), ensure_ascii=False) + '\n' for row in lote)
+
+def exportar(nome, formato='csv', data_inicio=None, data_fim=None, status=None):
+    if formato not in FORMATOS:
+        raise ErroExportacao(f"Formato inválido; use {', '.join(FORMATOS)}")
+    sql, params = montar_consulta(nome, data_inicio, data_fim, status)
+    
+    if formato == 'csv':
+        linhas = _linhas(sql, params, _lote_csv, _cabecalho_csv)
+    else:
+        linhas = _linhas(sql, params, _lote_ndjson)
+    arquivo = f"{nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return linhas, FORMATOS[formato], arquivo
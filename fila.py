@@ -0,0 +1,184 @@
+import json
+import sqlite3
+import time
+from bisect import bisect_left
+from types import MappingProxyType
+import database as db
+import cache
+import catalogo
+
+VERSAO = 'fila'
+TEMPO_ATENDIMENTO_PADRAO = 30
+INTERVALO_HEARTBEAT = 15
+DURACAO_MAXIMA_STREAM = 300
+RETRY_MS = 3000
+
+class ErroFila(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+class EntradaNaoEncontrada(ErroFila):
+    status = 404
+
+class BancoOcupado(ErroFila):
+    status = 503
+
+def tempo_atendimento(configs=None):
+    configs = configs if configs is not None else cache.configuracoes.obter()
+    try:
+        return max(1, int(configs.get('tempo_atendimento') or TEMPO_ATENDIMENTO_PADRAO))
+    except ValueError:
+        return TEMPO_ATENDIMENTO_PADRAO
+
+class Fila:
+    def __init__(self, entradas, tempo_padrao, duracoes, barbeiros, carimbo=None):
+        self.carimbo = carimbo
+        self.entradas = tuple(entradas)
+        self.por_id = {entrada['id']: entrada for entrada in self.entradas}
+        self.posicoes = [entrada['posicao'] for entrada in self.entradas]
+        self.barbeiros = max(1, barbeiros)
+        self.acumulado = [0]
+        for entrada in self.entradas:
+            self.acumulado.append(self.acumulado[-1] + (duracoes.get(entrada['servico_id']) or tempo_padrao))
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def posicao_de(self, entrada_id):
+        entrada = self.por_id.get(entrada_id)
+        if entrada is None:
+            return None
+        return bisect_left(self.posicoes, entrada['posicao']) + 1
+
+    def espera_minutos(self, posicao=None):
+        a_frente = len(self.entradas) if posicao is None else posicao - 1
+        return -(-self.acumulado[a_frente] // self.barbeiros)
+
+def _carregar_fila():
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''SELECT id, cliente_nome, servico_id, posicao, data_entrada FROM fila_virtual
+                     WHERE status = 'aguardando' ORDER BY posicao''')
+    entradas = [MappingProxyType(dict(row)) for row in cursor.fetchall()]
+    cursor.close()
+    
+    cat = catalogo.obter()
+    configs = cache.configuracoes.obter()
+    duracoes = {servico_id: servico['duracao_minutos'] for servico_id, servico in cat.servicos_por_id.items()}
+    return Fila(entradas, tempo_atendimento(configs), duracoes, len(cat.barbeiros_ativos),
+                (cache.configuracoes.versao, catalogo.versao()))
+
+_cache = cache.CacheVersionado(VERSAO, _carregar_fila)
+_vigia = cache.VigiaVersao(VERSAO)
+
+def obter():
+    catalogo.obter()
+    cache.configuracoes.obter()
+    fila = _cache.obter()
+    if fila.carimbo != (cache.configuracoes.versao, catalogo.versao()):
+        _cache.invalidar()
+        fila = _cache.obter()
+    return fila
+
+def _alterar(operacao):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        resultado = operacao(cursor)
+        db.incrementar_versao(cursor, VERSAO)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    _cache.invalidar()
+    return resultado
+
+def entrar(cliente_nome, cliente_telefone=None, servico_id=None):
+    cliente_nome = (cliente_nome or '').strip()[:100]
+    if not cliente_nome:
+        raise ErroFila('Informe seu nome para entrar na fila')
+    if servico_id:
+        servico_id = int(servico_id)
+        if servico_id not in catalogo.obter().servicos_por_id:
+            raise ErroFila('Serviço não encontrado', 404)
+
+    def inserir(cursor):
+        cursor.execute('SELECT COALESCE(MAX(posicao), 0) + 1 as proxima FROM fila_virtual')
+        cursor.execute('''INSERT INTO fila_virtual (cliente_nome, cliente_telefone, servico_id, posicao, status)
+                         VALUES (?, ?, ?, ?, 'aguardando')''',
+                       (cliente_nome, (cliente_telefone or '')[:20] or None, servico_id or None,
+                        cursor.fetchone()['proxima']))
+        return cursor.lastrowid
+    
+    return _alterar(inserir)
+
+def _mudar_status(entrada_id, de, para):
+    def atualizar(cursor):
+        cursor.execute('UPDATE fila_virtual SET status = ? WHERE id = ? AND status = ?', (para, entrada_id, de))
+        if cursor.rowcount != 1:
+            raise EntradaNaoEncontrada('Você não está na fila')
+        return entrada_id
+    return _alterar(atualizar)
+
+def sair(entrada_id):
+    return _mudar_status(entrada_id, 'aguardando', 'desistiu')
+
+def chamar_proximo():
+    def chamar(cursor):
+        cursor.execute('''SELECT id, cliente_nome, cliente_telefone, servico_id, posicao FROM fila_virtual
+                         WHERE status = 'aguardando' ORDER BY posicao LIMIT 1''')
+        entrada = cursor.fetchone()
+        if not entrada:
+            raise EntradaNaoEncontrada('Fila vazia')
+        cursor.execute("UPDATE fila_virtual SET status = 'chamado' WHERE id = ?", (entrada['id'],))
+        return dict(entrada)
+    return _alterar(chamar)
+
+def situacao(entrada_id):
+    fila = obter()
+    posicao = fila.posicao_de(entrada_id)
+    if posicao is not None:
+        return {'status': 'aguardando', 'posicao': posicao, 'espera_minutos': fila.espera_minutos(posicao),
+                'total': len(fila)}
+    
+    conn = db.get_db_connection()
+    row = conn.execute('SELECT status FROM fila_virtual WHERE id = ?', (entrada_id,)).fetchone()
+    conn.close()
+    if not row:
+        raise EntradaNaoEncontrada('Entrada não encontrada')
+    return {'status': row['status'], 'posicao': None, 'espera_minutos': 0, 'total': len(fila)}
+
+def transmitir(entrada_id):
+    yield f"retry: {RETRY_MS}\n\n"
+    
+    ultima = None
+    limite = time.monotonic() + DURACAO_MAXIMA_STREAM
+    while time.monotonic() < limite:
+        try:
+            atual = situacao(entrada_id)
+        except EntradaNaoEncontrada:
+            return
+        if atual != ultima:
+            yield f"event: posicao\ndata: {json.dumps(atual)}\n\n"
+            ultima = atual
+        if atual['status'] != 'aguardando':
+            return
+        
+        versao = _cache.versao
+        if _vigia.aguardar(versao, INTERVALO_HEARTBEAT) == versao:
+            yield ": ping\n\n"
@@ -0,0 +1,17 @@
+import database as db
+import agendador
+import eventos
+
+worker_class = 'gthread'
+threads = eventos.THREADS_POR_WORKER
+
+def on_starting(server):
+    versao = db.aplicar_migracoes()
+    db.fechar_conexao()
+    server.log.info(f"Schema do banco na versão {versao}")
+
+def post_worker_init(worker):
+    agendador.iniciar()
+
+def worker_exit(server, worker):
+    agendador.parar()
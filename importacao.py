@@ -0,0 +1,257 @@
+import csv
+import io
+import json
+import math
+import sqlite3
+import database as db
+import catalogo
+
+MAX_LINHAS = 5000
+ALIASES = {'duracao': 'duracao_minutos'}
+
+class ErroImportacao(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+class BancoOcupado(ErroImportacao):
+    status = 503
+
+def _texto(limite):
+    def converter(valor):
+        return str(valor).strip()[:limite] or None
+    return converter
+
+def _decimal(valor):
+    if isinstance(valor, str):
+        valor = valor.strip().replace('R$', '').strip()
+        if ',' in valor:
+            valor = valor.replace('.', '').replace(',', '.')
+    try:
+        numero = round(float(valor), 2)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('deve ser um número')
+    if not math.isfinite(numero):
+        raise ValueError('deve ser um número')
+    if numero < 0:
+        raise ValueError('não pode ser negativo')
+    return numero
+
+def _inteiro(valor):
+    try:
+        numero = float(str(valor).strip().replace(',', '.'))
+    except (ValueError, OverflowError):
+        raise ValueError('deve ser um número inteiro')
+    if not math.isfinite(numero) or numero != int(numero):
+        raise ValueError('deve ser um número inteiro')
+    if numero < 0:
+        raise ValueError('não pode ser negativo')
+    if numero >= 2 ** 63:
+        raise ValueError('valor muito grande')
+    return int(numero)
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return int(valor)
+    texto = str(valor).strip().lower()
+    if texto in ('1', 'sim', 's', 'true', 'verdadeiro', 'x'):
+        return 1
+    if texto in ('0', 'não', 'nao', 'n', 'false', 'falso'):
+        return 0
+    raise ValueError('use 1/0 ou sim/não')
+
+CAMPOS_COMUNS = {
+    'nome': _texto(100),
+    'descricao': _texto(1000),
+    'preco': _decimal,
+    'preco_promocional': _decimal,
+    'categoria_id': _inteiro,
+    'imagem': _texto(500),
+    'ativo': _booleano,
+    'destaque': _booleano,
+    'promocao': _booleano,
+}
+
+TIPOS = {
+    'produtos': (dict(CAMPOS_COMUNS, estoque=_inteiro, estoque_minimo=_inteiro),
+                 {'estoque': 0, 'estoque_minimo': 5, 'ativo': 1, 'destaque': 0, 'promocao': 0}),
+    'servicos': (dict(CAMPOS_COMUNS, duracao_minutos=_inteiro),
+                 {'duracao_minutos': 30, 'ativo': 1, 'destaque': 0, 'promocao': 0}),
+}
+
+def ler_arquivo(conteudo, formato):
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            conteudo = conteudo.decode('cp1252', errors='replace')
+    if formato == 'json':
+        try:
+            dados = json.loads(conteudo)
+        except ValueError as e:
+            raise ErroImportacao(f'JSON inválido: {e}')
+        if isinstance(dados, dict):
+            dados = dados.get('itens')
+        if not isinstance(dados, list) or not all(isinstance(linha, dict) for linha in dados):
+            raise ErroImportacao('O JSON deve ser uma lista de objetos ou {"itens": [...]}')
+        return dados
+    if formato == 'csv':
+        primeira_linha = conteudo.split('\n', 1)[0]
+        delimitador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+        return list(csv.DictReader(io.StringIO(conteudo), delimiter=delimitador))
+    raise ErroImportacao('Formato inválido; use csv ou json')
+
+def _normalizar(linha):
+    normalizada = {}
+    for chave, valor in linha.items():
+        if chave is None:
+            continue
+        chave = chave.strip().lower()
+        normalizada[ALIASES.get(chave, chave)] = valor
+    return normalizada
+
+def validar(tipo, linhas, existentes, categorias):
+    campos, padroes = TIPOS[tipo]
+    por_nome = {}
+    for item in existentes.values():
+        por_nome.setdefault(item['nome'].casefold(), []).append(item['id'])
+    
+    registros = []
+    erros = []
+    vistos = {}
+    for numero, linha in enumerate(linhas, start=1):
+        linha = _normalizar(linha)
+        erros_linha = []
+        
+        desconhecidas = sorted(set(linha) - set(campos) - {'id'})
+        if desconhecidas:
+            erros_linha.append({'campo': desconhecidas[0], 'erro': 'coluna desconhecida'})
+        
+        valores = {}
+        for campo, converter in campos.items():
+            valor = linha.get(campo)
+            if valor is None or (isinstance(valor, str) and not valor.strip()):
+                continue
+            try:
+                valores[campo] = converter(valor)
+            except ValueError as e:
+                erros_linha.append({'campo': campo, 'erro': str(e)})
+        
+        item_id = None
+        if linha.get('id') not in (None, ''):
+            try:
+                item_id = _inteiro(linha['id'])
+            except ValueError as e:
+                erros_linha.append({'campo': 'id', 'erro': str(e)})
+            else:
+                if item_id not in existentes:
+                    erros_linha.append({'campo': 'id', 'erro': 'item não encontrado'})
+        elif valores.get('nome'):
+            ids = por_nome.get(valores['nome'].casefold(), [])
+            if len(ids) > 1:
+                erros_linha.append({'campo': 'nome', 'erro': 'mais de um item com este nome; informe o id'})
+            elif ids:
+                item_id = ids[0]
+        
+        chave = item_id if item_id is not None else (valores.get('nome') or '').casefold()
+        if chave in vistos:
+            erros_linha.append({'campo': 'id' if item_id is not None else 'nome',
+                                'erro': f'item repetido (linha {vistos[chave]})'})
+        vistos.setdefault(chave, numero)
+        
+        registro = dict(existentes.get(item_id) or padroes)
+        registro.update(valores)
+        registro['id'] = item_id if item_id in existentes else None
+        invalidos = {erro['campo'] for erro in erros_linha}
+        if not registro.get('nome') and 'nome' not in invalidos:
+            erros_linha.append({'campo': 'nome', 'erro': 'obrigatório'})
+        if not registro.get('preco') and 'preco' not in invalidos:
+            erros_linha.append({'campo': 'preco', 'erro': 'obrigatório e maior que zero'})
+        elif registro.get('preco') and (registro.get('preco_promocional') or 0) >= registro['preco']:
+            erros_linha.append({'campo': 'preco_promocional', 'erro': 'deve ser menor que o preço'})
+        if registro.get('categoria_id') is not None and registro['categoria_id'] not in categorias:
+            erros_linha.append({'campo': 'categoria_id', 'erro': 'categoria não encontrada'})
+        if tipo == 'servicos' and not registro.get('duracao_minutos') and 'duracao_minutos' not in invalidos:
+            erros_linha.append({'campo': 'duracao_minutos', 'erro': 'deve ser maior que zero'})
+        
+        if erros_linha:
+            erros.extend(dict(erro, linha=numero) for erro in erros_linha)
+        else:
+            registros.append(registro)
+    return registros, erros
+
+def importar(tipo, linhas, simular=False):
+    if tipo not in TIPOS:
+        raise ErroImportacao('Tipo de importação não encontrado', 404)
+    if not linhas:
+        raise ErroImportacao('Nenhuma linha para importar')
+    if len(linhas) > MAX_LINHAS:
+        raise ErroImportacao(f'Máximo de {MAX_LINHAS} linhas por importação')
+    campos, _ = TIPOS[tipo]
+    colunas = ['id', *campos]
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        if not simular:
+            cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute(f"SELECT {', '.join(colunas)} FROM {tipo}")
+        existentes = {row['id']: dict(row) for row in cursor.fetchall()}
+        cursor.execute('SELECT id FROM categorias')
+        categorias = {row['id'] for row in cursor.fetchall()}
+        
+        registros, erros = validar(tipo, linhas, existentes, categorias)
+        relatorio = {
+            'tipo': tipo,
+            'total': len(linhas),
+            'inseridos': sum(1 for registro in registros if registro['id'] is None),
+            'atualizados': sum(1 for registro in registros if registro['id'] is not None),
+            'erros': erros,
+            'simulacao': bool(simular),
+        }
+        if erros or simular:
+            conn.rollback()
+            return relatorio
+        
+        cursor.executemany(f'''INSERT INTO {tipo} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})
+                              ON CONFLICT(id) DO UPDATE SET
+                              {', '.join(f'{campo} = excluded.{campo}' for campo in campos)}''',
+                           [tuple(registro.get(coluna) for coluna in colunas) for registro in registros])
+        catalogo.marcar_alterado(cursor)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    catalogo.invalidar()
+    return relatorio
+
+if __name__ == '__main__':
+    import sys
+    
+    argumentos = [argumento for argumento in sys.argv[1:] if not argumento.startswith('--')]
+    if len(argumentos) != 2:
+        raise SystemExit('Uso: python importacao.py produtos|servicos ARQUIVO.csv|ARQUIVO.json [--simular]')
+    tipo, caminho = argumentos
+    db.aplicar_migracoes()
+    with open(caminho, 'rb') as arquivo:
+        linhas = ler_arquivo(arquivo.read(), caminho.rsplit('.', 1)[-1].lower())
+    resultado = importar(tipo, linhas, simular='--simular' in sys.argv)
+    for erro in resultado['erros']:
+        print(f"linha {erro['linha']}: {erro['campo']}: {erro['erro']}")
+    print(f"{resultado['inseridos']} inseridos, {resultado['atualizados']} atualizados, "
+          f"{len(resultado['erros'])} erros{' (simulação)' if resultado['simulacao'] else ''}")
+    if resultado['erros']:
+        raise SystemExit(1)
@@ -0,0 +1,183 @@
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+import database as db
+
+CANAL_PADRAO = 'whatsapp'
+LOTE = 50
+MAX_TENTATIVAS = 6
+ATRASO_BASE_SEGUNDOS = 30
+ATRASO_MAXIMO_SEGUNDOS = 3600
+TEMPO_MAXIMO_DESPACHO = 8
+
+MENSAGENS = {
+    'agendamento_confirmado': 'Olá, {cliente_nome}! Seu horário de {servico_nome} com {barbeiro_nome} '
+                              'está confirmado para {data_hora}.',
+    'agendamento_lembrete': 'Olá, {cliente_nome}! Lembrete: {servico_nome} com {barbeiro_nome} em {data_hora}.',
+    'agendamento_cancelado': 'Olá, {cliente_nome}. Seu horário de {data_hora} foi cancelado.',
+    'pagamento_confirmado': 'Olá, {cliente_nome}! Recebemos o pagamento do pedido #{pedido_id} '
+                            '({valor_total}). Obrigado!',
+    'pedido_cancelado': 'Olá, {cliente_nome}. O pedido #{pedido_id} foi cancelado.',
+    'estoque_baixo': 'Estoque baixo: {produto_nome} está com {estoque} un. (mínimo {estoque_minimo}). '
+                     'Hora de repor!',
+}
+
+def _formatar_data_hora(valor):
+    data, _, hora = (valor or '').partition(' ')
+    if not hora:
+        return valor
+    ano, mes, dia = data.split('-')
+    return f'{dia}/{mes}/{ano} às {hora[:5]}'
+
+def enfileirar(cursor, tipo, destino, dados, chave, canal=CANAL_PADRAO):
+    if not destino:
+        return False
+    dados = dict(dados)
+    if 'data_hora' in dados:
+        dados['data_hora'] = _formatar_data_hora(dados['data_hora'])
+    if isinstance(dados.get('valor_total'), (int, float)):
+        dados['valor_total'] = f"R$ {dados['valor_total']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    mensagem = MENSAGENS[tipo].format_map(dados)
+    cursor.execute('''INSERT OR IGNORE INTO outbox (chave, tipo, canal, destino, mensagem, dados)
+                     VALUES (?, ?, ?, ?, ?, ?)''',
+                   (chave, tipo, canal, destino, mensagem, json.dumps(dados, ensure_ascii=False)))
+    return cursor.rowcount == 1
+
+def enfileirar_agendamento(cursor, tipo, agendamento_id):
+    cursor.execute('''SELECT a.id, a.data_hora, c.nome as cliente_nome, c.telefone,
+                     s.nome as servico_nome, b.nome as barbeiro_nome
+                     FROM agendamentos a
+                     JOIN clientes c ON a.cliente_id = c.id
+                     LEFT JOIN servicos s ON a.servico_id = s.id
+                     LEFT JOIN barbeiros b ON a.barbeiro_id = b.id
+                     WHERE a.id = ?''', (agendamento_id,))
+    row = cursor.fetchone()
+    if not row:
+        return False
+    return enfileirar(cursor, tipo, row['telefone'], dict(row), f'agendamento:{agendamento_id}:{tipo}')
+
+def enfileirar_pedido(cursor, tipo, pedido_id):
+    cursor.execute('''SELECT p.id as pedido_id, p.valor_total, c.nome as cliente_nome, c.telefone
+                     FROM pedidos p
+                     JOIN clientes c ON p.cliente_id = c.id
+                     WHERE p.id = ?''', (pedido_id,))
+    row = cursor.fetchone()
+    if not row:
+        return False
+    return enfileirar(cursor, tipo, row['telefone'], dict(row), f'pedido:{pedido_id}:{tipo}')
+
+class TransporteLog:
+    def enviar(self, mensagens):
+        for mensagem in mensagens:
+            print(f"[{mensagem['canal']}] {mensagem['destino']}: {mensagem['mensagem']}")
+        return {}
+
+class TransporteArquivo:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def enviar(self, mensagens):
+        with self._lock, open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            for mensagem in mensagens:
+                arquivo.write(json.dumps(mensagem, ensure_ascii=False) + '\n')
+        return {}
+
+class TransporteHttp:
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def enviar(self, mensagens):
+        requisicao = urllib.request.Request(self.url, data=json.dumps({'mensagens': mensagens}).encode(),
+                                            headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urllib.request.urlopen(requisicao, timeout=self.timeout) as resposta:
+                corpo = json.loads(resposta.read() or b'{}')
+        except Exception as e:
+            return {mensagem['id']: str(e) for mensagem in mensagens}
+        return {int(chave): erro for chave, erro in (corpo.get('falhas') or {}).items()}
+
+def criar_transporte(destino=None):
+    destino = destino if destino is not None else os.getenv('NOTIFICACOES_TRANSPORTE', '')
+    if destino.startswith(('http://', 'https://')):
+        return TransporteHttp(destino)
+    if destino.startswith('arquivo:'):
+        return TransporteArquivo(destino[len('arquivo:'):])
+    return TransporteLog()
+
+_transporte = None
+
+def configurar(transporte):
+    global _transporte
+    _transporte = transporte
+
+def transporte_atual():
+    global _transporte
+    if _transporte is None:
+        _transporte = criar_transporte()
+    return _transporte
+
+def atraso_tentativa(tentativas):
+    atraso = min(ATRASO_MAXIMO_SEGUNDOS, ATRASO_BASE_SEGUNDOS * 2 ** (tentativas - 1))
+    return atraso * random.uniform(0.8, 1.2)
+
+def despachar_lote(transporte=None, limite=LOTE):
+    transporte = transporte or transporte_atual()
+    agora = time.time()
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''SELECT id, chave, tipo, canal, destino, mensagem, tentativas FROM outbox
+                     WHERE status = 'pendente' AND proxima_tentativa <= ?
+                     ORDER BY proxima_tentativa, id
+                     LIMIT ?''', (agora, limite))
+    lote = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    if not lote:
+        return 0, 0
+    
+    try:
+        falhas = transporte.enviar([{chave: mensagem[chave] for chave in ('id', 'chave', 'tipo', 'canal', 'destino', 'mensagem')}
+                                    for mensagem in lote])
+    except Exception as e:
+        falhas = {mensagem['id']: str(e) for mensagem in lote}
+    
+    enviados = [(mensagem['id'],) for mensagem in lote if mensagem['id'] not in falhas]
+    reagendados = []
+    for mensagem in lote:
+        if mensagem['id'] in falhas:
+            tentativas = mensagem['tentativas'] + 1
+            status = 'falhou' if tentativas >= MAX_TENTATIVAS else 'pendente'
+            reagendados.append((status, tentativas, agora + atraso_tentativa(tentativas),
+                                str(falhas[mensagem['id']])[:500], mensagem['id']))
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany('''UPDATE outbox SET status = 'enviado', tentativas = tentativas + 1,
+                             data_envio = CURRENT_TIMESTAMP WHERE id = ?''', enviados)
+        cursor.executemany('''UPDATE outbox SET status = ?, tentativas = ?, proxima_tentativa = ?, ultimo_erro = ?
+                             WHERE id = ?''', reagendados)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    return len(enviados), len(reagendados)
+
+def despachar_pendentes(transporte=None, tempo_maximo=TEMPO_MAXIMO_DESPACHO):
+    limite = time.monotonic() + tempo_maximo
+    total_enviados = total_falhas = 0
+    while time.monotonic() < limite:
+        enviados, falhas = despachar_lote(transporte)
+        total_enviados += enviados
+        total_falhas += falhas
+        if enviados + falhas < LOTE:
+            break
+    return f'{total_enviados} notificações enviadas, {total_falhas} falhas'
@@ -0,0 +1,259 @@
+import sqlite3
+from datetime import datetime
+import database as db
+import catalogo
+import precos
+import notificacoes
+
+STATUS_INICIAL = 'aguardando_confirmacao'
+
+class ErroPedido(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+class ItemNaoEncontrado(ErroPedido):
+    status = 404
+
+class EstoqueInsuficiente(ErroPedido):
+    pass
+
+class BancoOcupado(ErroPedido):
+    status = 503
+
+def criar_pedido(cliente_id, carrinho_items, metodo_pagamento, observacoes):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        carrinho = precos.precificar_carrinho(carrinho_items, cursor)
+        
+        if carrinho.faltantes:
+            raise ItemNaoEncontrado(f'Item {carrinho.faltantes[0][1]} não encontrado')
+        
+        for item in carrinho.itens:
+            if not item.ativo:
+                raise ItemNaoEncontrado(f'Item {item.id} não encontrado')
+            if not item.estoque_suficiente:
+                raise EstoqueInsuficiente(f'Estoque insuficiente para {item.nome}')
+        
+        cursor.execute('''INSERT INTO pedidos (cliente_id, valor_total, status, metodo_pagamento, observacoes)
+                         VALUES (?, ?, ?, ?, ?)''',
+                       (cliente_id, carrinho.total, STATUS_INICIAL, metodo_pagamento, observacoes))
+        pedido_id = cursor.lastrowid
+        
+        cursor.executemany('''INSERT INTO pedidos_itens (pedido_id, tipo, item_id, nome, quantidade, 
+                             valor_unitario, valor_total) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                           [(pedido_id, item.tipo, item.id, item.nome, item.quantidade, item.preco, item.valor_total)
+                            for item in carrinho.itens])
+        
+        for item in carrinho.itens:
+            if item.tipo != 'produto':
+                continue
+            cursor.execute('UPDATE produtos SET estoque = estoque - ? WHERE id = ? AND estoque >= ?',
+                           (item.quantidade, item.id, item.quantidade))
+            if cursor.rowcount != 1:
+                raise EstoqueInsuficiente(f'Estoque insuficiente para {item.nome}')
+        
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    return pedido_id
+
+STATUS_EM_ABERTO = ('aguardando_confirmacao', 'pendente_pagamento')
+
+def _barbeiro_do_dia(cursor, cliente_id):
+    inicio, fim = db.intervalo_do_dia(datetime.now().strftime('%Y-%m-%d'))
+    cursor.execute('''SELECT barbeiro_id FROM agendamentos
+                     WHERE cliente_id = ? AND data_hora >= ? AND data_hora < ? AND status != 'cancelado'
+                     ORDER BY status = 'concluido' DESC, data_hora DESC
+                     LIMIT 1''', (cliente_id, inicio, fim))
+    row = cursor.fetchone()
+    return row['barbeiro_id'] if row else None
+
+def confirmar_pagamento(pedido_id, barbeiro_id=None):
+    if barbeiro_id is not None:
+        try:
+            barbeiro_id = int(barbeiro_id)
+        except (TypeError, ValueError):
+            raise ErroPedido('Barbeiro inválido')
+        if barbeiro_id not in catalogo.obter().barbeiros_por_id:
+            raise ItemNaoEncontrado('Barbeiro não encontrado')
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''UPDATE pedidos SET status = 'pago', data_atualizacao = CURRENT_TIMESTAMP
+                         WHERE id = ? AND status = 'aguardando_confirmacao'
+                         RETURNING cliente_id, metodo_pagamento''', (pedido_id,))
+        pedido = cursor.fetchone()
+        if not pedido:
+            raise ItemNaoEncontrado('Pedido não encontrado ou já confirmado')
+        
+        if barbeiro_id is None:
+            barbeiro_id = _barbeiro_do_dia(cursor, pedido['cliente_id'])
+        
+        cursor.execute('''INSERT INTO vendas (cliente_id, barbeiro_id, tipo, item_id, quantidade, 
+                         valor_unitario, valor_total, metodo_pagamento, status)
+                         SELECT ?, ?, tipo, item_id, quantidade, valor_unitario, valor_total, ?, 'concluido'
+                         FROM pedidos_itens WHERE pedido_id = ? ORDER BY id''',
+                       (pedido['cliente_id'], barbeiro_id, pedido['metodo_pagamento'], pedido_id))
+        
+        notificacoes.enfileirar_pedido(cursor, 'pagamento_confirmado', pedido_id)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def cancelar_pedidos(cursor, pedido_ids, status_permitidos=None):
+    if not pedido_ids:
+        return []
+    marcadores = ','.join('?' * len(pedido_ids))
+    condicao_status = "status != 'cancelado'"
+    params = list(pedido_ids)
+    if status_permitidos:
+        condicao_status = f"status IN ({','.join('?' * len(status_permitidos))})"
+        params.extend(status_permitidos)
+    
+    cursor.execute(f'''UPDATE pedidos SET status = 'cancelado', data_atualizacao = CURRENT_TIMESTAMP
+                      WHERE id IN ({marcadores}) AND {condicao_status}
+                      RETURNING id''', params)
+    cancelados = [row['id'] for row in cursor.fetchall()]
+    if not cancelados:
+        return []
+    for pedido_id in cancelados:
+        notificacoes.enfileirar_pedido(cursor, 'pedido_cancelado', pedido_id)
+    
+    marcadores = ','.join('?' * len(cancelados))
+    cursor.execute(f'''UPDATE produtos SET estoque = estoque + (
+                          SELECT SUM(i.quantidade) FROM pedidos_itens i
+                          WHERE i.pedido_id IN ({marcadores}) AND i.tipo = 'produto' AND i.item_id = produtos.id)
+                      WHERE id IN (SELECT item_id FROM pedidos_itens
+                                   WHERE pedido_id IN ({marcadores}) AND tipo = 'produto')''',
+                   cancelados + cancelados)
+    return cancelados
+
+def cancelar_pedido(pedido_id):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        if not cancelar_pedidos(cursor, [pedido_id]):
+            raise ItemNaoEncontrado('Pedido não encontrado ou já cancelado')
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if db.banco_ocupado(e):
+            raise BancoOcupado('Sistema ocupado, tente novamente em instantes') from e
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+LIMITE_PAGINA = 50
+LIMITE_HISTORICO = 10
+
+_COLUNAS_ITEM = ('id', 'tipo', 'item_id', 'nome', 'quantidade', 'valor_unitario', 'valor_total')
+
+def codificar_cursor(pedido):
+    return f"{pedido['data_criacao']}|{pedido['id']}"
+
+def decodificar_cursor(valor):
+    try:
+        data_criacao, pedido_id = valor.rsplit('|', 1)
+        return data_criacao, int(pedido_id)
+    except (AttributeError, ValueError):
+        return None
+
+def listar_pedidos(cliente_id=None, status=None, metodo_pagamento=None, data_inicio=None, data_fim=None,
+                   cursor_paginacao=None, limite=LIMITE_PAGINA):
+    condicoes = []
+    params = []
+    
+    if cliente_id is not None:
+        condicoes.append('cliente_id = ?')
+        params.append(cliente_id)
+    if status:
+        condicoes.append('status = ?')
+        params.append(status)
+    if metodo_pagamento:
+        condicoes.append('metodo_pagamento = ?')
+        params.append(metodo_pagamento)
+    if data_inicio:
+        condicoes.append('data_criacao >= ?')
+        params.append(db.intervalo_do_dia(data_inicio)[0])
+    if data_fim:
+        condicoes.append('data_criacao < ?')
+        params.append(db.intervalo_do_dia(data_fim)[1])
+    
+    posicao = decodificar_cursor(cursor_paginacao) if cursor_paginacao else None
+    if posicao:
+        condicoes.append('(data_criacao, id) < (?, ?)')
+        params.extend(posicao)
+    
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    colunas_item = ', '.join(f'i.{coluna} as item_{coluna}' for coluna in _COLUNAS_ITEM)
+    
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''WITH pagina AS (
+                         SELECT * FROM pedidos
+                         {where}
+                         ORDER BY data_criacao DESC, id DESC
+                         LIMIT ?
+                     )
+                     SELECT pagina.*, c.nome as cliente_nome, c.telefone as cliente_telefone, {colunas_item}
+                     FROM pagina
+                     LEFT JOIN clientes c ON pagina.cliente_id = c.id
+                     LEFT JOIN pedidos_itens i ON i.pedido_id = pagina.id''', params + [limite + 1])
+    linhas = cursor.fetchall()
+    conn.close()
+    
+    agrupados = {}
+    for linha in linhas:
+        registro = agrupados.get(linha['id'])
+        if registro is None:
+            pedido = {chave: linha[chave] for chave in linha.keys() if not chave.startswith('item_')}
+            registro = agrupados[linha['id']] = {'pedido': pedido, 'itens': []}
+        if linha['item_id'] is not None:
+            registro['itens'].append({coluna: linha[f'item_{coluna}'] for coluna in _COLUNAS_ITEM})
+    
+    resultado = sorted(agrupados.values(),
+                       key=lambda registro: (registro['pedido']['data_criacao'], registro['pedido']['id']),
+                       reverse=True)
+    for registro in resultado:
+        registro['itens'].sort(key=lambda item: item['id'])
+    
+    proximo_cursor = None
+    if len(resultado) > limite:
+        resultado = resultado[:limite]
+        proximo_cursor = codificar_cursor(resultado[-1]['pedido'])
+    
+    return resultado, proximo_cursor
@@ -0,0 +1,93 @@
+from typing import NamedTuple, Optional
+import database as db
+
+class ItemPrecificado(NamedTuple):
+    tipo: str
+    id: int
+    nome: str
+    preco: float
+    quantidade: int
+    imagem: Optional[str]
+    ativo: bool
+    estoque: Optional[int]
+
+    @property
+    def valor_total(self):
+        return self.preco * self.quantidade
+
+    @property
+    def estoque_suficiente(self):
+        return self.tipo == 'servico' or (self.estoque or 0) >= self.quantidade
+
+    @property
+    def disponivel(self):
+        return self.ativo and self.estoque_suficiente
+
+class CarrinhoPrecificado(NamedTuple):
+    itens: list
+    faltantes: list
+
+    @property
+    def total(self):
+        return sum(item.valor_total for item in self.itens)
+
+def preco_efetivo(registro):
+    if registro['promocao'] and registro['preco_promocional']:
+        return registro['preco_promocional']
+    return registro['preco']
+
+def _buscar_por_ids(cursor, tabela, colunas, ids):
+    if not ids:
+        return {}
+    marcadores = ', '.join('?' for _ in ids)
+    cursor.execute(f'SELECT {colunas} FROM {tabela} WHERE id IN ({marcadores})', list(ids))
+    return {row['id']: row for row in cursor.fetchall()}
+
+def precificar_carrinho(carrinho_items, cursor=None):
+    conn = None
+    if cursor is None:
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+    
+    ids = {'servico': set(), 'produto': set()}
+    linhas = []
+    for item in carrinho_items:
+        try:
+            item_id = int(item['id'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        tipo = 'servico' if item.get('tipo') == 'servico' else 'produto'
+        ids[tipo].add(item_id)
+        linhas.append((tipo, item_id, item.get('quantidade', 1)))
+    
+    registros = {
+        'servico': _buscar_por_ids(cursor, 'servicos',
+                                   'id, nome, preco, promocao, preco_promocional, imagem, ativo, NULL as estoque',
+                                   ids['servico']),
+        'produto': _buscar_por_ids(cursor, 'produtos',
+                                   'id, nome, preco, promocao, preco_promocional, imagem, ativo, estoque',
+                                   ids['produto']),
+    }
+    
+    if conn is not None:
+        conn.close()
+    
+    itens = []
+    faltantes = []
+    for tipo, item_id, quantidade in linhas:
+        dados = registros[tipo].get(item_id)
+        if not dados:
+            faltantes.append((tipo, item_id))
+            continue
+        itens.append(ItemPrecificado(
+            tipo=tipo,
+            id=dados['id'],
+            nome=dados['nome'],
+            preco=preco_efetivo(dados),
+            quantidade=quantidade,
+            imagem=dados['imagem'],
+            ativo=bool(dados['ativo']),
+            estoque=dados['estoque'],
+        ))
+    
+    return CarrinhoPrecificado(itens, faltantes)
@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta
+import database as db
+import catalogo
+import disponibilidade
+
+MAX_DIAS_RELATORIO = 731
+AGRUPAMENTOS = {
+    'dia': 'dia',
+    'semana': "date(dia, '-6 days', 'weekday 1')",
+    'mes': 'substr(dia, 1, 7)',
+}
+
+class ErroRelatorio(Exception):
+    status = 400
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        if status is not None:
+            self.status = status
+
+class Periodo:
+    def __init__(self, data_inicio=None, data_fim=None):
+        hoje = datetime.now().date()
+        try:
+            self.fim = datetime.strptime(data_fim, '%Y-%m-%d').date() if data_fim else hoje
+            self.inicio = (datetime.strptime(data_inicio, '%Y-%m-%d').date() if data_inicio
+                           else self.fim.replace(day=1))
+        except ValueError:
+            raise ErroRelatorio('Datas devem estar no formato AAAA-MM-DD')
+        if self.inicio > self.fim:
+            raise ErroRelatorio('A data inicial deve ser anterior à data final')
+        if (self.fim - self.inicio).days >= MAX_DIAS_RELATORIO:
+            raise ErroRelatorio(f'O período máximo é de {MAX_DIAS_RELATORIO} dias')
+
+    @property
+    def parametros(self):
+        return self.inicio.isoformat(), self.fim.isoformat()
+
+    def dias(self):
+        dia = self.inicio
+        while dia <= self.fim:
+            yield dia
+            dia += timedelta(days=1)
+
+    def como_dict(self):
+        return {'data_inicio': self.inicio.isoformat(), 'data_fim': self.fim.isoformat()}
+
+def _arredondar(valor):
+    return round(valor or 0, 2)
+
+def _media(total, quantidade):
+    return _arredondar(total / quantidade) if quantidade else 0
+
+def _consultar(sql, parametros, conn=None):
+    conn = conn or db.get_db_connection()
+    return [dict(row) for row in conn.execute(sql, parametros).fetchall()]
+
+def faturamento(periodo, agrupar='dia', conn=None):
+    if agrupar not in AGRUPAMENTOS:
+        raise ErroRelatorio(f"Agrupamento inválido; use {', '.join(AGRUPAMENTOS)}")
+    linhas = _consultar(f'''SELECT {AGRUPAMENTOS[agrupar]} as periodo,
+                           SUM(vendas) as vendas, SUM(faturamento) as faturamento,
+                           SUM(agendamentos) as agendamentos, SUM(valor_agendamentos) as valor_agendamentos
+                           FROM resumo_diario
+                           WHERE dia BETWEEN ? AND ? AND tipo != 'cliente'
+                           GROUP BY 1 ORDER BY 1''', periodo.parametros, conn)
+    for linha in linhas:
+        linha['faturamento'] = _arredondar(linha['faturamento'])
+        linha['valor_agendamentos'] = _arredondar(linha['valor_agendamentos'])
+    return linhas
+
+def _capacidade_minutos(periodo):
+    abertura, fechamento, dias_funcionamento = disponibilidade.expediente()
+    dias_abertos = sum(1 for dia in periodo.dias() if dia.isoweekday() in dias_funcionamento)
+    return dias_abertos * max(0, fechamento - abertura)
+
+def _minutos_agendados(conn, periodo):
+    cat = catalogo.obter()
+    minutos = {}
+    for row in conn.execute('''SELECT barbeiro_id, item_id, SUM(agendamentos) as agendamentos
+                              FROM resumo_diario
+                              WHERE dia BETWEEN ? AND ? AND tipo = 'servico' AND agendamentos != 0
+                              GROUP BY barbeiro_id, item_id''', periodo.parametros):
+        minutos[row['barbeiro_id']] = (minutos.get(row['barbeiro_id'], 0)
+                                       + row['agendamentos'] * disponibilidade.duracao_servico(row['item_id'], cat))
+    return minutos
+
+def por_barbeiro(periodo, conn=None):
+    conn = conn or db.get_db_connection()
+    cat = catalogo.obter()
+    capacidade = _capacidade_minutos(periodo)
+    minutos = _minutos_agendados(conn, periodo)
+    
+    linhas = {}
+    for row in conn.execute('''SELECT barbeiro_id, SUM(vendas) as vendas, SUM(faturamento) as faturamento,
+                              SUM(agendamentos) as agendamentos, SUM(valor_agendamentos) as valor_agendamentos
+                              FROM resumo_diario
+                              WHERE dia BETWEEN ? AND ? AND tipo != 'cliente'
+                              GROUP BY barbeiro_id''', periodo.parametros):
+        linhas[row['barbeiro_id']] = dict(row)
+    for barbeiro in cat.barbeiros_ativos:
+        linhas.setdefault(barbeiro['id'], {'barbeiro_id': barbeiro['id'], 'vendas': 0, 'faturamento': 0,
+                                           'agendamentos': 0, 'valor_agendamentos': 0})
+    
+    resultado = []
+    for barbeiro_id, linha in sorted(linhas.items()):
+        barbeiro = cat.barbeiros_por_id.get(barbeiro_id)
+        linha['barbeiro_nome'] = barbeiro['nome'] if barbeiro else None
+        linha['faturamento'] = _arredondar(linha['faturamento'])
+        linha['valor_agendamentos'] = _arredondar(linha['valor_agendamentos'])
+        linha['ticket_medio_agendamentos'] = _media(linha['valor_agendamentos'], linha['agendamentos'])
+        linha['minutos_agendados'] = minutos.get(barbeiro_id, 0)
+        linha['ocupacao'] = (round(linha['minutos_agendados'] / capacidade, 4)
+                             if barbeiro_id and capacidade else None)
+        resultado.append(linha)
+    return resultado
+
+def por_item(periodo, conn=None):
+    cat = catalogo.obter()
+    linhas = _consultar('''SELECT tipo, item_id, SUM(vendas) as vendas, SUM(quantidade) as quantidade,
+                          SUM(faturamento) as faturamento, SUM(agendamentos) as agendamentos,
+                          SUM(valor_agendamentos) as valor_agendamentos
+                          FROM resumo_diario
+                          WHERE dia BETWEEN ? AND ? AND tipo != 'cliente'
+                          GROUP BY tipo, item_id
+                          ORDER BY SUM(faturamento) + SUM(valor_agendamentos) DESC''', periodo.parametros, conn)
+    for linha in linhas:
+        itens = cat.servicos_por_id if linha['tipo'] == 'servico' else cat.produtos_por_id
+        item = itens.get(linha['item_id'])
+        linha['nome'] = item['nome'] if item else None
+        linha['faturamento'] = _arredondar(linha['faturamento'])
+        linha['valor_agendamentos'] = _arredondar(linha['valor_agendamentos'])
+    return linhas
+
+def por_metodo_pagamento(periodo, conn=None):
+    linhas = _consultar('''SELECT metodo_pagamento, SUM(vendas) as vendas, SUM(faturamento) as faturamento
+                          FROM resumo_diario
+                          WHERE dia BETWEEN ? AND ? AND vendas != 0
+                          GROUP BY metodo_pagamento
+                          ORDER BY SUM(faturamento) DESC''', periodo.parametros, conn)
+    for linha in linhas:
+        linha['metodo_pagamento'] = linha['metodo_pagamento'] or None
+        linha['faturamento'] = _arredondar(linha['faturamento'])
+    return linhas
+
+def indicadores(periodo, conn=None):
+    conn = conn or db.get_db_connection()
+    totais = conn.execute('''SELECT COALESCE(SUM(vendas), 0) as vendas, COALESCE(SUM(faturamento), 0) as faturamento,
+                            COALESCE(SUM(agendamentos), 0) as agendamentos,
+                            COALESCE(SUM(valor_agendamentos), 0) as valor_agendamentos,
+                            COALESCE(SUM(novos_clientes), 0) as novos_clientes
+                            FROM resumo_diario WHERE dia BETWEEN ? AND ?''', periodo.parametros).fetchone()
+    pedidos = conn.execute('''SELECT COUNT(*) as pedidos, COALESCE(SUM(valor_total), 0) as valor
+                             FROM pedidos WHERE status = 'pago' AND data_criacao >= ? AND data_criacao < ?''',
+                           (periodo.inicio.isoformat(), (periodo.fim + timedelta(days=1)).isoformat())).fetchone()
+    
+    barbeiros = len(catalogo.obter().barbeiros_ativos)
+    capacidade = _capacidade_minutos(periodo) * barbeiros
+    minutos = sum(total for barbeiro_id, total in _minutos_agendados(conn, periodo).items() if barbeiro_id)
+    
+    return {
+        'vendas': totais['vendas'],
+        'faturamento': _arredondar(totais['faturamento']),
+        'agendamentos': totais['agendamentos'],
+        'valor_agendamentos': _arredondar(totais['valor_agendamentos']),
+        'novos_clientes': totais['novos_clientes'],
+        'pedidos_pagos': pedidos['pedidos'],
+        'ticket_medio_pedidos': _media(pedidos['valor'], pedidos['pedidos']),
+        'ticket_medio_agendamentos': _media(totais['valor_agendamentos'], totais['agendamentos']),
+        'minutos_agendados': minutos,
+        'capacidade_minutos': capacidade,
+        'ocupacao': round(minutos / capacidade, 4) if capacidade else None,
+    }
+
+RELATORIOS = {
+    'faturamento': faturamento,
+    'barbeiros': por_barbeiro,
+    'itens': por_item,
+    'pagamentos': por_metodo_pagamento,
+    'indicadores': indicadores,
+}
+
+def gerar(nome, data_inicio=None, data_fim=None, **opcoes):
+    if nome not in RELATORIOS:
+        raise ErroRelatorio('Relatório não encontrado', 404)
+    periodo = Periodo(data_inicio, data_fim)
+    conn = db.get_db_connection()
+    try:
+        return periodo, RELATORIOS[nome](periodo, conn=conn, **opcoes)
+    finally:
+        conn.close()
@@ -0,0 +1,40 @@
+import database as db
+
+def do_dia(dia, conn=None):
+    conn = conn or db.get_db_connection()
+    row = conn.execute('''SELECT COALESCE(SUM(agendamentos), 0) as agendamentos,
+                         ROUND(COALESCE(SUM(faturamento), 0), 2) as faturamento,
+                         COALESCE(SUM(vendas), 0) as vendas,
+                         COALESCE(SUM(novos_clientes), 0) as novos_clientes
+                         FROM resumo_diario WHERE dia = ?''', (dia,)).fetchone()
+    return dict(row)
+
+def total_clientes(conn=None):
+    conn = conn or db.get_db_connection()
+    row = conn.execute('''SELECT novos_clientes FROM resumo_diario
+                         WHERE dia = 'total' AND barbeiro_id = 0 AND tipo = 'cliente'
+                         AND item_id = 0 AND metodo_pagamento = ''  ''').fetchone()
+    return row['novos_clientes'] if row else 0
+
+def reconstruir():
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        db.reconstruir_resumo_diario(cursor)
+        cursor.execute('SELECT COUNT(*) as total FROM resumo_diario')
+        total = cursor.fetchone()['total']
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return total
+
+if __name__ == '__main__':
+    import sys
+    
+    db.aplicar_migracoes()
+    if '--reconstruir' in sys.argv:
+        print(f'{reconstruir()} linhas de resumo reconstruídas')
@@ -168,25 +168,23 @@ function mostrarNotificacao(mensagem) {
 function buscarHorariosDisponiveis() {
     const barbeiroId = document.getElementById('barbeiro').value;
     const data = document.getElementById('data').value;
+    const servico = document.getElementById('servico');
     
     if (!barbeiroId || !data) return;
     
-    fetch('/horarios-disponiveis', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            barbeiro_id: barbeiroId,
-            data: data
-        })
-    })
+    const params = new URLSearchParams({ barbeiro_id: barbeiroId, data: data });
+    if (servico && servico.value) params.set('servico_id', servico.value);
+    
+    fetch('/horarios-disponiveis?' + params.toString(), { cache: 'no-cache' })
     .then(response => response.json())
     .then(data => {
         const select = document.getElementById('horario');
-        select.innerHTML = '<option value="">Selecione um horário</option>';
+        const horarios = data.horarios || [];
+        select.innerHTML = horarios.length
+            ? '<option value="">Selecione um horário</option>'
+            : '<option value="">Nenhum horário disponível nesta data</option>';
         
-        data.horarios.forEach(horario => {
+        horarios.forEach(horario => {
             const option = document.createElement('option');
             option.value = horario;
             option.textContent = horario;
@@ -196,6 +194,46 @@ function buscarHorariosDisponiveis() {
     .catch(error => console.error('Erro:', error));
 }
 
+function buscarPrimeirosHorarios() {
+    const servico = document.getElementById('servico');
+    const lista = document.getElementById('primeiros-horarios');
+    
+    if (!servico.value) {
+        mostrarNotificacao('Selecione um serviço primeiro');
+        return;
+    }
+    
+    fetch('/horarios-disponiveis/primeiros?' + new URLSearchParams({ servico_id: servico.value, limite: 6 }), { cache: 'no-cache' })
+    .then(response => response.json())
+    .then(data => {
+        const horarios = data.horarios || [];
+        lista.innerHTML = horarios.length ? '' : '<span style="color: var(--cinza-claro);">Nenhum horário livre nos próximos dias</span>';
+        
+        horarios.forEach(item => {
+            const botao = document.createElement('button');
+            botao.type = 'button';
+            botao.className = 'btn btn-secondary';
+            botao.textContent = `${item.data.split('-').reverse().join('/')} ${item.horario} - ${item.barbeiro_nome}`;
+            botao.onclick = () => escolherPrimeiroHorario(item);
+            lista.appendChild(botao);
+        });
+    })
+    .catch(error => console.error('Erro:', error));
+}
+
+function escolherPrimeiroHorario(item) {
+    document.getElementById('barbeiro').value = item.barbeiro_id;
+    document.getElementById('data').value = item.data;
+    
+    const select = document.getElementById('horario');
+    select.innerHTML = '';
+    const option = document.createElement('option');
+    option.value = item.horario;
+    option.textContent = item.horario;
+    select.appendChild(option);
+    select.value = item.horario;
+}
+
 function criarAgendamento(event) {
     event.preventDefault();
     
@@ -293,6 +331,46 @@ function processarAgendamentoPendente() {
     }
 }
 
+function configurarSugestoesBusca() {
+    document.querySelectorAll('input[name="q"]').forEach((input, indice) => {
+        const lista = document.createElement('datalist');
+        lista.id = `sugestoes-busca-${indice}`;
+        input.setAttribute('list', lista.id);
+        input.setAttribute('autocomplete', 'off');
+        input.after(lista);
+        
+        let sugestoesAtuais = [];
+        let ultimaConsulta = '';
+        
+        input.addEventListener('input', function() {
+            const escolhida = sugestoesAtuais.find(sugestao => sugestao.nome === input.value);
+            if (escolhida) {
+                window.location.href = escolhida.url;
+                return;
+            }
+            
+            const consulta = input.value.trim();
+            if (consulta.length < 2 || consulta === ultimaConsulta) return;
+            ultimaConsulta = consulta;
+            
+            fetch(`/api/sugestoes?q=${encodeURIComponent(consulta)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (consulta !== ultimaConsulta) return;
+                
+                sugestoesAtuais = data.sugestoes;
+                lista.innerHTML = '';
+                data.sugestoes.forEach(sugestao => {
+                    const option = document.createElement('option');
+                    option.value = sugestao.nome;
+                    lista.appendChild(option);
+                });
+            })
+            .catch(error => console.error('Erro ao buscar sugestões:', error));
+        });
+    });
+}
+
 function toggleSidebar() {
     const sidebar = document.getElementById('sidebar');
     const overlay = document.getElementById('sidebarOverlay');
@@ -328,6 +406,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     processarAgendamentoPendente();
+    configurarSugestoesBusca();
     
     let lastScrollTop = 0;
     const searchBar = document.querySelector('.search-bar');
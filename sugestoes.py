@@ -0,0 +1,74 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+import database as db
+import catalogo
+from cache import CacheVersionado
+
+LIMITE_SUGESTOES = 8
+MAX_CANDIDATOS = 500
+
+_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+def normalizar(texto):
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower().strip()
+
+class IndicePrefixos:
+    def __init__(self, itens):
+        entradas = []
+        for item in itens:
+            nome_normalizado = normalizar(item['nome'])
+            chaves = {nome_normalizado}
+            chaves.update(_PALAVRA.findall(nome_normalizado))
+            for chave in chaves:
+                entradas.append((chave, item))
+        entradas.sort(key=lambda entrada: entrada[0])
+        self._chaves = [chave for chave, _ in entradas]
+        self._itens = [item for _, item in entradas]
+
+    def sugerir(self, prefixo, limite=LIMITE_SUGESTOES):
+        prefixo = normalizar(prefixo)
+        if not prefixo:
+            return []
+        
+        posicao = bisect_left(self._chaves, prefixo)
+        candidatos = {}
+        fim = min(len(self._chaves), posicao + MAX_CANDIDATOS)
+        while posicao < fim and self._chaves[posicao].startswith(prefixo):
+            item = self._itens[posicao]
+            candidatos[(item['tipo'], item['id'])] = item
+            posicao += 1
+        
+        return heapq.nsmallest(limite, candidatos.values(), key=lambda item: (-item['peso'], item['nome']))
+
+def _carregar_indice():
+    cat = catalogo.obter()
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''SELECT tipo, item_id, SUM(quantidade) as total FROM vendas
+                     WHERE status = 'concluido'
+                     GROUP BY tipo, item_id''')
+    vendidos = {(row['tipo'], row['item_id']): row['total'] or 0 for row in cursor.fetchall()}
+    cursor.close()
+    
+    itens = []
+    peso_categorias = {}
+    for tipo, lista, rota in (('servico', cat.servicos_ativos, '/servico'), ('produto', cat.produtos_ativos, '/produto')):
+        for registro in lista:
+            peso = vendidos.get((tipo, registro['id']), 0)
+            peso_categorias[registro['categoria_id']] = peso_categorias.get(registro['categoria_id'], 0) + peso
+            itens.append({'tipo': tipo, 'id': registro['id'], 'nome': registro['nome'],
+                          'url': f"{rota}/{registro['id']}", 'peso': peso})
+    
+    for categoria in cat.categorias_ativas:
+        itens.append({'tipo': 'categoria', 'id': categoria['id'], 'nome': categoria['nome'],
+                      'url': f"/categoria/{categoria['id']}", 'peso': peso_categorias.get(categoria['id'], 0)})
+    
+    return IndicePrefixos(itens)
+
+_cache = CacheVersionado(catalogo.VERSAO, _carregar_indice)
+
+def sugerir(prefixo, limite=LIMITE_SUGESTOES):
+    return _cache.obter().sugerir(prefixo, limite)
@@ -0,0 +1,94 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+import database as db
+import agendamentos
+
+CORTE_DEGRADE = 1
+BARBA_COMPLETA = 3
+
+class TesteAgendamentos(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.pasta.name, 'agendamentos.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.aplicar_migracoes()
+        
+        hoje = datetime.now().date()
+        segunda = hoje + timedelta(days=7 - hoje.weekday())
+        self.base = datetime.combine(segunda, datetime.min.time()).replace(hour=10)
+
+    def tearDown(self):
+        db.fechar_conexao()
+        self.pasta.cleanup()
+
+    def agendar(self, minutos=0, barbeiro_id=1, servico_id=CORTE_DEGRADE):
+        return agendamentos.criar_agendamento(None, barbeiro_id, servico_id,
+                                              self.base + timedelta(minutes=minutos), '')
+
+    def ativos(self):
+        conn = db.get_db_connection()
+        return conn.execute("SELECT COUNT(*) FROM agendamentos WHERE status != 'cancelado'").fetchone()[0]
+
+    def test_sobreposicao_no_mesmo_barbeiro_retorna_409(self):
+        self.agendar()
+        for minutos in (0, 15, 44, -20):
+            with self.subTest(minutos=minutos):
+                with self.assertRaises(agendamentos.HorarioIndisponivel) as erro:
+                    self.agendar(minutos, servico_id=BARBA_COMPLETA)
+                self.assertEqual(erro.exception.status, 409)
+        self.assertEqual(self.ativos(), 1)
+
+    def test_horarios_encostados_sao_aceitos(self):
+        self.agendar()
+        self.agendar(45, servico_id=BARBA_COMPLETA)
+        self.agendar(-30, servico_id=BARBA_COMPLETA)
+        self.assertEqual(self.ativos(), 3)
+
+    def test_mesmo_horario_em_outro_barbeiro_e_aceito(self):
+        self.agendar(barbeiro_id=1)
+        self.agendar(barbeiro_id=2)
+        self.assertEqual(self.ativos(), 2)
+
+    def test_horario_cancelado_volta_a_ficar_livre(self):
+        agendamentos.alterar_status(self.agendar(), 'cancelado')
+        self.agendar()
+        self.assertEqual(self.ativos(), 1)
+
+    def test_fora_do_expediente_retorna_400(self):
+        for minutos in (-90, 10 * 60 - 30, 6 * 24 * 60):
+            with self.subTest(minutos=minutos):
+                with self.assertRaises(agendamentos.ErroAgendamento) as erro:
+                    self.agendar(minutos)
+                self.assertEqual(erro.exception.status, 400)
+
+    def test_corrida_no_indice_unico_retorna_409(self):
+        self.agendar()
+        with mock.patch.object(agendamentos, '_verificar_horario'):
+            with self.assertRaises(agendamentos.HorarioIndisponivel) as erro:
+                self.agendar()
+        self.assertEqual(erro.exception.status, 409)
+        self.assertIsInstance(erro.exception.__cause__, db.sqlite3.IntegrityError)
+        self.assertEqual(self.ativos(), 1)
+        self.assertFalse(db.get_db_connection().in_transaction)
+
+    def test_rota_responde_409_para_horario_ocupado(self):
+        from app import app
+        self.agendar()
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['cliente_id'] = 1
+        resposta = cliente.post('/criar-agendamento', json={
+            'barbeiro_id': 1, 'servico_id': BARBA_COMPLETA,
+            'data': self.base.date().isoformat(), 'horario': '10:30'})
+        self.assertEqual(resposta.status_code, 409)
+        self.assertFalse(resposta.get_json()['success'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+import database as db
+import comissoes
+
+class TesteComissoes(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.pasta.name, 'comissoes.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.aplicar_migracoes()
+        
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO servicos (nome, preco, duracao_minutos, ativo) VALUES ('Corte Teste', 50, 30, 1)")
+        self.servico_id = cursor.lastrowid
+        self.clientes = []
+        for telefone in ('11900000001', '11900000002'):
+            cursor.execute("INSERT INTO clientes (nome, telefone) VALUES ('Cliente', ?)", (telefone,))
+            self.clientes.append(cursor.lastrowid)
+        conn.commit()
+
+    def tearDown(self):
+        db.fechar_conexao()
+        self.pasta.cleanup()
+
+    def barbeiro(self, comissao_tipo, comissao_valor):
+        conn = db.get_db_connection()
+        cursor = conn.execute('''INSERT INTO barbeiros (nome, especialidade, comissao_tipo, comissao_valor, ativo)
+                                VALUES ('Barbeiro Teste', 'Teste', ?, ?, 1)''', (comissao_tipo, comissao_valor))
+        conn.commit()
+        return cursor.lastrowid
+
+    def registrar_dia(self, barbeiro_id):
+        agendado, avulso = self.clientes
+        conn = db.get_db_connection()
+        conn.execute('''INSERT INTO agendamentos (cliente_id, barbeiro_id, servico_id, data_hora, status, valor)
+                       VALUES (?, ?, ?, '2025-03-10 10:00:00', 'concluido', 50)''',
+                     (agendado, barbeiro_id, self.servico_id))
+        conn.executemany('''INSERT INTO vendas (cliente_id, barbeiro_id, tipo, item_id, quantidade, valor_unitario,
+                           valor_total, metodo_pagamento, data_venda) VALUES (?, ?, ?, ?, 1, ?, ?, 'pix', ?)''',
+                         [(agendado, barbeiro_id, 'servico', self.servico_id, 50, 50, '2025-03-10 10:40:00'),
+                          (agendado, barbeiro_id, 'produto', 1, 30, 30, '2025-03-10 10:41:00'),
+                          (avulso, barbeiro_id, 'servico', self.servico_id, 40, 40, '2025-03-12 15:00:00')])
+        conn.commit()
+
+    def extrato(self, barbeiro_id):
+        _, lista = comissoes.extratos('2025-03-01', '2025-03-31')
+        return next(extrato for extrato in lista if extrato['barbeiro_id'] == barbeiro_id)
+
+    def test_percentual_nao_conta_duas_vezes_servico_agendado_e_pago(self):
+        barbeiro_id = self.barbeiro('percentual', 40)
+        self.registrar_dia(barbeiro_id)
+        
+        extrato = self.extrato(barbeiro_id)
+        self.assertEqual((extrato['valor_agendamentos'], extrato['valor_vendas']), (50, 70))
+        self.assertEqual(extrato['valor_comissao'], 48)
+
+    def test_fixa_nao_conta_duas_vezes_servico_agendado_e_pago(self):
+        barbeiro_id = self.barbeiro('fixa', 15)
+        self.registrar_dia(barbeiro_id)
+        
+        extrato = self.extrato(barbeiro_id)
+        self.assertEqual((extrato['agendamentos'], extrato['servicos_vendidos'], extrato['vendas']), (1, 1, 2))
+        self.assertEqual(extrato['valor_comissao'], 30)
+
+    def test_servico_pago_sem_atendimento_concluido_conta_pela_venda(self):
+        barbeiro_id = self.barbeiro('percentual', 40)
+        self.registrar_dia(barbeiro_id)
+        conn = db.get_db_connection()
+        conn.execute("UPDATE agendamentos SET status = 'agendado' WHERE barbeiro_id = ?", (barbeiro_id,))
+        conn.commit()
+        
+        extrato = self.extrato(barbeiro_id)
+        self.assertEqual((extrato['valor_agendamentos'], extrato['valor_vendas']), (0, 120))
+        self.assertEqual(extrato['valor_comissao'], 48)
+
+if __name__ == '__main__':
+    unittest.main()
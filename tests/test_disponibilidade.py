@@ -0,0 +1,127 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+import database as db
+import agendamentos
+import cache
+import disponibilidade
+
+CORTE_DEGRADE = 1
+BARBA_COMPLETA = 3
+PLATINADO = 5
+
+class TesteAgendaDia(unittest.TestCase):
+    def setUp(self):
+        self.agenda = disponibilidade.AgendaDia(9 * 60, 20 * 60)
+
+    def test_ultimo_inicio_respeita_a_duracao(self):
+        self.assertEqual(self.agenda.inicios_livres(120)[-1], 18 * 60)
+        self.assertEqual(self.agenda.inicios_livres(30)[-1], 19 * 60 + 30)
+        self.assertEqual(self.agenda.inicios_livres(12 * 60), [])
+
+    def test_blocos_reservados_nao_sao_oferecidos(self):
+        self.agenda.reservar(10 * 60, 45)
+        inicios = self.agenda.inicios_livres(30)
+        self.assertIn(9 * 60 + 30, inicios)
+        self.assertNotIn(10 * 60, inicios)
+        self.assertNotIn(10 * 60 + 30, inicios)
+        self.assertIn(11 * 60, inicios)
+        self.assertNotIn(9 * 60 + 30, self.agenda.inicios_livres(60))
+
+    def test_depois_de_descarta_inicios_passados(self):
+        inicios = self.agenda.inicios_livres(30, depois_de=14 * 60)
+        self.assertEqual(inicios[0], 14 * 60 + 30)
+
+class TesteHorariosPeriodo(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        for alvo, valor in ((db, {'DB_PATH': os.path.join(self.pasta.name, 'disponibilidade.db')}),
+                            (disponibilidade, {'_cache_horarios': cache.CacheLRU(disponibilidade.MAX_AGENDAS_EM_CACHE)})):
+            patcher = mock.patch.multiple(alvo, **valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.aplicar_migracoes()
+        
+        self.segunda = date(2030, 1, 7)
+        self.agora = datetime(2030, 1, 1, 8, 0)
+
+    def tearDown(self):
+        db.fechar_conexao()
+        self.pasta.cleanup()
+
+    def periodo(self, data_inicio, dias=1, servico_id=None, agora=None):
+        return disponibilidade.horarios_periodo(1, data_inicio, dias, servico_id, agora or self.agora)
+
+    def test_platinado_termina_no_fechamento(self):
+        horarios = self.periodo(self.segunda.isoformat(), servico_id=PLATINADO)[self.segunda.isoformat()]
+        self.assertEqual((horarios[0], horarios[-1]), ('09:00', '18:00'))
+        self.assertNotIn('18:30', horarios)
+
+    def test_dia_fechado_nao_tem_horarios(self):
+        dias = self.periodo(self.segunda.isoformat(), dias=7)
+        domingo = (self.segunda + timedelta(days=6)).isoformat()
+        self.assertEqual(dias[domingo], [])
+        self.assertEqual(sum(1 for horarios in dias.values() if horarios), 6)
+
+    def test_reservas_existentes_ocupam_os_blocos(self):
+        inicio = datetime.combine(self.segunda, datetime.min.time()).replace(hour=10)
+        agendamentos.criar_agendamento(None, 1, CORTE_DEGRADE, inicio, '')
+        horarios = disponibilidade.horarios_do_dia(1, self.segunda.isoformat(), BARBA_COMPLETA, self.agora)
+        self.assertIn('09:30', horarios)
+        self.assertNotIn('10:00', horarios)
+        self.assertNotIn('10:30', horarios)
+        self.assertIn('11:00', horarios)
+        self.assertIn('10:00', disponibilidade.horarios_do_dia(2, self.segunda.isoformat(), BARBA_COMPLETA, self.agora))
+
+    def test_hoje_oferece_apenas_horarios_futuros(self):
+        agora = datetime.combine(self.segunda, datetime.min.time()).replace(hour=15, minute=10)
+        horarios = self.periodo(self.segunda.isoformat(), agora=agora)[self.segunda.isoformat()]
+        self.assertEqual(horarios[0], '15:30')
+        self.assertEqual(self.periodo((self.segunda - timedelta(days=1)).isoformat(), agora=agora),
+                         {(self.segunda - timedelta(days=1)).isoformat(): []})
+
+    def test_datas_fora_do_formato_iso_sao_rejeitadas(self):
+        for data in ('2030-1-7', '07/01/2030', '2030-01-07T10:00', '', None):
+            with self.subTest(data=data):
+                with self.assertRaises((ValueError, TypeError)):
+                    self.periodo(data)
+
+    def test_servico_desconhecido_e_rejeitado(self):
+        data = self.segunda.isoformat()
+        for servico_id, erro, status in (('abc', disponibilidade.ErroDisponibilidade, 400),
+                                         ('9999', disponibilidade.ServicoNaoEncontrado, 404)):
+            with self.subTest(servico_id=servico_id):
+                with self.assertRaises(erro) as contexto:
+                    self.periodo(data, servico_id=servico_id)
+                self.assertEqual(contexto.exception.status, status)
+                with self.assertRaises(erro):
+                    disponibilidade.primeiros_horarios(servico_id, data, agora=self.agora)
+
+    def test_sem_servico_usa_duracao_padrao(self):
+        data = self.segunda.isoformat()
+        for servico_id in (None, ''):
+            with self.subTest(servico_id=servico_id):
+                self.assertEqual(self.periodo(data, servico_id=servico_id)[data][-1], '19:30')
+
+    def test_rotas_respondem_erro_para_servico_invalido(self):
+        from app import app
+        cliente = app.test_client()
+        data = self.segunda.isoformat()
+        for servico_id, status in (('abc', 400), ('9999', 404), (str(PLATINADO), 200)):
+            with self.subTest(servico_id=servico_id):
+                resposta = cliente.get('/horarios-disponiveis/primeiros',
+                                       query_string={'servico_id': servico_id, 'data_inicio': data})
+                self.assertEqual(resposta.status_code, status)
+                resposta = cliente.get('/horarios-disponiveis',
+                                       query_string={'barbeiro_id': 1, 'data': data, 'servico_id': servico_id})
+                self.assertEqual(resposta.status_code, status)
+        self.assertEqual(cliente.get('/horarios-disponiveis', query_string={'barbeiro_id': 1, 'data': '2030-1-7'})
+                         .status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import database as db
+import eventos
+import fila
+
+class TesteFila(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.pasta.name, 'fila.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.aplicar_migracoes()
+        fila._cache.invalidar()
+        self.ana = fila.entrar('Ana')
+        self.bia = fila.entrar('Bia')
+
+    def tearDown(self):
+        db.fechar_conexao()
+        self.pasta.cleanup()
+
+    def proximo_evento(self, stream):
+        for mensagem in stream:
+            if mensagem.startswith('event: posicao'):
+                return json.loads(mensagem.split('data: ', 1)[1])
+
+    def test_transmitir_avisa_quando_a_fila_anda(self):
+        stream = fila.transmitir(self.bia)
+        self.assertEqual(self.proximo_evento(stream)['posicao'], 2)
+        
+        inicio = time.monotonic()
+        threading.Timer(0.2, fila.chamar_proximo).start()
+        self.assertEqual(self.proximo_evento(stream)['posicao'], 1)
+        threading.Timer(0.2, fila.chamar_proximo).start()
+        self.assertEqual(self.proximo_evento(stream)['status'], 'chamado')
+        self.assertLess(time.monotonic() - inicio, fila.INTERVALO_HEARTBEAT)
+        self.assertEqual(list(stream), [])
+
+    def test_rota_de_eventos_respeita_o_limite_de_conexoes(self):
+        from app import app
+        cliente = app.test_client()
+        self.assertEqual(cliente.get('/fila/eventos').status_code, 404)
+        with cliente.session_transaction() as sessao:
+            sessao['fila_id'] = self.ana
+        
+        reservadas = 0
+        while eventos.reservar_conexao():
+            reservadas += 1
+        try:
+            resposta = cliente.get('/fila/eventos')
+            self.assertEqual(resposta.status_code, 503)
+            self.assertEqual(resposta.headers['Retry-After'], str(eventos.RECONEXAO_MS // 1000))
+        finally:
+            for _ in range(reservadas):
+                eventos.liberar_conexao()
+        
+        resposta = cliente.get('/fila/eventos', buffered=False)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.mimetype, 'text/event-stream')
+        resposta.close()
+
+if __name__ == '__main__':
+    unittest.main()
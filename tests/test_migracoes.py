@@ -0,0 +1,63 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+import database as db
+
+class TesteMigracoes(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(db, 'DB_PATH', os.path.join(self.pasta.name, 'migracoes.db'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        db.fechar_conexao()
+        self.pasta.cleanup()
+
+    def migrar(self):
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            versao = db.aplicar_migracoes()
+        return versao, saida.getvalue().splitlines()
+
+    def esquema(self):
+        conn = db.get_db_connection()
+        return {row['name']: row['sql'] for row in conn.execute('SELECT name, sql FROM sqlite_master')}
+
+    def test_banco_novo_chega_na_ultima_versao(self):
+        versao, aplicadas = self.migrar()
+        self.assertEqual(versao, db.SCHEMA_VERSION)
+        self.assertEqual(len(aplicadas), len(db.MIGRACOES))
+        self.assertEqual(db.verificar_planos_consulta(), [])
+        self.assertNotIn('lembretes', self.esquema())
+
+    def test_migracoes_sao_numeradas_em_sequencia_e_nao_se_repetem(self):
+        self.assertEqual([numero for numero, _ in db.MIGRACOES], list(range(1, len(db.MIGRACOES) + 1)))
+        funcoes = [migracao for _, migracao in db.MIGRACOES]
+        self.assertEqual(len(set(funcoes)), len(funcoes))
+
+    def test_reaplicar_nao_altera_o_esquema(self):
+        self.migrar()
+        esquema = self.esquema()
+        versao, aplicadas = self.migrar()
+        self.assertEqual((versao, aplicadas), (db.SCHEMA_VERSION, []))
+        self.assertEqual(self.esquema(), esquema)
+
+    def test_banco_em_versao_intermediaria_completa_o_esquema(self):
+        self.migrar()
+        esquema = self.esquema()
+        db.fechar_conexao()
+        os.remove(db.DB_PATH)
+        
+        with mock.patch.object(db, 'MIGRACOES', db.MIGRACOES[:7]):
+            self.migrar()
+        versao, aplicadas = self.migrar()
+        self.assertEqual(versao, db.SCHEMA_VERSION)
+        self.assertEqual(len(aplicadas), len(db.MIGRACOES) - 7)
+        self.assertEqual(self.esquema(), esquema)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+import database as db
+import notificacoes
+
+class TransporteFalso:
+    def __init__(self, falhar=()):
+        self.falhar = set(falhar)
+        self.lotes = []
+
+    def enviar(self, mensagens):
+        self.lotes.append(mensagens)
+        return {mensagem['id']: 'destino indisponível' for mensagem in mensagens if mensagem['chave'] in self.falhar}
+
+    @property
+    def entregues(self):
+        return [mensagem['chave'] for lote in self.lotes for mensagem in lote if mensagem['chave'] not in self.falhar]
+
+class TransporteQuebrado:
+    def enviar(self, mensagens):
+        raise ConnectionError('gateway fora do ar')
+
+class TesteNotificacoes(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        for alvo, valor in ((db, {'DB_PATH': os.path.join(self.pasta.name, 'notificacoes.db')}),
+                            (notificacoes, {'ATRASO_BASE_SEGUNDOS': 0})):
+            patcher = mock.patch.multiple(alvo, **valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.aplicar_migracoes()
+
+    def tearDown(self):
+        db.fechar_conexao()
+        self.pasta.cleanup()
+
+    def enfileirar(self, *chaves, destino='11999990000'):
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        inseridas = [notificacoes.enfileirar(cursor, 'pedido_cancelado', destino,
+                                             {'cliente_nome': 'Ana', 'pedido_id': chave}, chave)
+                     for chave in chaves]
+        conn.commit()
+        return inseridas
+
+    def outbox(self):
+        conn = db.get_db_connection()
+        return {row['chave']: dict(row) for row in conn.execute('SELECT * FROM outbox')}
+
+    def test_enfileirar_ignora_chave_repetida(self):
+        self.assertEqual(self.enfileirar('pedido:1', 'pedido:1'), [True, False])
+        outbox = self.outbox()
+        self.assertEqual(list(outbox), ['pedido:1'])
+        self.assertEqual(outbox['pedido:1']['mensagem'], 'Olá, Ana. O pedido #pedido:1 foi cancelado.')
+
+    def test_enfileirar_sem_destino(self):
+        self.assertEqual(self.enfileirar('pedido:1', destino=None), [False])
+        self.assertEqual(self.outbox(), {})
+
+    def test_despachar_lote_marca_enviadas(self):
+        self.enfileirar('pedido:1', 'pedido:2', 'pedido:3')
+        transporte = TransporteFalso()
+        
+        self.assertEqual(notificacoes.despachar_lote(transporte), (3, 0))
+        self.assertEqual(notificacoes.despachar_lote(transporte), (0, 0))
+        self.assertEqual(len(transporte.lotes), 1)
+        for mensagem in self.outbox().values():
+            self.assertEqual(mensagem['status'], 'enviado')
+            self.assertEqual(mensagem['tentativas'], 1)
+            self.assertIsNotNone(mensagem['data_envio'])
+
+    def test_falha_parcial_reagenda_apenas_as_falhas(self):
+        self.enfileirar('pedido:1', 'pedido:2', 'pedido:3')
+        transporte = TransporteFalso(falhar={'pedido:2'})
+        
+        self.assertEqual(notificacoes.despachar_lote(transporte), (2, 1))
+        falha = self.outbox()['pedido:2']
+        self.assertEqual((falha['status'], falha['tentativas']), ('pendente', 1))
+        self.assertEqual(falha['ultimo_erro'], 'destino indisponível')
+        
+        transporte.falhar.clear()
+        self.assertEqual(notificacoes.despachar_lote(transporte), (1, 0))
+        self.assertEqual(sorted(transporte.entregues), ['pedido:1', 'pedido:2', 'pedido:2', 'pedido:3'])
+        self.assertEqual([mensagem['chave'] for mensagem in transporte.lotes[1]], ['pedido:2'])
+        self.assertEqual({mensagem['status'] for mensagem in self.outbox().values()}, {'enviado'})
+
+    def test_excecao_no_transporte_reagenda_o_lote(self):
+        self.enfileirar('pedido:1', 'pedido:2')
+        
+        self.assertEqual(notificacoes.despachar_lote(TransporteQuebrado()), (0, 2))
+        for mensagem in self.outbox().values():
+            self.assertEqual((mensagem['status'], mensagem['tentativas']), ('pendente', 1))
+            self.assertEqual(mensagem['ultimo_erro'], 'gateway fora do ar')
+
+    def test_desiste_apos_max_tentativas(self):
+        self.enfileirar('pedido:1')
+        transporte = TransporteFalso(falhar={'pedido:1'})
+        
+        for _ in range(notificacoes.MAX_TENTATIVAS):
+            self.assertEqual(notificacoes.despachar_lote(transporte), (0, 1))
+        self.assertEqual(notificacoes.despachar_lote(transporte), (0, 0))
+        mensagem = self.outbox()['pedido:1']
+        self.assertEqual((mensagem['status'], mensagem['tentativas']), ('falhou', notificacoes.MAX_TENTATIVAS))
+
+    def test_despachar_respeita_limite_do_lote(self):
+        self.enfileirar(*(f'pedido:{indice}' for indice in range(5)))
+        transporte = TransporteFalso()
+        
+        self.assertEqual(notificacoes.despachar_lote(transporte, limite=2), (2, 0))
+        self.assertEqual(notificacoes.despachar_pendentes(transporte), '3 notificações enviadas, 0 falhas')
+        self.assertEqual(sorted(transporte.entregues), [f'pedido:{indice}' for indice in range(5)])
+
+if __name__ == '__main__':
+    unittest.main()